@@ -8,6 +8,7 @@ efficient APIs for remote use.
 '''
 from sonic_platform.platform import Platform
 from cli_wrapper    import *   # wrappers for CLI etc.
+from trace_wrapper  import *   # trace_span, trace_func
 
 
 _API_WRAP_DBG = True
@@ -33,6 +34,29 @@ def _get_sfp(intf):
             print('_get_sfp() ERR, exception')
     return sfp
 
+def _read_eeprom(sfp, intf, offset, num_bytes):
+    '''sfp.read_eeprom(), traced (trace_wrapper)'''
+    with trace_span('read_eeprom %d+%d' % (offset, num_bytes), 'eeprom', intf):
+        return sfp.read_eeprom(offset, num_bytes)
+
+def get_eeprom_path(intf):
+    '''Get sysfs EEPROM (optoe) path of port, None if the platform doesn't say.
+
+    Not part of SfpBase; most platforms' Sfp classes have one of these.
+    '''
+    path = None
+    sfp = _get_sfp(intf)
+    for name in ('get_eeprom_path', 'eeprom_path', '_eeprom_path', 'port_eeprom_path'):
+        try:
+            path = getattr(sfp, name)
+            if callable(path):
+                path = path()
+            if path:
+                break
+        except:
+            path = None
+    return path if isinstance(path, str) else None
+
 def _get_api(intf):
     ''' Get xcvr API (CMIS or SFF-whatever API)
     '''
@@ -57,7 +81,7 @@ def _get_id(intf):
     if api:
         try:
             sfp = _get_sfp(intf)
-            id  = sfp.read_eeprom(0,1)[0]
+            id  = _read_eeprom(sfp, intf, 0, 1)[0]
         except:
             if _API_WRAP_DBG:
                 print('_get_id:ERR, exception')
@@ -72,7 +96,7 @@ def _get_rev_compliance(intf):
     if api:
         try:
             sfp = _get_sfp(intf)
-            rev = sfp.read_eeprom(1,1)[0]
+            rev = _read_eeprom(sfp, intf, 1, 1)[0]
         except:
             if _API_WRAP_DBG:
                 print('_get_rev_compliance: ERR, exception')  # ?
@@ -93,11 +117,11 @@ def _get_spec_compliance(intf):
         try:
             sfp = _get_sfp(intf)
             if is_cmis(intf):
-                spec_compl = sfp.read_eeprom(85,1)[0]  # media type
+                spec_compl = _read_eeprom(sfp, intf, 85, 1)[0]  # media type
             elif is_sff8436(intf) or is_sff8636(intf):
-                spec_compl = sfp.read_eeprom(131,1)[0] # TBD: need 131-138, 192(extended) ?
+                spec_compl = _read_eeprom(sfp, intf, 131, 1)[0] # TBD: need 131-138, 192(extended) ?
             elif is_sff8472(intf):
-                spec_compl = sfp.read_eeprom(8,1)[0]   # bit 3:2
+                spec_compl = _read_eeprom(sfp, intf, 8, 1)[0]   # bit 3:2
             else:
                 return None # or return spec_compl = 0?
         except:
@@ -202,18 +226,18 @@ def is_coherent(intf):
         #   3Fh (400ZR, single wavelength unamplified)
         # Ref.: OIF C-CMIS rev 1.2 sect.6.
         sfp = _get_sfp(intf)
-        app1_media_type = sfp.read_eeprom(87,1)[0]
+        app1_media_type = _read_eeprom(sfp, intf, 87, 1)[0]
         if app1_media_type == 0x3E or app1_media_type == 0x3F:
             rc = True
     return rc
 
 
-def get_StartCmdPayloadSize(intf):
-    '''Get CDB CMD 0041h StartCmdPayloadSize.
-    (Size of the image header that's not downloaded to the txceiver.)
-    There doesn't seem to be any CLI support for getting this type of info(?)
+def get_FwMgmtFeatures(intf):
+    '''Get CDB CMD 0041h firmware management features as tuple
+    (startLPLsize, maxblocksize, lplonly_flag, autopaging_flag, writelength),
+    None on error.
     '''
-    payloadsize = None
+    fwfeats = None
     try:
         api = _get_api(intf)
 
@@ -221,8 +245,52 @@ def get_StartCmdPayloadSize(intf):
         #  'info': txt, 
         #  'feature': (startLPLsize, maxblocksize, lplonly_flag, autopaging_flag, writelength)}
         fwfeats = api.get_module_fw_mgmt_feature(intf)['feature']
-        payloadsize = fwfeats[0]
     except:
         pass
+    return fwfeats
+
+def get_StartCmdPayloadSize(intf):
+    '''Get CDB CMD 0041h StartCmdPayloadSize.
+    (Size of the image header that's not downloaded to the txceiver.)
+    There doesn't seem to be any CLI support for getting this type of info(?)
+    '''
+    payloadsize = None
+    fwfeats = get_FwMgmtFeatures(intf)
+    if fwfeats:
+        payloadsize = fwfeats[0]
     return payloadsize
 
+@trace_func('cdb')
+def get_module_fw_info(intf):
+    '''Get CDB CMD 0100h firmware info as tuple
+    (ImageA, ImageARunning, ImageACommitted, ImageAValid,
+     ImageB, ImageBRunning, ImageBCommitted, ImageBValid, ...),
+    None on error. (Newer xcvr APIs append active and inactive version.)
+    '''
+    fwinfo = None
+    try:
+        api = _get_api(intf)
+
+        # {'status': True,
+        #  'info': txt,
+        #  'result': (ImageA, ImageARunning, ImageACommitted, ImageAValid, ImageB, ...)}
+        resp = api.get_module_fw_info()
+        if resp['status']:
+            fwinfo = resp['result']
+    except:
+        if _API_WRAP_DBG:
+            print('get_module_fw_info() ERR, exception')
+    return fwinfo
+
+def get_cdb(intf):
+    '''Get CMIS CDB API (start_fw_download, block_write_lpl/epl, ...),
+    None if not CMIS or on error.
+    '''
+    cdb = None
+    try:
+        cdb = _get_api(intf).cdb
+    except:
+        if _API_WRAP_DBG:
+            print('get_cdb() ERR, exception')
+    return cdb
+
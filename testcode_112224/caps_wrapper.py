@@ -0,0 +1,281 @@
+'''Per-port capability matrix for test gating
+
+Most tests decide per port whether to run at all: present? CMIS? coherent?
+LPMode? dual bank? main (sub)port? FW image configured? Each of those costs
+a CLI command or an EEPROM read, and every test asks again. Here they are
+gathered once per session, for all ports in parallel (one port at a time
+per I2C bus), into a PortCaps per port; the tests then only check
+attributes.
+
+The matrix is a snapshot. Things tests change on purpose (presence in the
+reseat test, LPMode, firmware) are not part of it, only what the module and
+the port configuration ARE. A test that reseats or resets a module, or runs
+another firmware, calls caps_invalidate(): the module's ports are read again
+on the next caps_matrix().
+
+Also the CMIS diag page helpers (supported loopback types) used to gate the
+loopback test.
+
+Only intended for local use (i.e., in the switch/router).
+'''
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from api_wrapper import *   # is_cmis, is_sff8xxx, is_coherent, has_lpmode
+from cli_wrapper import *   # cli_all_presence, cli_interface_physport/subport
+from test_cfg    import *   # test_cfg_read, test_cfg_portcfg
+from sched_wrapper import * # sched_i2c_groups
+
+
+# Local Constants
+CAPS_MAX_WORKERS    = 16
+
+cmd_int_show_eeprom_hex = 'sudo sfputil show eeprom-hexdump -p ' # --page <page>
+
+# Spec families
+CAPS_CMIS       = 'cmis'
+CAPS_SFF8636    = 'sff8636'
+CAPS_SFF8436    = 'sff8436'
+CAPS_SFF8472    = 'sff8472'
+
+# CMIS loopback types (page 0x13 byte 128 bitmask)
+LB_NONE         = 0x00
+LB_MEDIA_OUTPUT = 0x01 # media output looped back to input (inwards towards txceiver)
+LB_MEDIA_INPUT  = 0x02 # media input looped back to output (outward towards fiber)
+LB_HOST_OUTPUT  = 0x04 # host output looped back to input  (inwards towards txceiver)
+LB_HOST_INPUT   = 0x08 # host input looped back to output  (outward towards host)
+# CMIS loopback type cmd substrings
+STR_LB_NONE         = 'none'
+STR_LB_MEDIA_OUTPUT = 'media-side-output'
+STR_LB_MEDIA_INPUT  = 'media-side-input'
+STR_LB_HOST_OUTPUT  = 'host-side-output'
+STR_LB_HOST_INPUT   = 'host-side-input'
+
+LOOPTYPE_STRINGS = {
+    LB_NONE         : STR_LB_NONE,
+    LB_MEDIA_OUTPUT : STR_LB_MEDIA_OUTPUT,
+    LB_MEDIA_INPUT  : STR_LB_MEDIA_INPUT,
+    LB_HOST_OUTPUT  : STR_LB_HOST_OUTPUT,
+    LB_HOST_INPUT   : STR_LB_HOST_INPUT,
+}
+
+
+#----------------------------------------------------------------------------
+# CMIS diag pages
+#----------------------------------------------------------------------------
+
+def caps_support_diags(intf, namespace=''):
+    '''Return True if txceiver supports diag pages 0x13-0x14 (page 1 byte 142 bit 5)
+    '''
+    rc = False
+
+    cmdstr = cmd_int_show_eeprom_hex + ' ' + intf + ' --page 0x01'
+    clistr = cli_wrap_sh(cmdstr)
+    try:
+        lines = clistr.splitlines()
+        line = lines[12+10]
+        item = line.split()[15] # byte 0x8e(142)
+        val = int(item, 16)
+        if val & 0x20:
+            rc = True
+    except:
+        rc = False
+
+    return rc
+
+def _caps_loopbacks(intf):
+    # diag page 0x13; only there if caps_support_diags()
+    loops = 0
+    cmdstr = cmd_int_show_eeprom_hex + ' ' + intf + ' --page 0x13'
+    clistr = cli_wrap_sh(cmdstr)
+    try:
+        lines = clistr.splitlines()
+        line = lines[12+10]
+        item = line.split()[1]  # byte 0x80(128)
+        val = int(item, 16)
+        loops = val & 0x0f      # ignoring per-lane and simultaneous bits
+    except:
+        pass
+    return loops
+
+def caps_supported_loopbacks(intf, namespace=''):
+    '''Return bitmask of supported loopback types.
+
+    Ref.: CMIS 5.0 Fig.8-3 & Table 8-89.
+    '''
+    loops = 0
+    if caps_support_diags(intf, namespace):
+        loops = _caps_loopbacks(intf)
+    return loops
+
+
+#----------------------------------------------------------------------------
+# Capability matrix
+#----------------------------------------------------------------------------
+
+class PortCaps(object):
+    '''Capabilities of one port and the module in it.
+
+    present     module present (at the time the matrix was built)
+    family      CAPS_CMIS, CAPS_SFF8636, CAPS_SFF8436, CAPS_SFF8472; None if
+                not present or unknown
+    cmis        family == CAPS_CMIS
+    coherent    CMIS coherent (C-CMIS)
+    lpmode      supports LPMode
+    dual_bank   dual bank FW, per test config
+    physport    physical port number
+    subport     subport number, 0 for non-breakout ports
+    main_port   subport 0 or 1; where firmware and module-wide tests run
+    breakout    all (sub)ports of the same physical port (in the matrix),
+                incl. this one
+    diags       CMIS diag pages 0x13-0x14 supported
+    loopbacks   bitmask of supported loopback types (LB_*)
+    fw_img      valid FW image path per test config, None if none (as
+                configured; test_cfg_fw_img_path checks and stages it)
+    '''
+    __slots__ = ('intf', 'present', 'family', 'cmis', 'coherent', 'lpmode', 'dual_bank',
+                 'physport', 'subport', 'main_port', 'breakout', 'diags', 'loopbacks', 'fw_img')
+
+    def __init__(self, intf):
+        self.intf = intf
+        self.present = False
+        self.family = None
+        self.cmis = False
+        self.coherent = False
+        self.lpmode = False
+        self.dual_bank = False
+        self.physport = None
+        self.subport = 0
+        self.main_port = True
+        self.breakout = [intf]
+        self.diags = False
+        self.loopbacks = LB_NONE
+        self.fw_img = None
+
+    def fw_download_ok(self):
+        '''True if firmware download tests apply: present, dual bank CMIS
+        main port with a FW image.'''
+        return self.present and self.cmis and self.dual_bank and self.main_port and bool(self.fw_img)
+
+    def __repr__(self):
+        return 'PortCaps(%s)' % (', '.join('%s=%s' % (a, getattr(self, a)) for a in self.__slots__))
+
+
+def _caps_family(intf):
+    if is_cmis(intf):
+        return CAPS_CMIS
+    if is_sff8636(intf):
+        return CAPS_SFF8636
+    if is_sff8436(intf):
+        return CAPS_SFF8436
+    if is_sff8472(intf):
+        return CAPS_SFF8472
+    return None
+
+def _caps_port(intf, present, test_cfg, switchname, namespace):
+    caps = PortCaps(intf)
+    caps.physport = cli_interface_physport(intf, namespace)
+    caps.subport = cli_interface_subport(intf, namespace)
+    caps.main_port = caps.subport in (0, 1)
+
+    port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace) if test_cfg else None
+    if port_cfg:
+        caps.dual_bank = bool(port_cfg['dual_bank_support'])
+        img_path = port_cfg.get('firmware_valid_image')
+        if img_path and os.path.isfile(img_path):
+            caps.fw_img = img_path
+
+    caps.present = present
+    if not present:
+        return caps
+    caps.family = _caps_family(intf)
+    caps.cmis = caps.family == CAPS_CMIS
+    caps.lpmode = has_lpmode(intf)
+    if caps.cmis:
+        caps.coherent = is_coherent(intf)
+        caps.diags = caps_support_diags(intf, namespace)
+        if caps.diags:
+            caps.loopbacks = _caps_loopbacks(intf)
+    return caps
+
+def caps_build(ports, test_cfg=None, switchname=None, namespace='', max_workers=CAPS_MAX_WORKERS):
+    '''Return dict {port: PortCaps} for <ports>, gathered in parallel across
+    I2C buses (sched_i2c_groups), one port at a time per bus: nothing says
+    the platform's sfp objects are thread-safe, and ports on one bus would
+    only take turns on it anyway.
+    '''
+    if test_cfg is None:
+        test_cfg = test_cfg_read()
+    presence = cli_all_presence()   # one bulk read, before the threads
+    scope = cli_step_current()
+    built = dict()
+
+    def build_group(group_ports):
+        with cli_step_scope(scope):
+            for intf in group_ports:
+                built[intf] = _caps_port(intf, presence.get(intf) == 'Present', test_cfg, switchname, namespace)
+
+    groups = list(sched_i2c_groups(ports).values())
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(groups)))) as pool:
+        for f in [pool.submit(build_group, gp) for gp in groups]:
+            f.result()
+    matrix = dict((intf, built[intf]) for intf in ports)
+
+    # breakout groups, from the physical ports
+    groups = dict()
+    for intf, caps in matrix.items():
+        groups.setdefault(caps.physport, list()).append(intf)
+    for intf, caps in matrix.items():
+        if caps.physport is not None:
+            caps.breakout = groups[caps.physport]
+    return matrix
+
+
+_caps_matrices  = dict()    # (switch, namespace, ports, cfg digest) -> {port: PortCaps}
+_caps_stale     = set()     # (matrix key, port) to read again (caps_invalidate)
+_caps_lock      = threading.Lock()
+
+def caps_matrix(ports, switchname=None, namespace='', test_cfg=None):
+    '''Return the session's capability matrix {port: PortCaps} for <ports>;
+    built on first use (caps_build), the same dict after that. Ports of
+    modules changed since (caps_invalidate) are read again, their PortCaps
+    updated in place.
+    '''
+    if test_cfg is None:
+        test_cfg = test_cfg_read()
+    key = (switchname, namespace, tuple(ports), test_cfg.digest if test_cfg else None)
+    with _caps_lock:
+        matrix = _caps_matrices.get(key)
+        if matrix is None:
+            matrix = _caps_matrices[key] = caps_build(list(ports), test_cfg, switchname, namespace)
+        stale = [intf for intf in matrix if (key, intf) in _caps_stale]
+        if stale:
+            presence = cli_all_presence()
+            for intf in stale:
+                caps = matrix[intf]
+                fresh = _caps_port(intf, presence.get(intf) == 'Present', test_cfg, switchname, namespace)
+                for attr in PortCaps.__slots__:
+                    if attr != 'breakout':
+                        setattr(caps, attr, getattr(fresh, attr))
+                _caps_stale.discard((key, intf))
+    return matrix
+
+def caps_invalidate(intf):
+    '''Tell the matrices the module in <intf> changed (reseated, reset,
+    firmware run): presence and module capabilities of all its (sub)ports
+    are read again on the next caps_matrix().
+    '''
+    with _caps_lock:
+        for key, matrix in _caps_matrices.items():
+            caps = matrix.get(intf)
+            if caps is not None:
+                _caps_stale.update((key, p) for p in caps.breakout)
+
+def caps_reset():
+    '''Forget all capability matrices (e.g. after modules were swapped), and
+    the auto-selected test config (test_cfg_auto).'''
+    with _caps_lock:
+        _caps_matrices.clear()
+        _caps_stale.clear()
+    test_cfg_auto_reset()
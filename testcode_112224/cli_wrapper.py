@@ -4,15 +4,22 @@ instead of remotely on server.
 Might be usable for remote as well as local use, but there may be more appropriate 
 (database based) APIs for remote use.
 '''
+import json
 import os
 import re
 import sys
+import threading
+import time
 import signal,subprocess
+import pty,select
 from time import sleep
 from contextlib import contextmanager
 
+from trace_wrapper import *     # trace_span, trace_proc_begin/end
+
 
 _CLI_WRAP_DBG = True
+_CLI_PROC_KILL_WAIT_S = 10.0    # [s] for a killed process to end after SIGTERM, then SIGKILL
 
 
 #----------------------------------------------------------------------------
@@ -27,7 +34,8 @@ def cli_wrap(cmdstr, paramstr=None):
     cmd_items = cmdstr.split()
     if paramstr:
         cmd_items.append(paramstr)
-    resp = subprocess.run(cmd_items, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    with trace_span(cmdstr, 'cli'):
+        resp = subprocess.run(cmd_items, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     if resp.returncode != 0:
         if _CLI_WRAP_DBG:
             print('cli_wrap ERR   :', resp.returncode, ":", resp.stderr.decode("utf-8"))
@@ -41,7 +49,8 @@ def cli_wrap_sh(cmdstr):
     cmdstr      command string to be split
     '''
     cmd_items = [cmdstr]
-    resp = subprocess.run(cmd_items, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
+    with trace_span(cmdstr, 'cli'):
+        resp = subprocess.run(cmd_items, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
     if resp.returncode != 0:
         if _CLI_WRAP_DBG:
             print('cli_wrap_sh ERR   :', resp.returncode, ":", resp.stderr.decode("utf-8"))
@@ -57,7 +66,8 @@ def cli_wrap_sh_grep(cmdstr):
     So here we allow return code 1 and check stderr as well.
     '''
     cmd_items = [cmdstr]
-    resp = subprocess.run(cmd_items, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
+    with trace_span(cmdstr, 'cli'):
+        resp = subprocess.run(cmd_items, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
     if (resp.returncode != 0 and resp.returncode != 1) or (len(resp.stderr) > 0):
         if _CLI_WRAP_DBG:
             print('cli_wrap_sh ERR:', resp.returncode, ":", resp.stderr.decode("utf-8"))
@@ -65,6 +75,32 @@ def cli_wrap_sh_grep(cmdstr):
         return None
     return resp.stdout.decode("utf-8")
 
+def cli_wrap_lines(cmdstr):
+    ''' Generator version of cli_wrap; yields output lines (without "\\n")
+    while the command is still running, instead of returning all output as
+    one big string at the end.
+    cmdstr      command string to be split
+    stderr is discarded: nothing reads it while stdout is streamed, so a PIPE
+    could fill up and block the command. If the caller stops iterating early
+    the command is killed and reaped.
+    '''
+    with trace_span(cmdstr, 'cli'):
+        p = subprocess.Popen(cmdstr.split(), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        done = False
+        try:
+            for line in p.stdout:
+                yield line.decode("utf-8").rstrip('\r\n')
+            done = True
+        finally:
+            if not done and p.poll() is None:
+                p.kill()
+            p.stdout.close()
+            rc = p.wait()
+    if rc != 0 and done:
+        if _CLI_WRAP_DBG:
+            print('cli_wrap_lines ERR   :', rc)
+            print('cli_wrap_lines args  :', p.args)
+
 
 def cli_output2dict(clistr, delimiter=':'):
     '''Try to make a dict from CLI output. 
@@ -85,6 +121,286 @@ def cli_output2dict(clistr, delimiter=':'):
     return outdict
 
 
+def cli_table2dict(clistr, key_col=0):
+    '''Make a dict from CLI table output, keyed by the <key_col> column.
+
+    Rows before the "-----  -----" header separator are skipped. The value is
+    the rest of the row (all columns after <key_col>) joined by single spaces,
+    so multi-word values like "Not present" are kept intact.
+
+    admin@sonic:~$ sudo sfputil show presence
+    Port        Presence
+    ----------  ----------
+    Ethernet0   Present
+    Ethernet4   Not present
+    ..
+    -> {'Ethernet0': 'Present', 'Ethernet4': 'Not present', ..}
+    '''
+    outdict = dict()
+    if not clistr:
+        return outdict
+    in_rows = False
+    for line in clistr.splitlines():
+        items = line.split()
+        if not items:
+            continue
+        if not in_rows:
+            # header separator: only dashes
+            if all(x.strip('-') == '' for x in items):
+                in_rows = True
+            continue
+        if len(items) > key_col:
+            outdict[items[key_col]] = ' '.join(items[key_col+1:])
+    return outdict
+
+
+#----------------------------------------------------------------------------
+# Per test step cache for bulk (all ports) CLI output.
+# Some CLI commands print all ports in one table when no port is given. Run
+# those once, and share the parsed result between all ports handled in the
+# same test step. Call cli_step_reset() whenever port state has changed
+# (shutdown, reset, LPMode, ..) and the cached tables may be stale.
+#
+# One test at a time shares the process wide cache. Different tests running
+# concurrently (test_sched jobs) each use a cache of their own (cli_step_scope),
+# so one test's reset or module changes never show in another's tables.
+#----------------------------------------------------------------------------
+
+class CliStepCache(object):
+    '''Bulk CLI output cached for one test step (see cli_step_scope).
+    gen is incremented by every reset.'''
+    __slots__ = ('cache', 'gen', 'lock')
+
+    def __init__(self):
+        self.cache = dict()
+        self.gen = 0
+        self.lock = threading.Lock()
+
+_cli_step_shared = CliStepCache()
+_cli_step_local = threading.local()     # .scope: CliStepCache of the enclosing cli_step_scope
+_cli_step_missing = object()
+
+def cli_step_current():
+    '''Return the step cache (CliStepCache) this thread uses.'''
+    return getattr(_cli_step_local, 'scope', None) or _cli_step_shared
+
+@contextmanager
+def cli_step_scope(scope=None):
+    '''Use step cache <scope> (CliStepCache; default: a new, empty one) in
+    this thread for the enclosed block. Threads working for the same test
+    pass theirs on: cli_step_scope(cli_step_current()) in the worker.
+    '''
+    prev = getattr(_cli_step_local, 'scope', None)
+    _cli_step_local.scope = scope if scope is not None else CliStepCache()
+    try:
+        yield _cli_step_local.scope
+    finally:
+        _cli_step_local.scope = prev
+
+def cli_step_reset():
+    '''Start a new test step; forget all cached bulk CLI output (of this
+    thread's cli_step_scope).
+    '''
+    scope = cli_step_current()
+    with scope.lock:
+        scope.cache.clear()
+        scope.gen += 1
+
+def _cli_step_cached(key, func, *args):
+    '''Return cached func(*args) result for <key>, calling func only once per step.
+
+    With ports tested in parallel threads, func runs unlocked and may run
+    more than once for a key. A result is only cached if no cli_step_reset()
+    happened while func ran: a table read before another thread changed its
+    port (and reset) must not be handed out after that reset.
+    '''
+    scope = cli_step_current()
+    with scope.lock:
+        val = scope.cache.get(key, _cli_step_missing)
+        gen = scope.gen
+    if val is _cli_step_missing:
+        val = func(*args)
+        with scope.lock:
+            if scope.gen == gen:
+                scope.cache[key] = val
+    return val
+
+
+def _cli_all_table(cmdstr):
+    clistr = cli_wrap(cmdstr)
+    assert clistr, '%s failed' % (cmdstr)
+    return cli_table2dict(clistr)
+
+def cli_all_presence():
+    '''Return dict {port: presence} for all ports, e.g. {'Ethernet0': 'Present', ..}
+
+    One 'sudo sfputil show presence' per test step.
+    '''
+    cmdstr = 'sudo sfputil show presence'
+    return _cli_step_cached(cmdstr, _cli_all_table, cmdstr)
+
+def cli_all_lpmode():
+    '''Return dict {port: LPMode} for all ports, e.g. {'Ethernet0': 'Off', ..}
+
+    One 'sudo sfputil show lpmode' per test step.
+    '''
+    cmdstr = 'sudo sfputil show lpmode'
+    return _cli_step_cached(cmdstr, _cli_all_table, cmdstr)
+
+def _cli_json(cmdstr):
+    clistr = cli_wrap(cmdstr)
+    try:
+        return json.loads(clistr) if clistr else dict()
+    except ValueError:
+        return dict()
+
+def cli_all_port_cfg(namespace=''):
+    '''Return dict {port: {field: value}} of the CONFIG_DB PORT table, e.g.
+    {'Ethernet0': {'index': '1', 'subport': '1', 'lanes': '0,1,2,3', ..}, ..};
+    empty dict on error.
+
+    One 'sonic-cfggen -d --var-json PORT' per test step, instead of a
+    sonic-db-cli call per port and field.
+    '''
+    cmdstr = 'sonic-cfggen -d --var-json PORT'
+    if namespace:
+        cmdstr += ' -n ' + namespace
+    return _cli_step_cached(cmdstr, _cli_json, cmdstr)
+
+def cli_all_lldp_neighbors():
+    '''Return dict {local port: (remote device, remote port descr)} for all
+    ports with an LLDP neighbor.
+
+    admin@sonic:~$ show lldp table
+    LocalPort    RemoteDevice  RemotePortID       Capability  RemotePortDescr
+    -----------  ------------  -----------------  ----------  ---------------
+    Ethernet0    sonic         cc:1a:a3:91:b9:78  BR          Ethernet8
+    ..
+    Total entries displayed:  2
+
+    One 'show lldp table' per test step.
+    '''
+    cmdstr = 'show lldp table'
+    table = _cli_step_cached(cmdstr, _cli_all_table, cmdstr)
+    neighbors = dict()
+    for port, row in table.items():
+        items = row.split()
+        if _valid_portname(port) and len(items) >= 2:
+            neighbors[port] = (items[0], items[-1])
+    return neighbors
+
+def cli_all_error_status(hw=False):
+    '''Return dict {port: error status} for all ports, e.g. {'Ethernet0': 'OK', ..}
+
+    hw      False: status relying on DB, True: status read from hardware (-hw)
+
+    One 'show interfaces transceiver error-status [-hw]' per test step.
+    '''
+    cmdstr = 'show interfaces transceiver error-status'
+    if hw:
+        cmdstr += ' -hw'
+    return _cli_step_cached(cmdstr, _cli_all_table, cmdstr)
+
+def _cli_show_version(cmdstr):
+    return cli_output2dict(cli_wrap(cmdstr), delimiter=':')
+
+def cli_show_version():
+    '''Return dict of "show version" output, e.g.
+
+    admin@sonic:~$ show version
+    SONiC Software Version: SONiC.202311.523913-1f6fd1aad
+    ..
+    Platform: x86_64-8101_32fh_o-r0
+    HwSKU: Cisco-8101-O8C48
+    ..
+    -> {'SONiC Software Version': 'SONiC.202311.523913-1f6fd1aad', ..,
+        'Platform': 'x86_64-8101_32fh_o-r0', 'HwSKU': 'Cisco-8101-O8C48', ..}
+
+    Lines with more than one ':' (Uptime, ..) are left out. One 'show
+    version' per test step.
+    '''
+    cmdstr = 'show version'
+    return _cli_step_cached(cmdstr, _cli_show_version, cmdstr)
+
+
+#----------------------------------------------------------------------------
+# All-ports EEPROM/DOM snapshots
+# "show interfaces transceiver eeprom [-d]", "show interfaces transceiver info"
+# and "sfputil show eeprom [-d]" all dump every port when no port is given:
+#
+#   Ethernet0: SFP EEPROM detected
+#           Active Firmware: 0.5.0
+#           ..
+#           ChannelMonitorValues:
+#                   RX1Power: -0.994dBm
+#                   ..
+#           ModuleMonitorValues:
+#                   Temperature: 24.543C
+#                   Vcc: 3.25Volts
+#   Ethernet4: SFP EEPROM detected
+#           ..
+#----------------------------------------------------------------------------
+
+def cli_eeprom_sections(lines, delimiter=':'):
+    '''Split all-ports EEPROM output into per-port sections.
+
+    Generator; consumes <lines> one at a time and yields (port, clidict) as
+    soon as each port's section is complete, so the full output is never held
+    in memory. Each clidict is the same as cli_output2dict() would give for
+    the single-port command, i.e. nested blocks (ChannelMonitorValues,
+    ModuleMonitorValues, ..) are flattened into the same dict.
+
+    A section starts at an unindented "<port>: ..." line.
+    '''
+    port    = None
+    clidict = None
+    for line in lines:
+        if line and not line[0].isspace():
+            name = line.split(delimiter)[0].strip()
+            if _valid_portname(name):
+                if port:
+                    yield port, clidict
+                port    = name
+                clidict = dict()
+        if port is None:
+            continue    # anything before the first port
+        try:
+            k,v = line.strip().split(delimiter)
+            clidict[k.strip()] = v.strip()
+        except:
+            # ignore lines that don't fit (same as cli_output2dict)
+            continue
+    if port:
+        yield port, clidict
+
+
+class EepromSnapshot():
+    '''Per-port dicts parsed from ONE run of an all-ports EEPROM/DOM command.
+
+    All per-port checks in a test step can read from the same snapshot instead
+    of running the (slow) command once per port.
+    '''
+    def __init__(self, cmdstr):
+        self.cmdstr = cmdstr
+        self.ports  = dict()
+        for port, clidict in cli_eeprom_sections(cli_wrap_lines(cmdstr)):
+            self.ports[port] = clidict
+
+    def port(self, portname):
+        '''Return dict for <portname> (as cli_output2dict), None if not found.
+        '''
+        return self.ports.get(portname)
+
+def cli_eeprom_snapshot(cmdstr):
+    '''Return EepromSnapshot of all-ports command <cmdstr> (no port argument).
+
+    E.g. cli_eeprom_snapshot('sudo sfputil show eeprom -d')
+    Runs <cmdstr> once per test step, see cli_step_reset().
+    '''
+    cmdstr = cmdstr.strip()
+    return _cli_step_cached(('snapshot', cmdstr), EepromSnapshot, cmdstr)
+
+
 #----------------------------------------------------------------------------
 # interface related CLi commands
 #----------------------------------------------------------------------------
@@ -131,19 +447,24 @@ def cli_interface_desc(portname):
 
 def cli_interface_present(portname):
     ''' Return True if transceiver is present, False otherwise (incl. on error).
+
+    Reads the all-ports presence table (once per test step, see cli_all_presence).
     '''
     pres = False
 
-    cmdstr  = 'sudo sfputil show presence -p ' + portname
-    clistr  = cli_wrap(cmdstr)
-    lines   = clistr.splitlines()
-    line    = lines[2]
-    items   = line.split()
-    if items[0] == portname and items[1] == 'Present':
+    if cli_all_presence().get(portname) == 'Present':
         pres = True
 
     return pres
 
+def cli_interface_lpmode(portname):
+    ''' Return LPMode ('On' or 'Off') of transceiver, None if not found.
+
+    Reads the all-ports LPMode table (once per test step, see cli_all_lpmode).
+    Call cli_step_reset() first if LPMode may have changed since last read.
+    '''
+    return cli_all_lpmode().get(portname)
+
 
 def cli_interface_admin_status_up(portname):
     ''' Return True if interface admin stat  is up, False otherwise (incl. invalid name).
@@ -205,9 +526,9 @@ def cli_interface_num_medialanes(portname):
     '''Return number of media lanes for port.
     '''
     num_lanes = None
-    cmdstr = 'show interfaces transceiver eeprom ' + portname
-    clistr  = cli_wrap(cmdstr)                          # run CLI command
-    clidict = cli_output2dict(clistr, delimiter=':')    # decode output
+    # all ports at once, shared by all ports in the test step
+    cmdstr = 'show interfaces transceiver eeprom'
+    clidict = cli_eeprom_snapshot(cmdstr).port(portname) or dict()
     if 'Media Lane Count' in clidict:
         num_lanes = clidict['Media Lane Count']
         try:
@@ -268,6 +589,10 @@ def cli_interface_physport(port, namespace):
     '''
     physport = None
 
+    entry = cli_all_port_cfg(namespace).get(port)
+    if entry and entry.get('index'):
+        return int(entry['index'])
+
     #sonic-db-cli -n "" CONFIG_DB hget "PORT|Ethernet4" "index"
     #0
     cmd = 'sonic-db-cli -n "' + namespace + '" CONFIG_DB hget "PORT|' + port + '" "index"'
@@ -285,6 +610,10 @@ def cli_interface_subport(port, namespace):
     '''Return subport number, or 0 for non-breakout ports.
     '''
     subport = 0
+    entry = cli_all_port_cfg(namespace).get(port)
+    if entry:
+        return int(entry.get('subport') or 0)
+
     cmd = 'sonic-db-cli -n "' + namespace + '" CONFIG_DB hget "PORT|' + port + '" "subport"'
     clistr = cli_wrap_sh(cmd)
     assert clistr , '%s failed' % (cmd)
@@ -691,11 +1020,13 @@ def cli_proc_spawn(cmdstr):
     '''
     # exec (requires plain cmdstr as arg) + 'shell=True' makes process killable
     # - but may wipe out stdout/stderr?
+    trace_cmd = cmdstr
     cmdstr = 'exec ' + cmdstr
 
     #p = subprocess.Popen(cmdstr, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
     p = subprocess.Popen(cmdstr, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
                        shell=True, preexec_fn=os.setsid)
+    trace_proc_begin(p, trace_cmd)
     return p
 
 def cli_proc_running(p):
@@ -706,9 +1037,30 @@ def cli_proc_running(p):
 
 def cli_proc_kill(p):
     '''Kill process.
+    A pty process is also waited for: SIGKILL if SIGTERM doesn't end it
+    within _CLI_PROC_KILL_WAIT_S (e.g. sfputil busy with a CDB write).
     '''
     #p.kill()
-    os.killpg(os.getpgid(p.pid), signal.SIGTERM)
+    try:
+        os.killpg(os.getpgid(p.pid), signal.SIGTERM)
+    except ProcessLookupError:
+        pass    # already ended
+    if getattr(p, 'pty_fd', None) is not None:
+        try:
+            p.wait(timeout=_CLI_PROC_KILL_WAIT_S)
+        except subprocess.TimeoutExpired:
+            try:
+                os.killpg(os.getpgid(p.pid), signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            try:
+                p.wait(timeout=_CLI_PROC_KILL_WAIT_S)
+            except subprocess.TimeoutExpired:
+                print('cli_proc_kill: pid %d did not end after SIGKILL' % (p.pid))
+        finally:
+            os.close(p.pty_fd)
+            p.pty_fd = None
+    trace_proc_end(p)
 
 
 def cli_proc_read_output(p):
@@ -725,3 +1077,67 @@ def cli_proc_read_errors(p):
     '''
     return p.stderr.readlines()
 
+
+#----------------------------------------------------------------------------
+# Process with progress
+# sfputil (click.progressbar) only draws its progress bar on a terminal;
+# with a pipe there's no "%" output at all. So give the process a pty and
+# parse the bar, e.g. "Downloading ...  [#####-----]   42%  00:09:51".
+#----------------------------------------------------------------------------
+
+_RE_PROGRESS_PCT = re.compile(r'(\d{1,3})%')
+
+def cli_proc_spawn_pty(cmdstr):
+    '''Start pollable, killable process (see cli_proc_spawn) on a pty.
+
+    Returns Popen object; use cli_proc_progress() to read its progress.
+    cli_proc_kill() also closes the pty.
+    '''
+    trace_cmd = cmdstr
+    cmdstr = 'exec ' + cmdstr
+    master, slave = pty.openpty()
+    p = subprocess.Popen(cmdstr, stdin=slave, stdout=slave, stderr=slave,
+                       shell=True, preexec_fn=os.setsid)
+    os.close(slave)
+    trace_proc_begin(p, trace_cmd)
+    p.pty_fd = master
+    p.pty_tail = ''         # last bit of output, for split "%" lines
+    p.progress = None
+    return p
+
+def cli_proc_progress(p, timeout=0.0):
+    '''Read pty output available (waiting up to <timeout> s for some); return
+    latest progress percentage (0..100) seen so far, None if none yet.
+    '''
+    while p.pty_fd is not None:
+        ready, _, _ = select.select([p.pty_fd], [], [], timeout)
+        if not ready:
+            break
+        try:
+            data = os.read(p.pty_fd, 4096)
+        except OSError:     # EIO: process gone, pty closed
+            break
+        if not data:
+            break
+        text = p.pty_tail + data.decode('utf-8', 'replace')
+        pcts = _RE_PROGRESS_PCT.findall(text)
+        if pcts:
+            p.progress = int(pcts[-1])
+        p.pty_tail = text[-16:]
+        timeout = 0.0
+    return p.progress
+
+@trace_func('wait')
+def cli_proc_wait_progress(p, percentage, timeout, poll=0.2):
+    '''Wait until process <p> (cli_proc_spawn_pty) reports at least
+    <percentage> % done. Return progress reached; less than <percentage>
+    if the process ended or <timeout> s passed first.
+    '''
+    t_limit = time.time() + timeout
+    progress = cli_proc_progress(p)
+    while (progress is None or progress < percentage) and time.time() < t_limit:
+        if not cli_proc_running(p):
+            progress = cli_proc_progress(p)     # whatever is left in the pty
+            break
+        progress = cli_proc_progress(p, poll)
+    return progress or 0
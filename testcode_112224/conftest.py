@@ -0,0 +1,106 @@
+'''pytest fixtures for local runs (i.e., in the switch/router)
+
+The fixtures the tests take (duthosts, xcvr_skip_list, ..) normally come from
+the sonic-mgmt test environment. Here they are the dummy data of
+util_wrapper, set up once per session, so e.g.
+
+    python -m pytest -q test_show.py
+
+runs the tests like the test_the_* drivers do (those are not collected: they
+would run every test a second time). xcvr_session gives fixtures the shared
+session data (util_session: ports, namespace, test config, capabilities),
+the same the tests get from util_session().
+Test outcomes go to the result records (result_wrapper) too.
+
+    python -m pytest -q --incremental
+
+skips static checks on ports unchanged since their last pass (see
+util_incr_skip), and
+
+    python -m pytest -q --timeline trace.json
+
+records a Chrome/Perfetto timeline of the run (trace_wrapper).
+
+Only intended for local use, NOT for normal, remote test setups.
+'''
+import pytest
+
+from util_wrapper import *  # dummy data, util_session
+from result_wrapper import *    # result_record, result_flush
+from trace_wrapper import *     # trace_start, trace_stop
+
+
+# Not tests: test_cfg.py is the test config module (test_cfg_* functions)
+collect_ignore = ['test_cfg.py']
+
+
+def pytest_addoption(parser):
+    parser.addoption('--incremental', action='store_true', default=False,
+                     help='skip static checks (UTIL_INCR_TESTS) on ports whose module, firmware, '
+                          'SONiC build, test code and test config are unchanged since the last pass')
+    parser.addoption('--timeline', metavar='FILE', default=None,
+                     help='write a Chrome trace-event timeline of CLI calls, EEPROM reads, sleeps, '
+                          'waits and firmware processes to FILE')
+
+def pytest_configure(config):
+    util_incremental(config.getoption('incremental'))
+    if config.getoption('timeline'):
+        trace_start(config.getoption('timeline'))
+
+def pytest_collection_modifyitems(config, items):
+    # star imports put the test_cfg_* functions into every test module; only
+    # collect test functions defined in the module itself. The test_the_*
+    # drivers (standalone runs) run the collected tests again, and test_sched
+    # all of them once more: deselect those.
+    keep = list()
+    drop = list()
+    for item in items:
+        func = getattr(item, 'function', None)
+        if func is None:
+            keep.append(item)
+        elif func.__module__ != item.module.__name__:
+            continue
+        elif func.__name__.startswith('test_the_'):
+            drop.append(item)
+        else:
+            keep.append(item)
+    if drop:
+        config.hook.pytest_deselected(items=drop)
+    items[:] = keep
+
+def pytest_runtest_logreport(report):
+    # outcome of the test as a whole (per port: see the tests' own records)
+    if report.when == 'call' or not report.passed:
+        error = report.longreprtext.splitlines()[-1] if report.failed and report.longreprtext else None
+        result_record(report.nodeid.split('::')[-1], None, report.when, report.passed if not report.skipped else None,
+                      t_start=report.start, t_end=report.stop, error=error)
+
+def pytest_sessionfinish(session, exitstatus):
+    result_flush()
+    trace_stop()
+
+
+@pytest.fixture(scope='session')
+def xcvr_session():
+    util_wrapper_init()
+    return util_session()
+
+@pytest.fixture(scope='session')
+def duthosts(xcvr_session):
+    return my_duthosts
+
+@pytest.fixture(scope='session')
+def enum_rand_one_per_hwsku_frontend_hostname(xcvr_session):
+    return my_enum_rand_one_per_hwsku_frontend_hostname
+
+@pytest.fixture(scope='session')
+def enum_frontend_asic_index(xcvr_session):
+    return my_enum_frontend_asic_index
+
+@pytest.fixture(scope='session')
+def conn_graph_facts(xcvr_session):
+    return my_conn_graph_facts
+
+@pytest.fixture(scope='session')
+def xcvr_skip_list(xcvr_session):
+    return my_xcvr_skip_list
@@ -0,0 +1,331 @@
+'''Wrappers for reading SONiC redis databases (STATE_DB, CONFIG_DB, ..) directly.
+
+Every sonic-db-cli or "show" call is a separate Python process, which adds up
+to seconds when reading data for all ports. Here we talk to redis directly and
+pipeline the requests for all ports into a single round-trip.
+
+Falls back to sonic-db-cli (slow, one call per key) if the redis module or
+the SONiC database config is not available.
+
+Only intended for local use (i.e., in the switch/router).
+'''
+import ast
+import json
+import os
+import re
+import time
+
+try:
+    import redis    # redis-py, part of SONiC base image
+except ImportError:
+    redis = None
+
+from cli_wrapper import *   # cli_wrap_sh, step cache
+from trace_wrapper import * # trace_func
+
+
+_DB_WRAP_DBG = True
+
+# SONiC database config; one include per namespace ('' = default/host)
+_DB_GLOBAL_CFG  = '/var/run/redis/sonic-db/database_global.json'
+_DB_DEFAULT_CFG = '/var/run/redis/sonic-db/database_config.json'
+
+# Transceiver tables published by xcvrd in STATE_DB
+XCVR_TABLES = ['TRANSCEIVER_INFO', 'TRANSCEIVER_DOM_SENSOR',
+               'TRANSCEIVER_STATUS', 'TRANSCEIVER_FIRMWARE_INFO']
+
+
+#----------------------------------------------------------------------------
+# DB field name -> CLI output name, i.e. the keys cli_output2dict() gives for
+# "show interfaces transceiver info/eeprom" and "sfputil show eeprom [-d]".
+# Ref.: sonic-utilities sfputil/main.py QSFP_DD_DATA_MAP etc.
+# Fields not listed here are passed through with their DB name.
+#----------------------------------------------------------------------------
+
+_DB2CLI_INFO = {
+    'type'                      : 'Identifier',
+    'model'                     : 'Vendor PN',
+    'serial'                    : 'Vendor SN',
+    'manufacturer'              : 'Vendor Name',
+    'vendor_oui'                : 'Vendor OUI',
+    'vendor_rev'                : 'Vendor Rev',
+    'vendor_date'               : 'Vendor Date Code(YYYY-MM-DD Lot)',
+    'hardware_rev'              : 'Hardware Revision',
+    'cmis_rev'                  : 'CMIS Rev',
+    'connector'                 : 'Connector',
+    'encoding'                  : 'Encoding',
+    'ext_identifier'            : 'Extended Identifier',
+    'ext_rateselect_compliance' : 'Extended RateSelect Compliance',
+    'nominal_bit_rate'          : 'Nominal Bit Rate(100Mbs)',
+    'specification_compliance'  : 'Specification compliance',
+    'application_advertisement' : 'Application Advertisement',
+    'media_interface_code'      : 'Media Interface Code',
+    'media_interface_technology': 'Media Interface Technology',
+    'host_electrical_interface' : 'Host Electrical Interface',
+    'host_lane_count'           : 'Host Lane Count',
+    'media_lane_count'          : 'Media Lane Count',
+    'host_lane_assignment_option' : 'Host Lane Assignment Options',
+    'media_lane_assignment_option': 'Media Lane Assignment Options',
+    'active_firmware'           : 'Active Firmware',
+    'inactive_firmware'         : 'Inactive Firmware',
+}
+
+_DB2CLI_FIRMWARE = {
+    'active_firmware'           : 'Active Firmware',
+    'inactive_firmware'         : 'Inactive Firmware',
+}
+
+_DB2CLI_STATUS = {
+    'module_state'              : 'Current module state',
+    'module_fault_cause'        : 'Reason of entering the module fault state',
+    'error'                     : 'Error Status',
+}
+
+def _db2cli_dom(field, value):
+    '''Map one TRANSCEIVER_DOM_SENSOR field to (CLI name, CLI value with unit).
+
+    temperature -> Temperature  C
+    voltage     -> Vcc          Volts
+    rx<n>power  -> RX<n>Power   dBm
+    tx<n>bias   -> TX<n>Bias    mA
+    tx<n>power  -> TX<n>Power   dBm
+    '''
+    name = field; unit = ''
+    if field == 'temperature':
+        name = 'Temperature'; unit = 'C'
+    elif field == 'voltage':
+        name = 'Vcc'; unit = 'Volts'
+    else:
+        m = re.match(r'^(rx|tx)(\d+)(power|bias)$', field)
+        if m:
+            name = m.group(1).upper() + m.group(2) + m.group(3).capitalize()
+            unit = 'mA' if m.group(3) == 'bias' else 'dBm'
+    if unit and value not in (None, '', 'N/A'):
+        value = value + unit
+    return name, value
+
+
+#----------------------------------------------------------------------------
+# redis access
+#----------------------------------------------------------------------------
+
+_db_clients = dict()    # (db_name, namespace) -> redis client
+
+def _db_cfg_file(namespace):
+    '''Return database_config.json path for <namespace>, None if not found.
+    '''
+    if not namespace:
+        return _DB_DEFAULT_CFG
+    try:
+        with open(_DB_GLOBAL_CFG) as f:
+            gcfg = json.load(f)
+        for inc in gcfg.get('INCLUDES', []):
+            if inc.get('namespace', '') == namespace:
+                return os.path.normpath(os.path.join(os.path.dirname(_DB_GLOBAL_CFG), inc['include']))
+    except:
+        if _DB_WRAP_DBG:
+            print('_db_cfg_file(%s) ERR, exception' % (namespace))
+    return None
+
+def _db_client(db_name, namespace=''):
+    '''Return (cached) redis client for <db_name> in <namespace>, None if N/A.
+    '''
+    key = (db_name, namespace)
+    if key in _db_clients:
+        return _db_clients[key]
+
+    client = None
+    if redis:
+        try:
+            with open(_db_cfg_file(namespace)) as f:
+                cfg = json.load(f)
+            db   = cfg['DATABASES'][db_name]
+            inst = cfg['INSTANCES'][db['instance']]
+            client = redis.Redis(unix_socket_path=inst['unix_socket_path'],
+                                 db=db['id'], decode_responses=True)
+        except:
+            if _DB_WRAP_DBG:
+                print('_db_client(%s, %s) ERR, using sonic-db-cli' % (db_name, namespace))
+            client = None
+    _db_clients[key] = client
+    return client
+
+
+def _db_cli_hgetall(db_name, key, namespace=''):
+    '''hgetall through sonic-db-cli; {} if key doesn't exist.
+    '''
+    cmd = 'sonic-db-cli -n "' + namespace + '" ' + db_name + ' hgetall "' + key + '"'
+    clistr = cli_wrap_sh(cmd)
+    try:
+        return ast.literal_eval(clistr.strip()) if clistr and clistr.strip() else dict()
+    except:
+        return dict()
+
+def _db_cli_keys(db_name, pattern, namespace=''):
+    cmd = 'sonic-db-cli -n "' + namespace + '" ' + db_name + ' keys "' + pattern + '"'
+    clistr = cli_wrap_sh(cmd)
+    return clistr.split() if clistr else []
+
+
+def db_keys(db_name, pattern, namespace=''):
+    '''Return list of keys in <db_name> matching <pattern>, e.g. 'TRANSCEIVER_INFO|*'
+    '''
+    client = _db_client(db_name, namespace)
+    if client:
+        return list(client.keys(pattern))
+    return _db_cli_keys(db_name, pattern, namespace)
+
+@trace_func('db')
+def db_hgetall_bulk(db_name, keys, namespace=''):
+    '''Return dict {key: {field: value}} for all <keys>, {} for missing keys.
+
+    All keys are fetched in ONE pipelined redis round-trip.
+    '''
+    client = _db_client(db_name, namespace)
+    if client:
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(key)
+        return dict(zip(keys, pipe.execute()))
+
+    return {key: _db_cli_hgetall(db_name, key, namespace) for key in keys}
+
+
+#----------------------------------------------------------------------------
+# Transceiver views
+#----------------------------------------------------------------------------
+
+def db_transceiver_views(ports=None, namespace=''):
+    '''Return dict {port: clidict} of what xcvrd published in STATE_DB.
+
+    TRANSCEIVER_INFO, TRANSCEIVER_DOM_SENSOR, TRANSCEIVER_STATUS and
+    TRANSCEIVER_FIRMWARE_INFO are merged per port and mapped onto the same
+    keys (and unit formats) that cli_output2dict() gives for the "show"/
+    "sfputil" CLI output, e.g. clidict['Vendor SN'], clidict['TX1Power'].
+
+    ports   list of ports, or None for all ports found in TRANSCEIVER_INFO
+            (which costs one extra round-trip for the key lookup)
+
+    Ports without any transceiver data are left out.
+    '''
+    if ports is None:
+        ports = [k.split('|', 1)[1] for k in db_keys('STATE_DB', 'TRANSCEIVER_INFO|*', namespace)]
+
+    keys = [table + '|' + port for port in ports for table in XCVR_TABLES]
+    tables = db_hgetall_bulk('STATE_DB', keys, namespace)
+
+    views = dict()
+    for port in ports:
+        clidict = dict()
+        for field,value in tables.get('TRANSCEIVER_INFO|' + port, {}).items():
+            clidict[_DB2CLI_INFO.get(field, field)] = value
+        for field,value in tables.get('TRANSCEIVER_DOM_SENSOR|' + port, {}).items():
+            name, value = _db2cli_dom(field, value)
+            clidict[name] = value
+        for field,value in tables.get('TRANSCEIVER_STATUS|' + port, {}).items():
+            clidict[_DB2CLI_STATUS.get(field, field)] = value
+        # newer xcvrd moved firmware versions here; takes precedence over INFO
+        for field,value in tables.get('TRANSCEIVER_FIRMWARE_INFO|' + port, {}).items():
+            clidict[_DB2CLI_FIRMWARE.get(field, field)] = value
+        if clidict:
+            views[port] = clidict
+    return views
+
+def db_transceiver_view(port, namespace=''):
+    '''Return STATE_DB transceiver clidict for <port> (see db_transceiver_views),
+    None if not found.
+
+    All ports are fetched in one go, once per test step (see cli_step_reset).
+    '''
+    views = _cli_step_cached(('db_transceiver_views', namespace), db_transceiver_views, None, namespace)
+    return views.get(port)
+
+
+#----------------------------------------------------------------------------
+# DOM freshness
+# After a port state change (shutdown, startup, LPMode, ..) the DOM values
+# read back may still be from before the change. Instead of sleeping a fixed
+# time and hoping for the best, wait for a sample that was taken AFTER the
+# change, and return as soon as there is one.
+#----------------------------------------------------------------------------
+
+_DOM_FRESH_TIMEOUT_S    = 30.0
+_DOM_FRESH_POLL_S       = 0.2
+
+cmd_int_trans_dom_hw    = 'sudo sfputil show eeprom -d -p '
+
+def _db_dom_entry(port, namespace=''):
+    key = 'TRANSCEIVER_DOM_SENSOR|' + port
+    return db_hgetall_bulk('STATE_DB', [key], namespace)[key]
+
+def _db_dom_timestamp(entry):
+    '''Return publish time (epoch seconds) of a DOM entry, None if xcvrd doesn't
+    provide one. Newer xcvrd adds 'last_update_time', either as epoch seconds
+    or in the same format as PORT_TABLE last_up_time ('Thu Oct 03 16:18:15 2024').
+    '''
+    ts = entry.get('last_update_time')
+    if not ts:
+        return None
+    try:
+        return float(ts)
+    except ValueError:
+        pass
+    try:
+        return time.mktime(time.strptime(ts.strip(), '%a %b %d %H:%M:%S %Y'))
+    except ValueError:
+        return None
+
+def db_dom_marker(port, namespace=''):
+    '''Return update marker for <port>'s DOM entry in STATE_DB.
+
+    Take this BEFORE a state change and pass it to dom_wait_fresh(); used to
+    detect a new sample if xcvrd doesn't publish an update time.
+    '''
+    entry = _db_dom_entry(port, namespace)
+    return hash(tuple(sorted(entry.items())))
+
+@trace_func('wait')
+def dom_wait_fresh(port, t_change, namespace='', source='db', marker=None, ready=None,
+                   timeout=_DOM_FRESH_TIMEOUT_S, poll=_DOM_FRESH_POLL_S):
+    '''Wait for a fresh DOM sample of <port>, i.e. one taken after <t_change>
+    (time.time() of the state change). Return it as clidict (same keys as
+    cli_output2dict), or None on timeout.
+
+    source  'db'     poll <port>'s TRANSCEIVER_DOM_SENSOR entry in STATE_DB.
+                     Fresh when its update time is after <t_change>, or (if
+                     xcvrd has no update time) when it differs from <marker>
+                     (see db_dom_marker).
+            'eeprom' read DOM straight from the module (sfputil show eeprom -d).
+                     Every read is a new sample, so <t_change> and <marker>
+                     don't apply; only <ready> decides when to stop.
+    ready   optional predicate(clidict) -> bool the sample must also satisfy,
+            e.g. "Tx power reads off"; the module itself may need a moment to
+            reflect the change in its monitors.
+    timeout [s] give up after; callers replacing a fixed sleep pass that
+            sleep, so a module that never gets <ready> costs no more than
+            before
+    '''
+    t_limit = time.time() + timeout
+    while True:
+        clidict = None
+        if source == 'eeprom':
+            clistr = cli_wrap(cmd_int_trans_dom_hw + port)
+            if clistr:
+                clidict = cli_output2dict(clistr, delimiter=':')
+        else:
+            entry = _db_dom_entry(port, namespace)
+            ts = _db_dom_timestamp(entry)
+            if ts is not None:
+                fresh = ts > t_change
+            elif marker is not None:
+                fresh = hash(tuple(sorted(entry.items()))) != marker
+            else:
+                assert False, 'dom_wait_fresh: no update time in STATE_DB, need marker'
+            if fresh:
+                clidict = dict(_db2cli_dom(f, v) for f,v in entry.items())
+
+        if clidict and (ready is None or ready(clidict)):
+            return clidict
+        if time.time() >= t_limit:
+            return None
+        time.sleep(poll)
@@ -0,0 +1,173 @@
+'''Firmware download throughput benchmark
+
+Download the configured (valid) image to each module several times, varying
+block size, LPL vs. EPL and DOM polling on/off, and record per run:
+total time, bytes/s, CDB block write latency distribution and new I2C errors
+on the port (klog_wrapper). Optionally also time "sfputil firmware download" for comparison.
+
+    python fw_bench.py [-n 3] [--block-sizes 0,2048] [--modes epl,lpl]
+                       [--dom off,on] [--sfputil] [-o fw_bench.json] [port ...]
+
+Results are merged into a JSON file (or CSV with -o x.csv), keyed by platform
+and vendor PN: {platform: {vendor_pn: [run, ..]}}.
+
+Downloads go to the inactive bank, same as test_download_valid_fw; only
+dual-bank CMIS ports with a firmware_valid_image in the test config are used.
+
+Only intended for local use (i.e., in the switch/router).
+'''
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from api_wrapper import *   # is_cmis
+from cli_wrapper import *   # cli_wrap, cli_dom_disabled, cli_interface_subport
+from db_wrapper  import *   # db_transceiver_view
+from test_cfg    import *   # test_cfg_read, test_cfg_fw_image
+from fw_wrapper  import *   # fw_cdb_download
+from klog_wrapper import *  # klog_mark, klog_errors
+
+
+# Local Constants
+cmd_platform        = 'sonic-cfggen -d -v DEVICE_METADATA.localhost.platform'
+cmd_fw_download     = 'sudo sfputil firmware download '
+
+_CSV_FIELDS = ['platform', 'vendor_pn', 'port', 'method', 'epl', 'block_size', 'dom',
+               'run', 'ok', 't_elapsed', 'bytes_per_s', 'blocks',
+               'lat_p50', 'lat_p90', 'lat_p99', 'lat_max', 'i2c_errors', 'msg']
+
+
+def _bench_sfputil(intf, img):
+    t_start = time.time()
+    clistr = cli_wrap_sh(cmd_fw_download + ' ' + intf + ' ' + img.staged_path)
+    ok = bool(clistr) and 'firmware download complete success' in clistr.lower()
+    return {'method': 'sfputil', 'epl': None, 'block_size': None, 'ok': ok,
+            't_elapsed': time.time() - t_start, 'blocks': None,
+            'msg': '' if ok else 'sfputil download failed'}
+
+def _bench_cdb(intf, img, block_size, epl):
+    res = fw_cdb_download(intf, img, block_size=block_size, use_epl=epl)
+    row = {'method': 'cdb', 'epl': res.epl, 'block_size': res.block_size, 'ok': res.ok,
+           't_elapsed': res.t_elapsed, 'blocks': len(res.latencies), 'msg': res.msg}
+    for pct in (50, 90, 99):
+        row['lat_p%d' % pct] = res.latency_pct(pct)
+    row['lat_max'] = max(res.latencies) if res.latencies else None
+    return row
+
+def _bench_variant(intf, img, method, block_size, epl):
+    if method == 'sfputil':
+        return _bench_sfputil(intf, img)
+    return _bench_cdb(intf, img, block_size, epl)
+
+def bench_port(intf, img, runs, block_sizes, modes, doms, sfputil, namespace=''):
+    '''Run all variants on one port; return list of result rows (dicts).
+    '''
+    variants = list()   # (method, block size, EPL)
+    for mode in modes:
+        for block_size in block_sizes:
+            variants.append(('cdb', block_size or None, mode == 'epl'))
+    if sfputil:
+        variants.append(('sfputil', None, None))
+
+    rows = list()
+    for dom in doms:
+        for run in range(runs):
+            for method, block_size, epl in variants:
+                i2c_mark = klog_mark()
+                try:
+                    if dom == 'off':
+                        with cli_dom_disabled(intf, namespace):
+                            row = _bench_variant(intf, img, method, block_size, epl)
+                    else:
+                        row = _bench_variant(intf, img, method, block_size, epl)
+                except AssertionError as ex:
+                    # e.g. LPL-only module asked for EPL; record and go on
+                    row = {'method': method, 'epl': epl, 'block_size': block_size,
+                           'ok': False, 't_elapsed': 0.0, 'msg': str(ex)}
+                row.update({'port': intf, 'dom': dom, 'run': run,
+                            'i2c_errors': len(klog_errors(i2c_mark, intf))})
+                row['bytes_per_s'] = img.size / row['t_elapsed'] if row['ok'] and row['t_elapsed'] else None
+                print('fw_bench %s %s run %d dom %s: %s %.1fs %s' % (intf, row['method'],
+                      run, dom, 'OK' if row['ok'] else 'FAIL', row['t_elapsed'], row['msg']))
+                rows.append(row)
+    return rows
+
+
+def _write_results(fname, platform, results):
+    '''Merge {vendor_pn: [rows]} of <platform> into JSON file, or append to CSV.
+    '''
+    if fname.endswith('.csv'):
+        new = not os.path.isfile(fname)
+        with open(fname, 'a') as f:
+            writer = csv.DictWriter(f, fieldnames=_CSV_FIELDS, extrasaction='ignore')
+            if new:
+                writer.writeheader()
+            for vendor_pn, rows in results.items():
+                for row in rows:
+                    writer.writerow(dict(row, platform=platform, vendor_pn=vendor_pn))
+        return
+
+    table = dict()
+    if os.path.isfile(fname):
+        with open(fname) as f:
+            table = json.load(f)
+    for vendor_pn, rows in results.items():
+        table.setdefault(platform, dict()).setdefault(vendor_pn, list()).extend(rows)
+    tmp = fname + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(table, f, indent=1, sort_keys=True)
+    os.replace(tmp, fname)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Firmware download throughput benchmark')
+    parser.add_argument('-n', '--runs', type=int, default=3, help='runs per variant')
+    parser.add_argument('--block-sizes', default='0', help='comma separated; 0 = max advertised')
+    parser.add_argument('--modes', default='epl,lpl', help='epl and/or lpl')
+    parser.add_argument('--dom', default='off,on', help='DOM polling off and/or on')
+    parser.add_argument('--sfputil', action='store_true', help='also time sfputil download')
+    parser.add_argument('-c', '--cfg', default=TEST_CFG_DEFAULT_FILENAME, help='test config file')
+    parser.add_argument('-o', '--output', default='fw_bench.json', help='.json or .csv')
+    parser.add_argument('ports', nargs='*', help='ports (default: all in test config)')
+    args = parser.parse_args(argv)
+
+    block_sizes = [int(b) for b in args.block_sizes.split(',')]
+    modes = args.modes.split(',')
+    doms = args.dom.split(',')
+    platform = (cli_wrap(cmd_platform) or 'unknown').strip()
+
+    test_cfg = test_cfg_read(args.cfg)
+    assert test_cfg and test_cfg_valid(test_cfg), 'Invalid test config'
+    switchname = test_cfg_switches(test_cfg)[0]
+    ports = args.ports or test_cfg_ports(test_cfg, switchname)
+
+    results = dict()    # vendor_pn -> rows
+    for intf in ports:
+        port_cfg = test_cfg_portcfg(test_cfg, switchname, intf)
+        if not port_cfg or not port_cfg['dual_bank_support'] or not is_cmis(intf):
+            print('fw_bench', intf, 'skipped (not dual bank CMIS)')
+            continue
+        if cli_interface_subport(intf, '') not in (0, 1):
+            print('fw_bench', intf, 'skipped (not main (sub)port)')
+            continue
+        img = test_cfg_fw_image(test_cfg, switchname, intf)
+        if not img:
+            print('fw_bench', intf, 'skipped (no FW image)')
+            continue
+        vendor_pn = (db_transceiver_view(intf) or port_cfg).get('Vendor PN', port_cfg['vendor_pn']).strip()
+        rows = bench_port(intf, img, args.runs, block_sizes, modes, doms, args.sfputil)
+        results.setdefault(vendor_pn, list()).extend(rows)
+
+    if not results:
+        print('fw_bench: nothing to do')
+        return 1
+    _write_results(args.output, platform, results)
+    print('fw_bench: results -> %s' % (args.output))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
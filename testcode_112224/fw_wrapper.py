@@ -0,0 +1,524 @@
+'''Firmware image wrappers/utilities
+
+Firmware image files used by the download tests: image registry (parsed
+and checked once, staged in tmpfs), hashing, and corrupted variants of valid
+images for the invalid-image tests. Also an in-process CDB download engine
+as an alternative to "sfputil firmware download", and a tracker of what is
+in each module's firmware banks, so tests can skip redundant downloads.
+
+Corrupted images are content-addressed: the file name is built from the
+source image hash, the corruption offset and the strategy. So a variant is
+built once, never goes stale if the source image changes, and lives in tmpfs
+(/dev/shm) rather than next to the source image.
+
+Only intended for local use (i.e., in the switch/router).
+'''
+import hashlib
+import mmap
+import os
+import re
+import shutil
+import struct
+import tempfile
+import threading
+import time
+
+from api_wrapper import *   # get_StartCmdPayloadSize, get_FwMgmtFeatures, get_cdb, get_module_fw_info
+from cli_wrapper import *
+from trace_wrapper import * # trace_func
+
+
+# Local Constants
+# tmpfs; falls back to the temp dir if not there (e.g. PC)
+FW_STAGE_DIR        = '/dev/shm/xcvr_fw'
+FW_INVALID_DIR      = '/dev/shm/xcvr_fw_invalid'
+
+# Corruption strategies
+FW_CORRUPT_FLIP     = 'flip'        # invert <count> bytes at offset
+FW_CORRUPT_ZERO     = 'zero'        # zero <count> bytes at offset (0x00 bytes: 0xff)
+FW_CORRUPT_TRUNCATE = 'truncate'    # cut image off at offset
+FW_CORRUPT_STRATEGIES = (FW_CORRUPT_FLIP, FW_CORRUPT_ZERO, FW_CORRUPT_TRUNCATE)
+
+
+_file_hashes    = dict()    # (path, size, mtime) -> sha256 hex digest
+_fw_lock        = threading.Lock()
+
+def fw_file_sha256(path):
+    '''Return sha256 (hex) of file <path>. Cached as long as the file's size
+    and mtime don't change; firmware images are several MB.
+    '''
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    digest = _file_hashes.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        digest = _file_hashes[key] = h.hexdigest()
+    return digest
+
+
+def fw_corrupt_bytes(data, offset, strategy=FW_CORRUPT_FLIP, count=1):
+    '''Return copy of image <data> (bytes) corrupted at <offset> (in memory).
+    Every corrupted byte differs from the original: FW_CORRUPT_ZERO writes
+    0xff over bytes that are 0x00 already.
+    '''
+    assert strategy in FW_CORRUPT_STRATEGIES, 'unknown strategy %s' % strategy
+    assert 0 <= offset < len(data), 'offset %d outside image (%d bytes)' % (offset, len(data))
+    if strategy == FW_CORRUPT_TRUNCATE:
+        return bytes(data[:offset])
+    data = bytearray(data)
+    for i in range(offset, min(offset + count, len(data))):
+        if strategy == FW_CORRUPT_FLIP:
+            data[i] ^= 0xff
+        else:
+            data[i] = 0x00 if data[i] else 0xff
+    return bytes(data)
+
+def _fw_copy(src, dst):
+    '''Copy file <src> to <dst>; in-kernel (copy_file_range) where supported.
+    '''
+    try:
+        with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+            remaining = os.fstat(fin.fileno()).st_size
+            while remaining > 0:
+                n = os.copy_file_range(fin.fileno(), fout.fileno(), remaining)
+                if n == 0:
+                    break
+                remaining -= n
+        if remaining == 0:
+            return
+    except (AttributeError, OSError):
+        pass    # no copy_file_range (Python < 3.8, cross-fs on older kernels, ..)
+    shutil.copyfile(src, dst)
+
+def _fw_tmpfs_dir(d):
+    if not os.path.isdir(os.path.dirname(d)):
+        d = os.path.join(tempfile.gettempdir(), os.path.basename(d))
+    os.makedirs(d, exist_ok=True)
+    return d
+
+def _fw_copy_atomic(src, dst):
+    # copy under a temp name, then rename; never serve a half-copied file
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dst), prefix='.tmp_')
+    os.close(fd)
+    try:
+        _fw_copy(src, tmp)
+        os.replace(tmp, dst)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+def fw_invalid_image(img_path, offset, strategy=FW_CORRUPT_FLIP, count=1):
+    '''Return path of a copy of <img_path> corrupted at <offset>.
+
+    Built once per (image content, offset, strategy, count) and reused after
+    that; a changed source image gets a new variant.
+    '''
+    assert strategy in FW_CORRUPT_STRATEGIES, 'unknown strategy %s' % strategy
+    assert offset < os.path.getsize(img_path), 'offset %d outside %s' % (offset, img_path)
+    digest = fw_file_sha256(img_path)
+    name = '%s_%d_%s%d.bin' % (digest[:16], offset, strategy, count)
+    inval_path = os.path.join(_fw_tmpfs_dir(FW_INVALID_DIR), name)
+
+    with _fw_lock:
+        if os.path.isfile(inval_path):
+            return inval_path
+
+        # build under a temp name, then rename; never serve a half-built file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(inval_path), prefix='.tmp_')
+        os.close(fd)
+        try:
+            _fw_copy(img_path, tmp)
+            with open(tmp, 'r+b') as f:
+                if strategy == FW_CORRUPT_TRUNCATE:
+                    f.truncate(offset)
+                else:
+                    f.seek(offset)
+                    vals = f.read(count)
+                    corrupt = fw_corrupt_bytes(vals, 0, strategy, count)
+                    # never cache an unchanged (i.e. valid) image as the invalid one
+                    assert corrupt != vals, '%s: corrupting %d bytes at %d left the image unchanged' \
+                        % (img_path, count, offset)
+                    f.seek(offset)
+                    f.write(corrupt)
+            os.replace(tmp, inval_path)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+    return inval_path
+
+def fw_invalid_image_for_port(img_path, portname, strategy=FW_CORRUPT_FLIP, count=1):
+    '''Return path of <img_path> corrupted in the part that is actually
+    downloaded to <portname>'s module, i.e. after the image header
+    (StartCmdPayloadSize), or None if that's not available.
+    '''
+    headersize = get_StartCmdPayloadSize(portname)
+    if headersize is None:
+        return None
+    return fw_invalid_image(img_path, headersize + 200, strategy, count)
+
+
+#----------------------------------------------------------------------------
+# Firmware image registry
+# Each image is read, hashed and its header parsed once per process, and
+# staged in tmpfs so sfputil (or the CDB engine, via mmap) doesn't go back
+# to flash for every download. Checks against the test config take
+# milliseconds, so a wrong image is rejected before a download is started.
+#----------------------------------------------------------------------------
+
+_RE_HDR_VER     = re.compile(rb'(\d{1,3})\.(\d{1,3})\.(\d{1,5})')
+
+class FwImage(object):
+    '''One firmware image file.
+
+    path        image file as configured
+    size        [bytes]
+    sha256      hex digest
+    header      vendor header, i.e. the first StartCmdPayloadSize bytes
+                (sent with CDB Start, not downloaded); b'' if not known
+    header_vers x.y.z strings found anywhere in the header; may include
+                unrelated ones (bootloader, spec revision), see check()
+    staged_path copy in tmpfs; use this for downloads
+    '''
+    __slots__ = ('path', 'size', 'sha256', 'header', 'header_vers', 'staged_path', '_mm')
+
+    def __init__(self, path, headersize=0):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.sha256 = fw_file_sha256(path)
+        with open(path, 'rb') as f:
+            self.header = f.read(headersize) if headersize else b''
+        self.header_vers = [b'.'.join(m.groups()).decode() for m in _RE_HDR_VER.finditer(self.header)]
+        self.staged_path = os.path.join(_fw_tmpfs_dir(FW_STAGE_DIR), self.sha256[:16] + '.bin')
+        if not os.path.isfile(self.staged_path) or os.path.getsize(self.staged_path) != self.size:
+            _fw_copy_atomic(path, self.staged_path)
+        self._mm = None
+
+    def header_has_version(self, ver):
+        '''True if version <ver> (CLI format x.y.z) is in the header, either as
+        ASCII or binary (major, minor, build 16-bit BE, as in CDB 0100h).'''
+        if ver in self.header_vers:
+            return True
+        try:
+            major, minor, build = [int(v) for v in ver.split('.')]
+            return struct.pack('>BBH', major, minor, build) in self.header
+        except (ValueError, struct.error):
+            return False
+
+    def data(self):
+        '''Return image content (read-only mmap of the staged copy).'''
+        if self._mm is None:
+            with open(self.staged_path, 'rb') as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mm
+
+    def check(self, ver=None, size=None, sha256=None):
+        '''Return list of errors (empty if OK) vs. expected size, sha256.
+
+        The header layout is vendor specific, and there is no known offset of
+        the version: a header without <ver> (ASCII or binary) is only warned
+        about, as the x.y.z strings found may be other versions, and the real
+        one may be in another encoding.
+        '''
+        errors = []
+        if size is not None and self.size != size:
+            errors.append('%s: size %d, expected %d' % (self.path, self.size, size))
+        if sha256 and self.sha256 != sha256.lower():
+            errors.append('%s: sha256 mismatch' % (self.path))
+        if ver and self.header_vers and not self.header_has_version(ver):
+            print('fw_wrapper: WARNING %s: header has version(s) %s, not %s' %
+                  (self.path, '/'.join(self.header_vers), ver))
+        return errors
+
+
+_fw_images  = dict()    # (path, size, mtime, headersize) -> FwImage
+
+def fw_image(img_path, headersize=0):
+    '''Return FwImage of <img_path>, with a <headersize> bytes header
+    (StartCmdPayloadSize of the module it's meant for; 0 if not known).
+    '''
+    st = os.stat(img_path)
+    key = (os.path.abspath(img_path), st.st_size, st.st_mtime_ns, headersize)
+    with _fw_lock:
+        img = _fw_images.get(key)
+        if img is None:
+            img = _fw_images[key] = FwImage(img_path, headersize)
+    return img
+
+def fw_image_for_port(img_path, portname):
+    '''Return FwImage of <img_path> as it would be downloaded to <portname>.'''
+    return fw_image(img_path, get_StartCmdPayloadSize(portname) or 0)
+
+
+#----------------------------------------------------------------------------
+# CDB firmware download engine
+# In-process alternative to "sfputil firmware download", using the xcvr
+# API's CDB commands directly: 0101h Start, 0103h/0104h Write LPL/EPL,
+# 0107h Complete. Always uses the largest block the module advertises, and
+# EPL (with auto-paging if supported) unless the module is LPL-only.
+# Every CDB command waits for completion inside the xcvr API, so there is no
+# extra sleep per block here; the time per block is recorded instead.
+#----------------------------------------------------------------------------
+
+_CDB_LPL_MAX_DATA   = 116   # LPL (page 9Fh, 120 bytes) minus 4-byte address
+_CDB_STATUS_OK      = 1     # cmisCDB.py: 1 = success
+
+class FwDownloadResult(object):
+    '''Result of fw_cdb_download().
+
+    ok          True if all CDB commands succeeded
+    msg         error message ('' if ok)
+    t_elapsed   [s] total, Start to Complete
+    latencies   [s] per block write
+    '''
+    __slots__ = ('intf', 'path', 'size', 'block_size', 'epl', 'ok', 'msg', 't_elapsed', 'latencies')
+
+    def __init__(self, intf, path, size, block_size, epl):
+        self.intf = intf
+        self.path = path
+        self.size = size
+        self.block_size = block_size
+        self.epl = epl
+        self.ok = False
+        self.msg = ''
+        self.t_elapsed = 0.0
+        self.latencies = []
+
+    def bytes_per_s(self):
+        return self.size / self.t_elapsed if self.t_elapsed else 0.0
+
+    def latency_pct(self, pct):
+        '''Return <pct> percentile (0..100) of block write latency [s].'''
+        if not self.latencies:
+            return None
+        lat = sorted(self.latencies)
+        return lat[min(len(lat) - 1, int(len(lat) * pct / 100.0))]
+
+    def __repr__(self):
+        return 'FwDownloadResult(%s, ok=%s, %.1fs, %d blocks of %d%s, %s)' % (
+            self.intf, self.ok, self.t_elapsed, len(self.latencies), self.block_size,
+            ' EPL' if self.epl else ' LPL', self.msg)
+
+@trace_func('fw')
+def fw_cdb_download(intf, img, progress=None, block_size=None, use_epl=None):
+    '''Download <img> (FwImage or image path) to the inactive bank of <intf>'s
+    module, in process, via CDB. Return FwDownloadResult.
+
+    progress    optional callback(bytes_done, bytes_total), called per block;
+                returning False aborts the download (as killing sfputil would)
+                with CDB Abort (0102h), as does any failure after Start
+    block_size  max. bytes per write; default (and upper limit): what the
+                module advertises (maxblocksize, or _CDB_LPL_MAX_DATA for LPL)
+    use_epl     default: EPL unless the module is LPL-only
+    '''
+    fwfeats = get_FwMgmtFeatures(intf)
+    cdb = get_cdb(intf)
+    assert fwfeats and cdb, '%s: no CDB firmware management' % (intf)
+    startLPLsize, maxblocksize, lplonly_flag, autopaging_flag, writelength = fwfeats
+
+    if use_epl is None:
+        use_epl = not lplonly_flag
+    assert not (use_epl and lplonly_flag), '%s: module only supports LPL' % (intf)
+    max_size = maxblocksize if use_epl else min(maxblocksize, _CDB_LPL_MAX_DATA)
+    block_size = min(block_size or max_size, max_size)
+
+    if not isinstance(img, FwImage):
+        img = fw_image(img, startLPLsize)
+    data = img.data()
+    res = FwDownloadResult(intf, img.path, img.size, block_size, use_epl)
+
+    t_start = time.time()
+    try:
+        status = cdb.start_fw_download(startLPLsize, bytearray(data[:startLPLsize]), img.size)
+        if status != _CDB_STATUS_OK:
+            res.msg = 'CDB start failed, status %s' % (status)
+
+        addr = 0
+        offset = startLPLsize
+        while not res.msg and offset < img.size:
+            block = bytearray(data[offset:offset + block_size])
+            t_block = time.time()
+            if use_epl:
+                status = cdb.block_write_epl(addr, block, autopaging_flag, writelength)
+            else:
+                status = cdb.block_write_lpl(addr, block)
+            res.latencies.append(time.time() - t_block)
+            if status != _CDB_STATUS_OK:
+                res.msg = 'CDB write failed at address %d, status %s' % (addr, status)
+                break
+            addr += len(block)
+            offset += len(block)
+            if progress and progress(offset, img.size) is False:
+                res.msg = 'aborted at %d of %d bytes' % (offset, img.size)
+    except BaseException:
+        _fw_cdb_abort(cdb, res)
+        raise
+    if res.msg:
+        # don't leave the module in download state for the next test
+        _fw_cdb_abort(cdb, res)
+        res.t_elapsed = time.time() - t_start
+        return res
+
+    status = cdb.validate_fw_image()
+    res.t_elapsed = time.time() - t_start
+    if status != _CDB_STATUS_OK:
+        res.msg = 'CDB complete failed, status %s' % (status)
+        return res
+    res.ok = True
+    return res
+
+def _fw_cdb_abort(cdb, res):
+    # CDB 0102h Abort Firmware Download; a failure is added to res.msg
+    try:
+        status = cdb.abort_fw_download()
+    except Exception as ex:
+        status = ex
+    if status != _CDB_STATUS_OK:
+        res.msg += '; CDB abort failed, status %s' % (status)
+
+
+#----------------------------------------------------------------------------
+# Firmware bank state tracker
+# Bank versions are read once per port (CDB 0100h, falling back to sfputil)
+# and kept until something changes the banks. Every successful download
+# records which image (sha256) went into which bank. A test that only needs
+# "valid image in the inactive bank" can then skip a download of ~20 minutes
+# if the previous test left exactly that image there.
+#----------------------------------------------------------------------------
+
+cmd_fw_version      = 'sudo sfputil show fwversion '
+_FW_NO_VER          = ('', 'N/A', '0.0.0')      # bank empty or invalid
+
+class FwBankState(object):
+    '''Firmware banks of one module.
+
+    image_a     image A version ('0.0.0' or 'N/A' if empty/invalid)
+    image_b     image B version
+    running     running bank, 'A' or 'B'
+    committed   committed bank, 'A' or 'B'
+    '''
+    __slots__ = ('intf', 'image_a', 'image_b', 'running', 'committed')
+
+    def __init__(self, intf, image_a, image_b, running, committed):
+        self.intf = intf
+        self.image_a = image_a
+        self.image_b = image_b
+        self.running = running
+        self.committed = committed
+
+    def inactive_bank(self):
+        return 'B' if self.running == 'A' else 'A'
+
+    def version(self, bank):
+        return self.image_a if bank == 'A' else self.image_b
+
+    def active_ver(self):
+        return self.version(self.running)
+
+    def inactive_ver(self):
+        return self.version(self.inactive_bank())
+
+    def __repr__(self):
+        return 'FwBankState(%s, A=%s, B=%s, running %s, committed %s)' % (
+            self.intf, self.image_a, self.image_b, self.running, self.committed)
+
+
+def _fw_bank_state_read(intf):
+    fwinfo = get_module_fw_info(intf)
+    if fwinfo and len(fwinfo) >= 8:
+        image_a, a_running, a_committed = fwinfo[0], fwinfo[1], fwinfo[2]
+        image_b = fwinfo[4]
+        return FwBankState(intf, str(image_a), str(image_b),
+                           'A' if a_running else 'B', 'A' if a_committed else 'B')
+
+    # no CDB access from here (e.g. xcvr API too old); same info via CLI
+    resp = cli_wrap(cmd_fw_version + intf)
+    if not resp or 'not implemented' in resp:
+        return None
+    clidict = cli_output2dict(resp, delimiter=':')
+    if 'Running Image' not in clidict:
+        return None
+    return FwBankState(intf, clidict.get('Image A Version', 'N/A'), clidict.get('Image B Version', 'N/A'),
+                       clidict['Running Image'], clidict.get('Committed Image', clidict['Running Image']))
+
+
+_fw_bank_states = dict()    # intf -> FwBankState
+_fw_bank_images = dict()    # (intf, bank) -> (sha256, version) of last download
+
+def fw_bank_state(intf, refresh=False):
+    '''Return FwBankState of <intf>, None if not available (e.g. not CMIS).
+    Read from the module only the first time, or if <refresh>.
+    '''
+    with _fw_lock:
+        state = _fw_bank_states.get(intf)
+    if state is None or refresh:
+        state = _fw_bank_state_read(intf)
+        with _fw_lock:
+            if state:
+                _fw_bank_states[intf] = state
+            else:
+                _fw_bank_states.pop(intf, None)
+    return state
+
+def fw_bank_invalidate(intf):
+    '''Forget <intf>'s bank state (e.g. after firmware run/commit); it's read
+    again when next needed. Download records are kept: run and commit don't
+    change what's in the banks.
+    '''
+    with _fw_lock:
+        _fw_bank_states.pop(intf, None)
+
+def fw_bank_downloaded(intf, img=None):
+    '''Tell the tracker something was downloaded to <intf>'s inactive bank:
+    FwImage <img> on success, None if the bank now holds anything else
+    (invalid image, killed or aborted download).
+    '''
+    state = fw_bank_state(intf)
+    fw_bank_invalidate(intf)
+    if state is None:
+        return
+    bank = state.inactive_bank()
+    with _fw_lock:
+        _fw_bank_images.pop((intf, bank), None)
+    if img is None:
+        return
+    # version as the module reports it, to tell later if the bank changed behind our back
+    state = fw_bank_state(intf)
+    if state and state.version(bank) not in _FW_NO_VER:
+        with _fw_lock:
+            _fw_bank_images[intf, bank] = (img.sha256, state.version(bank))
+
+def fw_bank_restore(intf, bank, sha256, version):
+    '''Restore a download record (e.g. from a previous process, see
+    store_wrapper): image <sha256> went into <bank> as <version>. Only counts
+    if the bank still has that version (fw_inactive_has_image).
+    '''
+    if bank in ('A', 'B') and version not in _FW_NO_VER:
+        with _fw_lock:
+            _fw_bank_images[intf, bank] = (sha256, version)
+
+def fw_inactive_has_image(intf, img):
+    '''True if FwImage <img> was downloaded to <intf>'s inactive bank, and
+    the bank still has the version the module reported right after that.
+    '''
+    state = fw_bank_state(intf)
+    if state is None:
+        return False
+    bank = state.inactive_bank()
+    with _fw_lock:
+        record = _fw_bank_images.get((intf, bank))
+    return bool(record) and record == (img.sha256, state.version(bank))
+
+def fw_ensure_inactive(intf, img, download):
+    '''Make sure FwImage <img> is in <intf>'s inactive bank: call
+    download(intf, img) only if it's not there yet. download() is expected to
+    assert on failure. Return True if it downloaded, False if skipped.
+    '''
+    if fw_inactive_has_image(intf, img):
+        print('fw_ensure_inactive %s: %s already in inactive bank, download skipped' % (intf, img.path))
+        return False
+    download(intf, img)
+    fw_bank_downloaded(intf, img)
+    return True
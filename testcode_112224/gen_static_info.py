@@ -0,0 +1,167 @@
+'''Generate transceiver_static_info.yaml from the modules plugged in
+
+Inventory all present ports of the local switch (identity, firmware versions,
+CMIS revision, dual-bank support) and write a test config file in the format
+of transceiver_static_info.yaml. Meant for onboarding a new batch of modules:
+plug them in, run this, review the file.
+
+    python gen_static_info.py [-o <file>] [port ...]
+
+Default output file is transceiver_static_info_<HwSKU>.yaml, which
+test_cfg_auto() picks up along with the other config files.
+
+Identity comes from one all-ports "sfputil show eeprom" read. Firmware
+versions need one "sfputil show fwversion" per port; those run concurrently.
+
+Only intended for local use (i.e., in the switch/router).
+'''
+import argparse
+import sys
+import time
+import yaml
+from concurrent.futures import ThreadPoolExecutor
+
+from cli_wrapper import *   # cli_wrap, cli_all_presence, cli_eeprom_snapshot
+from test_cfg    import *   # cmd_hwsku, test_cfg_errors
+
+
+# Local Constants
+cmd_all_eeprom      = 'sudo sfputil show eeprom'        # all ports
+cmd_fwversion       = 'sudo sfputil show fwversion '
+_MAX_WORKERS        = 16
+_NO_FW_VER          = '0.0.0'   # not implemented (e.g. SFF)
+_NO_CMIS_REV        = '0.0'
+
+_YAML_HEADER = '''# %s
+#
+# A file transceiver_static_info.yaml should be present to describe the metadata of the transceiver.
+# Following should be the format of the file
+#    topology:
+#        <device_name>:
+#            <port_name>:
+#                active_firmware: <active_firmware_version>
+#                inactive_firmware: <inactive_firmware_version>
+#                cmis_rev: <cmis_revision>
+#                vendor_date: <vendor_date_code>
+#                vendor_name: <vendor_name>
+#                vendor_oui: <vendor_oui>
+#                vendor_pn: <part_number>
+#                vendor_rev: <revision_number>
+#                vendor_sn: <serial_number>
+#                dual_bank_support: <yes_or_no>
+#
+# Generated by gen_static_info.py on %s
+#
+'''
+
+
+def _fw_info(portname):
+    '''Return (active FW ver, inactive FW ver, dual bank) of <portname>.
+
+    Dual bank if there's an image B. Versions are _NO_FW_VER if the module
+    doesn't support firmware management.
+    '''
+    resp = cli_wrap(cmd_fwversion + portname)
+    if not resp or 'not implemented' in resp:
+        return (_NO_FW_VER, _NO_FW_VER, False)
+    clidict = cli_output2dict(resp, delimiter=':')
+    active   = clidict.get('Active Firmware', _NO_FW_VER)
+    inactive = clidict.get('Inactive Firmware', _NO_FW_VER)
+    dual_bank = clidict.get('Image B Version', 'N/A') not in ('N/A', '')
+    return (active, inactive, dual_bank)
+
+def gen_inventory(ports=None):
+    '''Return dict {port: port cfg dict} for all present ports (or <ports>).
+    '''
+    if not ports:
+        ports = [p for p,state in cli_all_presence().items() if state == 'Present']
+    ports = cli_interface_sort(ports)
+
+    # bulk EEPROM read and the per-port fwversion reads, all in parallel
+    with ThreadPoolExecutor(max_workers=_MAX_WORKERS) as pool:
+        snap = pool.submit(EepromSnapshot, cmd_all_eeprom)
+        fws  = dict((p, pool.submit(_fw_info, p)) for p in ports)
+        snap = snap.result()
+
+    inventory = dict()
+    for port in ports:
+        clidict = snap.port(port)
+        if not clidict:
+            print('gen_inventory: no EEPROM data for %s, skipped' % port, file=sys.stderr)
+            continue
+        active, inactive, dual_bank = fws[port].result()
+        inventory[port] = {
+            'active_firmware'   : active,
+            'inactive_firmware' : inactive,
+            'cmis_rev'          : clidict.get('CMIS Rev', _NO_CMIS_REV),
+            'vendor_date'       : clidict.get('Vendor Date Code(YYYY-MM-DD Lot)', ''),
+            'vendor_name'       : clidict.get('Vendor Name', ''),
+            'vendor_oui'        : clidict.get('Vendor OUI', ''),
+            'vendor_pn'         : clidict.get('Vendor PN', ''),
+            'vendor_rev'        : clidict.get('Vendor Rev', ''),
+            'vendor_sn'         : clidict.get('Vendor SN', ''),
+            'dual_bank_support' : dual_bank,
+        }
+    return inventory
+
+def _yaml_str(s):
+    # always quote; versions, dates, revs must stay strings
+    return "'" + str(s).replace("'", "''") + "'"
+
+def gen_yaml(switchname, inventory, fname):
+    '''Return YAML text (transceiver_static_info.yaml format) of <inventory>.
+    '''
+    lines = [(_YAML_HEADER % (fname, time.strftime('%Y-%m-%d %H:%M:%S'))).rstrip('\n'),
+             'topology:',
+             '    %s:' % switchname]
+    for port,cfg in inventory.items():
+        lines.append('        %s:' % port)
+        lines.append('            # %s %s' % (cfg['vendor_name'], cfg['vendor_pn']))
+        for field,value in cfg.items():
+            if isinstance(value, bool):
+                value = 'yes' if value else 'no'
+            else:
+                value = _yaml_str(value)
+            lines.append('            %s: %s' % (field, value))
+        lines.append('')
+    return '\n'.join(lines) + '\n'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate transceiver_static_info.yaml from present modules')
+    parser.add_argument('-o', '--output', default=None, help='output file, - for stdout')
+    parser.add_argument('-s', '--switch', default=None, help='switch name (default: HwSKU)')
+    parser.add_argument('ports', nargs='*', help='ports (default: all present ports)')
+    args = parser.parse_args(argv)
+
+    switchname = args.switch or (cli_wrap(cmd_hwsku) or '').strip()
+    if not switchname:
+        print('gen_static_info: failed to get HwSKU, use -s', file=sys.stderr)
+        return 1
+    if not args.output:
+        args.output = 'transceiver_static_info_%s.yaml' % switchname
+
+    t_start = time.time()
+    inventory = gen_inventory(args.ports)
+    if not inventory:
+        print('gen_static_info: no modules found', file=sys.stderr)
+        return 1
+    text = gen_yaml(switchname, inventory, args.output)
+
+    # report anything the tests would reject; still write the file, for fixing by hand
+    errors = test_cfg_errors(yaml.safe_load(text))
+    for err in errors:
+        print('gen_static_info:', err, file=sys.stderr)
+
+    if args.output == '-':
+        sys.stdout.write(text)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    print('gen_static_info: %d ports in %.1fs -> %s' % (len(inventory), time.time() - t_start, args.output),
+          file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
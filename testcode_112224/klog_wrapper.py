@@ -0,0 +1,326 @@
+'''Kernel log and syslog capture: I2C/optoe errors per test step
+
+"Ensure that no I2C error is seen" used to mean running
+'sudo dmesg | grep .. | grep optoe' before and after, and comparing line
+counts: two full dmesg scans per check, and blind to the ring buffer
+wrapping (old lines drop out as new ones come in) and to rotated logs.
+
+Here a background thread follows /dev/kmsg and /var/log/syslog instead,
+reading only what's new since its cursor (kmsg sequence number, syslog file
+position; a rotated syslog is read to the end before switching to the new
+file). Every message gets a timestamp on the test's clock (time.monotonic()):
+kmsg's own, or the syslog wall clock time converted. Only kernel messages
+count (from syslog only if kmsg can't be read), and only their text: errors
+(KLOG_RE_ERROR on an optoe/I2C line) are kept and attributed to the test
+steps (klog_step, opened by result_step) running at that time. result_step
+records a step's errors with its result (values 'klog_errors').
+
+A check is then
+
+    mark = klog_mark()
+    .. download ..
+    errors = klog_errors(mark, intf)
+
+which costs one read of what was logged in between, not two dmesg scans.
+
+Needs root (sudo -s) for /dev/kmsg and syslog; a source that can't be read
+is left out (warned once). Kernel messages usually also end up in syslog.
+
+Only intended for local use (i.e., in the switch/router).
+'''
+import collections
+import datetime
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from api_wrapper import *   # get_eeprom_path
+
+
+# Local Constants
+KLOG_KMSG           = '/dev/kmsg'
+KLOG_SYSLOG         = '/var/log/syslog'
+_KLOG_POLL_S        = 0.5       # background read period
+_KLOG_EVENTS_KEPT   = 10000     # errors kept (oldest dropped)
+_KLOG_STEPS_KEPT    = 1000      # closed steps kept for attribution
+
+# same criteria as the former 'dmesg | grep -iE "error|fail|warning" | grep optoe',
+# plus I2C adapter/bus errors; applied to kernel message text only
+KLOG_RE_ERROR       = re.compile(r'error|fail|warning', re.IGNORECASE)
+KLOG_RE_I2C         = re.compile(r'optoe|i2c', re.IGNORECASE)
+
+# I2C bus a message is about: "optoe 23-0050: .." or "i2c i2c-23: .."
+_RE_KLOG_BUS        = re.compile(r'\b(\d+)-00[0-9a-f]{2}\b|\bi2c-(\d+)\b')
+_RE_KLOG_PORT_BUS   = re.compile(r'/i2c-(\d+)(?=/)')
+
+# syslog line: "Jul 12 19:46:29.053313 sonic ERR kernel: [..] msg" (SONiC)
+# or RFC 3339 "2024-07-12T19:46:29.053313+00:00 sonic ..."
+_RE_KLOG_SYSLOG_BSD = re.compile(r'^(\w{3} +\d+ \d\d:\d\d:\d\d)(\.\d+)? (\S+) (.*)$')
+_RE_KLOG_SYSLOG_ISO = re.compile(r'^(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(\.\d+)?(\S*) (\S+) (.*)$')
+# rest of the line: "[SEVERITY ]tag[pid]: text"; kernel text may start with
+# its own "[  123.456789] " time
+_RE_KLOG_SYSLOG_TAG = re.compile(r'^(?:[A-Z]+ )?([^\s:\[]+)(?:\[\d+\])?: (?:\[ *\d+\.\d+\] )?(.*)$')
+
+
+class KlogEvent(object):
+    '''One I2C/optoe error message.
+
+    ts      [s] time.monotonic() clock
+    source  'kmsg' or 'syslog'
+    msg     message text
+    bus     I2C bus number the message names, None if none
+    steps   (test, port, step) of the steps running at <ts>
+    '''
+    __slots__ = ('ts', 'source', 'msg', 'bus', 'steps')
+
+    def __init__(self, ts, source, msg):
+        self.ts = ts
+        self.source = source
+        self.msg = msg
+        m = _RE_KLOG_BUS.search(msg)
+        self.bus = int(m.group(1) or m.group(2)) if m else None
+        self.steps = list()
+
+    def __repr__(self):
+        return 'KlogEvent(%.3f %s: %s%s)' % (self.ts, self.source, self.msg,
+            ' [%s]' % ', '.join('%s %s %s' % s for s in self.steps) if self.steps else '')
+
+
+_klog = {'thread': None, 'kmsg': None, 'kmsg_seq': None, 'syslog': None, 'syslog_tail': b'',
+         'lost': 0, 'count': 0, 'warned': set()}
+_klog_events    = collections.deque(maxlen=_KLOG_EVENTS_KEPT)  # (n, KlogEvent)
+_klog_steps     = collections.deque(maxlen=_KLOG_STEPS_KEPT)   # [t_start, t_end, test, port, step]
+_klog_lock      = threading.RLock()
+
+
+def _klog_warn(source, ex):
+    if source not in _klog['warned']:
+        _klog['warned'].add(source)
+        print('klog_wrapper: not reading %s: %s' % (source, ex))
+
+
+#----------------------------------------------------------------------------
+# Sources
+#----------------------------------------------------------------------------
+
+def _klog_open():
+    # cursors start at the end: only what is logged from now on
+    try:
+        fd = os.open(KLOG_KMSG, os.O_RDONLY | os.O_NONBLOCK)
+        os.lseek(fd, 0, os.SEEK_END)
+        _klog['kmsg'] = fd
+    except OSError as ex:
+        _klog_warn(KLOG_KMSG, ex)
+    try:
+        f = open(KLOG_SYSLOG, 'rb')
+        f.seek(0, os.SEEK_END)
+        _klog['syslog'] = f
+    except OSError as ex:
+        _klog_warn(KLOG_SYSLOG, ex)
+
+def _klog_read_kmsg():
+    '''Return list of (ts, resolution, msg) of new kmsg records.'''
+    fd = _klog['kmsg']
+    records = list()
+    while fd is not None:
+        try:
+            data = os.read(fd, 8192)
+        except BlockingIOError:
+            break
+        except BrokenPipeError:
+            # ring buffer overwrote records we hadn't read yet; next read
+            # continues with the oldest one still there
+            _klog['lost'] += 1
+            continue
+        if not data:
+            break
+        # "<prio>,<seq>,<usec>,<flags>[,..];<msg>\n[ KEY=val\n..]"
+        head, _, rest = data.decode('utf-8', 'replace').partition(';')
+        fields = head.split(',')
+        try:
+            seq, usec = int(fields[1]), int(fields[2])
+        except (IndexError, ValueError):
+            continue
+        if _klog['kmsg_seq'] is not None and seq > _klog['kmsg_seq'] + 1:
+            _klog['lost'] += seq - _klog['kmsg_seq'] - 1
+        _klog['kmsg_seq'] = seq
+        # kmsg time: [us] since boot, the same clock as time.monotonic() (up
+        # to the kernel's clock source granularity)
+        records.append((usec / 1e6, 0.0, rest.split('\n', 1)[0]))
+    return records
+
+def _klog_syslog_ts(line):
+    '''Return (time.monotonic() timestamp, resolution, kernel message text) of
+    a syslog line; None if it doesn't parse or isn't a kernel message.
+    Resolution [s]: 1.0 if the line has whole seconds only.'''
+    m = _RE_KLOG_SYSLOG_BSD.match(line)
+    try:
+        if m:
+            # no year in the line: this year, unless that's in the future
+            # ("Dec 31" read in January)
+            year = time.localtime().tm_year
+            wall = time.mktime(time.strptime('%d %s' % (year, m.group(1)), '%Y %b %d %H:%M:%S'))
+            if wall > time.time() + 86400:
+                wall = time.mktime(time.strptime('%d %s' % (year - 1, m.group(1)), '%Y %b %d %H:%M:%S'))
+            frac = m.group(2)
+            wall += float(frac or 0)
+            msg = m.group(4)
+        else:
+            m = _RE_KLOG_SYSLOG_ISO.match(line)
+            if not m:
+                return None
+            # with UTC offset if there is one, else local time
+            dt = datetime.datetime.fromisoformat(m.group(1) + m.group(3).replace('Z', '+00:00'))
+            frac = m.group(2)
+            wall = (dt.timestamp() if dt.tzinfo else time.mktime(dt.timetuple())) + float(frac or 0)
+            msg = m.group(5)
+    except ValueError:
+        return None
+    # kernel messages only, and only their text (not the severity)
+    m = _RE_KLOG_SYSLOG_TAG.match(msg)
+    if not m or m.group(1) != 'kernel':
+        return None
+    return (wall - (time.time() - time.monotonic()), 10.0 ** -(len(frac) - 1) if frac else 1.0, m.group(2))
+
+def _klog_read_syslog():
+    '''Return list of (ts, resolution, msg) of new kernel messages in syslog
+    (none if kmsg is read); follows log rotation.'''
+    f = _klog['syslog']
+    records = list()
+    while f is not None:
+        data = _klog['syslog_tail'] + f.read()
+        lines = data.split(b'\n')
+        _klog['syslog_tail'] = lines.pop()     # incomplete last line, if any
+        for line in lines:
+            # kernel messages come from kmsg if we can read that
+            if _klog['kmsg'] is not None:
+                continue
+            rec = _klog_syslog_ts(line.decode('utf-8', 'replace'))
+            if rec:
+                records.append(rec)
+        try:
+            st = os.stat(KLOG_SYSLOG)
+        except OSError:
+            break
+        if st.st_ino == os.fstat(f.fileno()).st_ino and st.st_size >= f.tell():
+            break
+        # rotated (rest of the old file read above) or truncated: new file from the start
+        f.close()
+        try:
+            f = open(KLOG_SYSLOG, 'rb')
+        except OSError as ex:
+            f = None
+            _klog_warn(KLOG_SYSLOG, ex)
+        _klog['syslog'] = f
+        _klog['syslog_tail'] = b''
+    return records
+
+
+#----------------------------------------------------------------------------
+# Capture
+#----------------------------------------------------------------------------
+
+def _klog_add(source, records, now):
+    for ts, res, msg in records:
+        if not (KLOG_RE_I2C.search(msg) and KLOG_RE_ERROR.search(msg)):
+            continue
+        ev = KlogEvent(ts, source, msg)
+        # a step overlapping [ts, ts + res): whole-second syslog stamps are
+        # truncated, up to 1s before the message
+        for t_start, t_end, test, port, step in _klog_steps:
+            if t_start < ts + res and ts <= (t_end if t_end is not None else now):
+                ev.steps.append((test, port, step))
+        _klog['count'] += 1
+        _klog_events.append((_klog['count'], ev))
+
+def klog_poll():
+    '''Read everything logged since the last read (also done by the
+    background thread every _KLOG_POLL_S).'''
+    with _klog_lock:
+        now = time.monotonic()
+        _klog_add('kmsg', _klog_read_kmsg(), now)
+        _klog_add('syslog', _klog_read_syslog(), now)
+
+def _klog_run():
+    while True:
+        time.sleep(_KLOG_POLL_S)
+        try:
+            klog_poll()
+        except Exception as ex:
+            _klog_warn('poll', ex)
+
+def klog_start():
+    '''Start capturing (once per process; again is a no-op).'''
+    with _klog_lock:
+        if _klog['thread'] is None:
+            _klog_open()
+            _klog['thread'] = threading.Thread(target=_klog_run, name='klog', daemon=True)
+            _klog['thread'].start()
+
+def klog_running():
+    '''Return True if at least one source is being read.'''
+    return _klog['kmsg'] is not None or _klog['syslog'] is not None
+
+
+@contextmanager
+def klog_step(test, port, step):
+    '''Attribute errors logged during the enclosed block to (test, port, step).
+    Yields a list; on exit (if capturing) it holds the KlogEvent errors
+    attributed to the step so far.
+    '''
+    entry = [time.monotonic(), None, test, port, step]
+    errors = list()
+    with _klog_lock:
+        _klog_steps.append(entry)
+        count = _klog['count']
+    try:
+        yield errors
+    finally:
+        entry[1] = time.monotonic()
+        if klog_running():
+            with _klog_lock:
+                try:
+                    klog_poll()
+                except Exception as ex:
+                    _klog_warn('poll', ex)
+                errors.extend(ev for n, ev in _klog_events
+                              if n > count and (test, port, step) in ev.steps)
+
+
+def klog_mark():
+    '''Return cursor for klog_errors(): "errors logged from now on".
+    Starts the capture if not running yet.'''
+    klog_start()
+    assert klog_running(), 'no kernel log/syslog capture (%s, %s not readable; not root?)' % (
+        KLOG_KMSG, KLOG_SYSLOG)
+    with _klog_lock:
+        klog_poll()
+        return _klog['count']
+
+def _klog_port_buses(intf):
+    # all I2C adapters on the path to the port's EEPROM (root bus, mux channels)
+    path = get_eeprom_path(intf)
+    if not path:
+        return None
+    return set(int(b) for b in _RE_KLOG_PORT_BUS.findall(os.path.realpath(path)))
+
+def klog_errors(mark, intf=None):
+    '''Return list of KlogEvent errors logged since <mark> (klog_mark).
+
+    intf    only errors on <intf>'s I2C buses, or naming no bus at all; None
+            (or bus unknown): all errors
+    '''
+    with _klog_lock:
+        klog_poll()
+        events = [ev for n, ev in _klog_events if n > mark]
+        if events and _klog_events[0][0] > mark + 1:
+            print('klog_wrapper: %d errors since mark no longer kept' % (_klog_events[0][0] - mark - 1))
+        if _klog['lost']:
+            print('klog_wrapper: %d kernel messages lost (ring buffer overrun)' % (_klog['lost']))
+            _klog['lost'] = 0
+    buses = _klog_port_buses(intf) if intf else None
+    if buses:
+        events = [ev for ev in events if ev.bus is None or ev.bus in buses]
+    return events
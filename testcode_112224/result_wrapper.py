@@ -0,0 +1,248 @@
+'''Structured test results: records streamed to a JSONL file
+
+Until now results were the "<test> <port> done" lines, copied into Test_Report
+by hand. Now every test step also emits a record (one JSON object per line,
+appended to RESULT_DEFAULT_FILENAME) for trend analysis and timing
+comparisons across runs:
+
+run         id of the test process (start time, host, pid)
+test, port, step
+t_start, t_end  [s] epoch; t_end only for steps (result_step)
+passed      True/False; None for measurements only (result_values) and
+            skipped steps
+error       assert message etc. if failed
+skipped     reason, if the test skipped the port (result_skip)
+values      measured values, e.g. {'dom': {'Temperature': 41.2, ..}}
+
+Tests never wait for the file: records go into a queue, a background thread
+writes them in batches. If the queue is full (writer stuck on a full disk?)
+records are dropped and counted rather than blocking the test. Call
+result_flush() to wait for everything queued so far (also done at exit).
+
+Only intended for local use (i.e., in the switch/router).
+'''
+import atexit
+import json
+import os
+import queue
+import re
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from cli_wrapper import *   # cli_parse_float_with_unit
+from trace_wrapper import * # trace_span
+from klog_wrapper import *  # klog_step
+
+
+# Local Constants
+RESULT_DEFAULT_FILENAME = 'xcvr_test_results.jsonl'
+_RESULT_QUEUE_MAX       = 10000     # records; more are dropped
+_RESULT_BATCH_MAX       = 500       # records per write
+_RESULT_FLUSH_S         = 10.0      # max. wait in result_flush()
+
+_RESULT_RUN = '%s-%s-%d' % (time.strftime('%Y%m%d-%H%M%S'), socket.gethostname(), os.getpid())
+
+# DOM fields recorded by result_dom_values
+_RE_RESULT_DOM = re.compile(r'^(Temperature|Vcc|[TR]X\d+Power|TX\d+Bias)$', re.IGNORECASE)
+
+_result_queue   = queue.Queue(maxsize=_RESULT_QUEUE_MAX)
+_result_lock    = threading.Lock()
+_result_thread  = None
+_result_dropped = [0]
+_result_local   = threading.local()     # .steps: open result_step records of this thread
+
+
+#----------------------------------------------------------------------------
+# Writer
+#----------------------------------------------------------------------------
+
+def _result_writer(fname):
+    '''Background thread: append queued records to <fname>, in batches of
+    whatever is queued. threading.Event items are flush markers, set once
+    everything queued before them is written.'''
+    while True:
+        batch = [_result_queue.get()]
+        while len(batch) < _RESULT_BATCH_MAX:
+            try:
+                batch.append(_result_queue.get_nowait())
+            except queue.Empty:
+                break
+        lines = [json.dumps(r, sort_keys=True, default=str) for r in batch if isinstance(r, dict)]
+        if lines:
+            try:
+                with open(fname, 'a') as f:
+                    f.write('\n'.join(lines) + '\n')
+            except OSError as ex:
+                print('result_wrapper: failed to write %d records to %s: %s' % (len(lines), fname, ex))
+        for r in batch:
+            if isinstance(r, threading.Event):
+                r.set()
+
+def _result_start():
+    global _result_thread
+    with _result_lock:
+        if _result_thread is None:
+            _result_thread = threading.Thread(target=_result_writer, args=(RESULT_DEFAULT_FILENAME,),
+                                              name='result_writer', daemon=True)
+            _result_thread.start()
+
+def _result_put(record):
+    if _result_thread is None:
+        _result_start()
+    try:
+        _result_queue.put_nowait(record)
+    except queue.Full:
+        _result_dropped[0] += 1
+
+def result_flush(timeout=_RESULT_FLUSH_S):
+    '''Wait (at most <timeout> s) until all records queued so far are written.
+    Return True if they were.
+    '''
+    if _result_thread is None:
+        return True
+    done = threading.Event()
+    try:
+        _result_queue.put(done, timeout=timeout)
+    except queue.Full:
+        return False
+    ok = done.wait(timeout)
+    if _result_dropped[0]:
+        print('result_wrapper: %d records dropped (queue full)' % (_result_dropped[0]))
+    return ok
+
+atexit.register(result_flush)
+
+
+#----------------------------------------------------------------------------
+# Records
+#----------------------------------------------------------------------------
+
+def result_record(test, port, step, passed, values=None, t_start=None, t_end=None, error=None,
+                  skipped=None):
+    '''Queue a record (see module doc). Never blocks.'''
+    record = {'run': _RESULT_RUN, 'test': test, 'port': port, 'step': step,
+              't_start': t_start if t_start is not None else time.time(), 't_end': t_end,
+              'passed': passed, 'error': error, 'skipped': skipped, 'values': values or dict()}
+    _result_put(record)
+
+@contextmanager
+def result_step(test, port, step):
+    '''Record step <step> of <test> on <port>: start and end time, passed if
+    the block completes, failed (with the assert message) if it raises,
+    neither (passed None) if the test skipped the port (result_skip).
+    Values recorded in the block (result_values, same thread) are added to
+    the step's record. Also a trace_span (category 'step') when tracing,
+    and a klog_step: kernel I2C errors logged meanwhile are attributed to it,
+    and recorded as its values 'klog_errors' (when capturing).
+
+        with result_step('test_x', intf, 'port'):
+            ...
+    '''
+    rec = {'test': test, 'port': port, 'values': dict(), 'skipped': None}
+    steps = getattr(_result_local, 'steps', None)
+    if steps is None:
+        steps = _result_local.steps = list()
+    steps.append(rec)
+    t_start = time.time()
+    klog = list()
+    try:
+        with trace_span(step, 'step', port, test=test), klog_step(test, port, step) as klog:
+            yield rec
+    except BaseException as ex:
+        _result_klog(test, port, klog)
+        result_record(test, port, step, False, rec['values'], t_start, time.time(),
+                      str(ex) or type(ex).__name__)
+        raise
+    else:
+        _result_klog(test, port, klog)
+        result_record(test, port, step, None if rec['skipped'] else True, rec['values'], t_start,
+                      time.time(), skipped=rec['skipped'])
+    finally:
+        steps.remove(rec)
+
+def _result_step_of(test, port):
+    # innermost open result_step of <test> and <port> in this thread, or None
+    for rec in reversed(getattr(_result_local, 'steps', None) or []):
+        if rec['test'] == test and rec['port'] == port:
+            return rec
+    return None
+
+def result_values(test, port, label, values):
+    '''Record measured <values> (dict) of <test> on <port> under <label>: as
+    part of the enclosing result_step of the same test and port, if any,
+    otherwise as a record of their own (step <label>, passed None).
+    '''
+    rec = _result_step_of(test, port)
+    if rec is not None:
+        rec['values'][label] = values
+        return
+    result_record(test, port, label, None, {label: dict(values)})
+
+def _result_klog(test, port, klog):
+    # kernel I2C errors attributed to the step (klog_step)
+    if klog:
+        result_values(test, port, 'klog_errors', [{'t': ev.ts, 'source': ev.source, 'bus': ev.bus,
+                                                    'msg': ev.msg} for ev in klog])
+
+def result_done(test, port):
+    '''Print the usual "<test> <port> done" line. The pass itself is recorded
+    by the enclosing result_step.'''
+    print(test + ' ', port, ' done')
+
+def result_skip(test, port, reason):
+    '''Print the usual "<test> <port> Skipped (<reason>)" line, and record
+    that <test> skipped <port>: the enclosing result_step of the same test
+    and port gets passed None and skipped <reason> instead of a pass.
+    Outside of a step, a record of its own (step 'skip').
+
+        with result_step('test_x', intf, 'port'):
+            if not caps.cmis:
+                result_skip('test_x', intf, 'not CMIS')
+                continue
+    '''
+    print(test + ' ', port, ' Skipped (%s)' % (reason))
+    rec = _result_step_of(test, port)
+    if rec is not None:
+        rec['skipped'] = reason
+    else:
+        result_record(test, port, 'skip', None, skipped=reason)
+
+def result_dom_values(clidict):
+    '''Return dict {field: float} of the DOM monitor values (Temperature, Vcc,
+    Tx/Rx power, Tx bias) in <clidict> (as from cli_output2dict/EepromSnapshot).
+    Unparsable values are left out.
+    '''
+    values = dict()
+    for key, val in clidict.items():
+        if _RE_RESULT_DOM.match(key):
+            try:
+                values[key] = float(cli_parse_float_with_unit(val))
+            except:
+                pass
+    return values
+
+
+#----------------------------------------------------------------------------
+# Reading
+#----------------------------------------------------------------------------
+
+def result_read(fname=RESULT_DEFAULT_FILENAME, test=None, port=None, run=None):
+    '''Return list of records in <fname>, optionally only of <test>, <port>
+    and/or <run>. Unparsable lines (e.g. cut off by a crash) are skipped.
+    '''
+    records = list()
+    try:
+        with open(fname) as f:
+            for line in f:
+                try:
+                    r = json.loads(line)
+                except ValueError:
+                    continue
+                if (test is None or r.get('test') == test) and (port is None or r.get('port') == port) \
+                        and (run is None or r.get('run') == run):
+                    records.append(r)
+    except OSError:
+        pass
+    return records
@@ -0,0 +1,352 @@
+'''Scheduling wrappers: running per-port work concurrently
+
+Firmware downloads take many minutes each, and are mostly waiting for the
+module. Ports on different I2C buses can download at the same time; ports
+on the same bus (behind the same mux) would only slow each other down, so
+those still go one at a time.
+
+Most other tests can run all ports at once (sched_run_ports), as long as
+subports of the same physical port, which share a module, take turns.
+
+With tests of very different lengths (a download ~17 minutes, coherent link
+up ~3 minutes, show checks seconds) running concurrently, the order matters
+too: sched_makespan starts the longest work first (by recorded durations),
+within exclusivity constraints, and reports predicted vs. actual makespan.
+
+Only intended for local use (i.e., in the switch/router).
+'''
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from api_wrapper import *   # get_eeprom_path
+from cli_wrapper import *   # cli_dom_disabled, cli_interface_subport, cli_step_scope
+from result_wrapper import * # result_step
+
+
+# Local Constants
+SCHED_MAX_PARALLEL  = 4             # max. concurrent jobs (downloads)
+SCHED_GROUP_UNKNOWN = 'unknown'     # ports with unknown bus; all serialized
+SCHED_MAX_PARALLEL_PORTS = 32       # max. concurrent per-port test bodies
+
+_RE_I2C_ADAPTER = re.compile(r'/i2c-(\d+)(?=/)')
+
+
+def sched_i2c_group(intf):
+    '''Return I2C group of port: the root I2C adapter its EEPROM is on (e.g.
+    'i2c-1'), i.e. the physical bus before any muxes. SCHED_GROUP_UNKNOWN if
+    the platform doesn't tell.
+
+    /sys/bus/i2c/devices/i2c-23/23-0050/eeprom resolves to something like
+    /sys/devices/pci0000:00/.../i2c-1/i2c-23/23-0050/eeprom, where i2c-23
+    is a mux channel of adapter i2c-1.
+    '''
+    path = get_eeprom_path(intf)
+    if not path:
+        return SCHED_GROUP_UNKNOWN
+    adapters = _RE_I2C_ADAPTER.findall(os.path.realpath(path))
+    if not adapters:
+        return SCHED_GROUP_UNKNOWN
+    return 'i2c-' + adapters[0]
+
+def sched_i2c_groups(ports):
+    '''Return dict {group: [ports]} (see sched_i2c_group), in port order.
+    '''
+    groups = dict()
+    for intf in ports:
+        groups.setdefault(sched_i2c_group(intf), list()).append(intf)
+    return groups
+
+
+def _sched_run_groups(groups, run_port, max_parallel):
+    '''Run run_port(port) for all ports of all <groups> (lists of ports):
+    groups concurrently, at most <max_parallel> at once, ports within a group
+    one at a time. run_port() must not raise. Workers share the caller's
+    step cache (cli_step_scope).
+    '''
+    scope = cli_step_current()
+
+    def run_group(group_ports):
+        with cli_step_scope(scope):
+            for intf in group_ports:
+                run_port(intf)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(groups)))) as pool:
+        for f in [pool.submit(run_group, gp) for gp in groups]:
+            f.result()
+
+def sched_port_groups(ports, keys_of):
+    '''Return list of groups (lists of ports, in port order) such that ports
+    sharing any key of keys_of(port) end up in the same group (union-find;
+    also transitively). None keys are ignored.
+    '''
+    parent = dict((intf, intf) for intf in ports)
+
+    def find(intf):
+        while parent[intf] != intf:
+            parent[intf] = parent[parent[intf]]
+            intf = parent[intf]
+        return intf
+
+    owner = dict()  # key -> first port with that key
+    for intf in ports:
+        for key in keys_of(intf):
+            if key is None:
+                continue
+            if key in owner:
+                parent[find(intf)] = find(owner[key])
+            else:
+                owner[key] = intf
+
+    groups = dict()
+    for intf in ports:
+        groups.setdefault(find(intf), list()).append(intf)
+    return list(groups.values())
+
+
+def sched_fw_download(ports, job, max_parallel=SCHED_MAX_PARALLEL, namespace='', dom_disabled=True,
+                      name=None):
+    '''Run job(port) for all <ports>: concurrently across I2C groups (at most
+    <max_parallel> at once), one port at a time within a group.
+
+    Same rules as for a single download: only on non-breakout ports or
+    subport 1 (asserted up front), and with DOM polling disabled for the
+    duration of the job (cli_dom_disabled) unless <dom_disabled> is False.
+    Each port's job is a result_step ('port') of test <name>, by default the
+    function <job> is defined in, as in sched_run_ports.
+
+    Return dict {port: job result}. If jobs raised, all jobs still run to
+    completion (no download is left half done) and then the first exception
+    (in port order) is raised again.
+    '''
+    for intf in ports:
+        sub_port = cli_interface_subport(intf, namespace)
+        # 0 = no breakout, 1 = first subport
+        assert sub_port == 0 or sub_port == 1, '%s: not main (sub)port' % (intf)
+    if name is None:
+        name = job.__qualname__.split('.')[0]
+
+    results = dict()
+    errors = dict()
+    lock = threading.Lock()
+
+    def run_port(intf):
+        try:
+            with result_step(name, intf, 'port'):
+                if dom_disabled:
+                    with cli_dom_disabled(intf, namespace):
+                        result = job(intf)
+                else:
+                    result = job(intf)
+            with lock:
+                results[intf] = result
+        except BaseException as ex:
+            with lock:
+                errors[intf] = ex
+
+    _sched_run_groups(list(sched_i2c_groups(ports).values()), run_port, max_parallel)
+
+    for intf in ports:
+        if intf in errors:
+            raise errors[intf]
+    return results
+
+
+#----------------------------------------------------------------------------
+# Per-port test execution
+# Test body per port, run for all ports with a thread pool. Subports of the
+# same physical port are serialized: shutdown, reset, LPMode etc. of one of
+# them hits the others too. A failing port doesn't stop the others; all
+# failures are reported at the end. Each port's run is a result_step
+# (result_wrapper) of its own.
+#----------------------------------------------------------------------------
+
+def sched_run_ports(ports, body, max_parallel=SCHED_MAX_PARALLEL_PORTS, serialize=None, namespace='',
+                    name=None):
+    '''Run body(port) for all <ports>, concurrently except where serialized.
+
+    serialize   function port -> iterable of keys; ports sharing a key run one
+                at a time (sched_port_groups). Default: the physical port,
+                i.e. the breakout group (cli_interface_all_subports).
+    name        test name for the result records; default: the function
+                <body> is defined in (e.g. 'test_x' for test_x's check_port)
+
+    Return tuple (results, failures): dicts {port: body result} and {port:
+    exception} (assert or other). See sched_assert_ports.
+    '''
+    if serialize is None:
+        serialize = lambda intf: [cli_interface_physport(intf, namespace)]
+    if name is None:
+        name = body.__qualname__.split('.')[0]
+
+    results = dict()
+    failures = dict()
+    lock = threading.Lock()
+
+    def run_port(intf):
+        try:
+            with result_step(name, intf, 'port'):
+                result = body(intf)
+            with lock:
+                results[intf] = result
+        except BaseException as ex:
+            with lock:
+                failures[intf] = ex
+
+    _sched_run_groups(sched_port_groups(ports, serialize), run_port, max_parallel)
+    return (results, failures)
+
+def sched_assert_ports(failures, ports):
+    '''Assert no failures (as returned by sched_run_ports); the message lists
+    all failed ports, in port order.
+    '''
+    failed = [intf for intf in ports if intf in failures]
+    msgs = ['%s: %s' % (intf, str(failures[intf]) or type(failures[intf]).__name__) for intf in failed]
+    assert not failed, '%d of %d ports failed; %s' % (len(failed), len(ports), '; '.join(msgs))
+
+
+#----------------------------------------------------------------------------
+# Makespan scheduling
+# Jobs with a predicted duration, a set of exclusive resources (e.g. the
+# module: DOM disabled, LPMode and downloads must not overlap on it; or an
+# LLDP peer shared by a loopback pair) and ordering constraints (after).
+# List scheduling: whenever a worker is free, start the ready job with the
+# longest remaining path (its own duration plus its longest chain of
+# dependents) whose resources are all free. Without dependencies that's
+# plain longest-processing-time-first.
+#----------------------------------------------------------------------------
+
+class SchedJob(object):
+    '''One unit of work for sched_makespan.
+
+    name        for reports
+    func        func() does the work; raising marks the job failed
+    resources   jobs sharing a resource never run at the same time
+    predicted   [s] expected duration
+    after       jobs that must have finished before this one starts
+                (ordering only; also if they failed)
+    t_start, t_end, error   filled in when run
+    '''
+    __slots__ = ('name', 'func', 'resources', 'predicted', 'after', 't_start', 't_end', 'error')
+
+    def __init__(self, name, func, resources=(), predicted=0.0, after=()):
+        self.name = name
+        self.func = func
+        self.resources = frozenset(resources)
+        self.predicted = predicted
+        self.after = list(after)
+        self.t_start = None
+        self.t_end = None
+        self.error = None
+
+    def actual(self):
+        return self.t_end - self.t_start if self.t_end is not None else None
+
+    def __repr__(self):
+        return 'SchedJob(%s, predicted %.0fs, actual %s%s)' % (self.name, self.predicted,
+            '%.0fs' % self.actual() if self.t_end is not None else '-',
+            ', FAILED: %s' % self.error if self.error else '')
+
+
+def _sched_priorities(jobs):
+    # remaining path: own duration + longest chain of jobs that wait for this one
+    dependents = dict((id(j), list()) for j in jobs)
+    for j in jobs:
+        for dep in j.after:
+            dependents[id(dep)].append(j)
+    prio = dict()
+    def path(j):
+        if id(j) not in prio:
+            prio[id(j)] = j.predicted + max([path(d) for d in dependents[id(j)]] or [0.0])
+        return prio[id(j)]
+    for j in jobs:
+        path(j)
+    return prio
+
+def _sched_pick(pending, done, busy, prio):
+    # first (highest priority) job that is ready and whose resources are free
+    for j in sorted(pending, key=lambda j: -prio[id(j)]):
+        if all(id(dep) in done for dep in j.after) and not (j.resources & busy):
+            return j
+    return None
+
+def sched_predict(jobs, max_parallel=SCHED_MAX_PARALLEL_PORTS):
+    '''Return predicted makespan [s] of <jobs>: sched_makespan's schedule,
+    simulated with the predicted durations.
+    '''
+    prio = _sched_priorities(jobs)
+    pending = list(jobs)
+    done = set()
+    busy = set()
+    running = list()    # (t_end, job)
+    t = 0.0
+    while pending or running:
+        while len(running) < max_parallel:
+            j = _sched_pick(pending, done, busy, prio)
+            if j is None:
+                break
+            pending.remove(j)
+            busy |= j.resources
+            running.append((t + j.predicted, j))
+        assert running, 'unsatisfiable job dependencies'
+        running.sort(key=lambda r: r[0])
+        t, j = running.pop(0)
+        busy -= j.resources
+        done.add(id(j))
+    return t
+
+def sched_makespan(jobs, max_parallel=SCHED_MAX_PARALLEL_PORTS):
+    '''Run <jobs> (SchedJob), longest remaining path first, at most
+    <max_parallel> at once, never two jobs sharing a resource at the same
+    time. A failed job doesn't stop the others.
+
+    Return report dict: predicted and actual makespan [s], sum of job times
+    [s] (i.e. serial run time), and the failed jobs.
+    '''
+    prio = _sched_priorities(jobs)
+    predicted = sched_predict(jobs, max_parallel)
+    pending = list(jobs)
+    done = set()
+    busy = set()
+    running = [0]
+    cond = threading.Condition()
+
+    def run(j):
+        j.t_start = time.time()
+        try:
+            # jobs are different tests, changing their own ports' state:
+            # bulk CLI output isn't shared between them
+            with cli_step_scope():
+                j.func()
+        except BaseException as ex:
+            j.error = ex
+        j.t_end = time.time()
+        with cond:
+            busy.difference_update(j.resources)
+            done.add(id(j))
+            running[0] -= 1
+            cond.notify_all()
+
+    t_start = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as pool:
+        with cond:
+            while pending:
+                j = _sched_pick(pending, done, busy, prio) if running[0] < max_parallel else None
+                if j is None:
+                    assert running[0], 'unsatisfiable job dependencies'
+                    cond.wait()
+                    continue
+                pending.remove(j)
+                busy.update(j.resources)
+                running[0] += 1
+                pool.submit(run, j)
+    actual = time.time() - t_start
+
+    report = {'predicted': predicted, 'actual': actual,
+              'serial': sum(j.actual() for j in jobs),
+              'failed': [j for j in jobs if j.error is not None]}
+    print('sched_makespan: %d jobs, makespan predicted %.0fs, actual %.0fs (serial %.0fs), %d failed'
+          % (len(jobs), predicted, actual, report['serial'], len(report['failed'])))
+    return report
@@ -0,0 +1,195 @@
+'''Persistent store for test results that outlive the test process
+
+Firmware tests take hours per module, so some results are kept on disk (one
+JSON file) rather than in memory:
+
+downloads   per (switch, port, image sha256): result, download time, and the
+            bank and version the image ended up in
+checkpoints per suite: the (test, port) pairs that completed, so an
+            interrupted suite resumes at the first incomplete one
+durations   per (test, vendor PN): the last few run times, to predict how
+            long a test takes on a module (see sched_makespan)
+passes      per (switch, port, test): digest of the inputs (module, firmware,
+            SONiC build, test code, ..) of the last pass, for incremental
+            runs (see util_incr_skip)
+
+The file is rewritten atomically (temp file + rename) on every update;
+updates are rare (minutes apart, or once per port when modules changed) and
+the file is small.
+
+Only intended for local use (i.e., in the switch/router).
+'''
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+# Local Constants
+STORE_DEFAULT_FILENAME  = 'xcvr_test_store.json'
+_STORE_VER              = 1
+_STORE_DURATIONS_KEPT   = 5     # last N run times per (test, vendor PN)
+
+_store_lock     = threading.Lock()
+
+
+def _store_key(*parts):
+    return '|'.join(str(p) for p in parts)
+
+def _store_read(fname):
+    '''Return store content as dict; empty store if missing, unreadable or
+    of another version.'''
+    empty = {'version': _STORE_VER, 'downloads': dict(), 'checkpoints': dict(), 'durations': dict(),
+             'passes': dict()}
+    try:
+        with open(fname) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return empty
+    if not isinstance(data, dict) or data.get('version') != _STORE_VER:
+        print('store %s: unknown version, starting empty' % (fname))
+        return empty
+    for section in ('downloads', 'checkpoints', 'durations', 'passes'):
+        data.setdefault(section, dict())
+    return data
+
+def _store_write(fname, data):
+    path = os.path.abspath(fname)
+    tmp = None
+    try:
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp_store_')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp, path)
+        tmp = None
+    finally:
+        if tmp and os.path.exists(tmp):
+            os.unlink(tmp)
+
+def _store_update(fname, update):
+    '''Read-modify-write under lock: update(data) modifies the store in place.'''
+    with _store_lock:
+        data = _store_read(fname)
+        update(data)
+        _store_write(fname, data)
+
+
+#----------------------------------------------------------------------------
+# Download results
+#----------------------------------------------------------------------------
+
+def store_download_put(switchname, portname, sha256, t_elapsed, ok=True, bank=None, version=None,
+                       fname=STORE_DEFAULT_FILENAME):
+    '''Record a download of image <sha256> to <portname>: result, time [s],
+    and (if known) the bank and version it ended up in.
+    '''
+    record = {'ok': ok, 't_elapsed': t_elapsed, 'bank': bank, 'version': version,
+              'time': time.strftime('%Y-%m-%d %H:%M:%S')}
+    def update(data):
+        data['downloads'][_store_key(switchname, portname, sha256)] = record
+    _store_update(fname, update)
+
+def store_download_get(switchname, portname, sha256, fname=STORE_DEFAULT_FILENAME):
+    '''Return last download record (dict, see store_download_put) of image
+    <sha256> to <portname>, None if there is none.
+    '''
+    with _store_lock:
+        return _store_read(fname)['downloads'].get(_store_key(switchname, portname, sha256))
+
+def store_download_times(fname=STORE_DEFAULT_FILENAME):
+    '''Return dict {(switch, port): download time [s]} of successful downloads,
+    the latest one per port.
+    '''
+    with _store_lock:
+        downloads = _store_read(fname)['downloads']
+    times = dict()
+    for key, record in sorted(downloads.items(), key=lambda kv: kv[1].get('time', '')):
+        switchname, portname, sha256 = key.split('|')
+        if record.get('ok'):
+            times[switchname, portname] = record['t_elapsed']
+    return times
+
+
+#----------------------------------------------------------------------------
+# Checkpoints
+# A suite is identified by name plus a digest of what it runs against (e.g.
+# the test config digest). Checkpoints of another digest are stale: the
+# suite starts over.
+#----------------------------------------------------------------------------
+
+def store_checkpoint_done(suite, digest, testname, portname, fname=STORE_DEFAULT_FILENAME):
+    '''Mark <testname> done on <portname> in <suite>.'''
+    def update(data):
+        cp = data['checkpoints'].get(suite)
+        if not cp or cp.get('digest') != digest:
+            cp = data['checkpoints'][suite] = {'digest': digest, 'done': dict()}
+        done = cp['done'].setdefault(testname, list())
+        if portname not in done:
+            done.append(portname)
+    _store_update(fname, update)
+
+def store_checkpoint_ports(suite, digest, testname, fname=STORE_DEFAULT_FILENAME):
+    '''Return list of ports <testname> is done on in <suite> (empty if none,
+    or if the checkpoints are for another digest).
+    '''
+    with _store_lock:
+        cp = _store_read(fname)['checkpoints'].get(suite)
+    if not cp or cp.get('digest') != digest:
+        return list()
+    return list(cp['done'].get(testname, list()))
+
+def store_checkpoint_clear(suite, fname=STORE_DEFAULT_FILENAME):
+    '''Forget all checkpoints of <suite> (e.g. when it completed).'''
+    def update(data):
+        data['checkpoints'].pop(suite, None)
+    _store_update(fname, update)
+
+
+#----------------------------------------------------------------------------
+# Test durations
+#----------------------------------------------------------------------------
+
+def store_duration_put(testname, vendor_pn, t_elapsed, fname=STORE_DEFAULT_FILENAME):
+    '''Record a run time [s] of <testname> on a module <vendor_pn>.'''
+    def update(data):
+        runs = data['durations'].setdefault(_store_key(testname, vendor_pn), list())
+        runs.append(round(t_elapsed, 3))
+        del runs[:-_STORE_DURATIONS_KEPT]
+    _store_update(fname, update)
+
+def store_durations(fname=STORE_DEFAULT_FILENAME):
+    '''Return dict {(test, vendor PN): mean of the recorded run times [s]}.'''
+    with _store_lock:
+        durations = _store_read(fname)['durations']
+    means = dict()
+    for key, runs in durations.items():
+        testname, vendor_pn = key.split('|', 1)
+        if runs:
+            means[testname, vendor_pn] = sum(runs) / len(runs)
+    return means
+
+
+#----------------------------------------------------------------------------
+# Passes
+#----------------------------------------------------------------------------
+
+def store_pass_put(switchname, portname, testname, inputs, fname=STORE_DEFAULT_FILENAME):
+    '''Record that <testname> passed on <portname> with inputs digest <inputs>;
+    None forgets the last pass (e.g. the inputs changed).
+    '''
+    key = _store_key(switchname, portname, testname)
+    def update(data):
+        if inputs is None:
+            data['passes'].pop(key, None)
+        else:
+            data['passes'][key] = {'inputs': inputs, 'time': time.strftime('%Y-%m-%d %H:%M:%S')}
+    _store_update(fname, update)
+
+def store_pass_inputs(switchname, portname, testname, fname=STORE_DEFAULT_FILENAME):
+    '''Return inputs digest of the last pass of <testname> on <portname>,
+    None if there is none.
+    '''
+    with _store_lock:
+        record = _store_read(fname)['passes'].get(_store_key(switchname, portname, testname))
+    return record['inputs'] if record else None
@@ -5,22 +5,238 @@ Ignoring distinction between switch/router here, referring to both as "switch".
 Might be usable for remote as well as local use, but there may be other, more
 more efficient APIs for remote use.
 '''
+import glob
+import hashlib
 import os
+import pickle
+import re
 import sys
+import tempfile
+import threading
+import types
 import yaml # PyYAML ver 6.0.1(PC), 5.4.1(SONiC.20230531.30)
+from collections.abc import Mapping
 
 from api_wrapper import *   # get_StartCmdPayloadSize
 from cli_wrapper import *   # cli_interface_sort
+from db_wrapper  import *   # db_transceiver_views
+from fw_wrapper  import *   # fw_file_sha256, fw_image_for_port, fw_invalid_image_for_port
 
 
 # Local Constants
 TEST_CFG_DEFAULT_FILENAME = 'transceiver_static_info.yaml'
+# Pick port records from all transceiver_static_info*.yaml by detected module
+TEST_CFG_AUTO             = 'auto'
+TEST_CFG_FILE_PATTERN     = 'transceiver_static_info*.yaml'
+
+# libyaml C loader is ~10x faster than the pure-Python one; not always built in
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+#----------------------------------------------------------------------------
+# Parsed config, frozen
+# The YAML file is parsed once per process (and again only if it changes)
+# and turned into read-only records. TestCfg/PortCfg read like the dicts
+# yaml.safe_load() used to return, so test_cfg['topology'][switch][port],
+# port_cfg['vendor_pn'], port_cfg.get(..) etc. work as before.
+#----------------------------------------------------------------------------
+
+# Port fields (see transceiver_static_info.yaml header):
+# field -> (required, type, regex the value must match or None)
+# Versions etc. must be quoted in the YAML file; cmis_rev: 5.2 would be a float.
+_RE_FW_VER      = re.compile(r'^\d+\.\d+\.\d+$')         # CLI format x.y.z
+_PORT_SCHEMA = {
+    'active_firmware'           : (True,  str,  _RE_FW_VER),
+    'inactive_firmware'         : (True,  str,  _RE_FW_VER),
+    'cmis_rev'                  : (True,  str,  re.compile(r'^\d+\.\d+$')),
+    'vendor_date'               : (True,  str,  re.compile(r'^\d{4}-\d{2}-\d{2}')),
+    'vendor_name'               : (True,  str,  None),
+    'vendor_oui'                : (True,  str,  re.compile(r'^[0-9a-fA-F]{2}(-[0-9a-fA-F]{2}){2}$')),
+    'vendor_pn'                 : (True,  str,  None),
+    'vendor_rev'                : (True,  str,  None),
+    'vendor_sn'                 : (True,  str,  None),
+    'dual_bank_support'         : (True,  bool, None),      # YAML yes/no
+    'firmware_valid_image_ver'  : (False, str,  _RE_FW_VER),
+    'firmware_valid_image'      : (False, str,  None),
+    'firmware_valid_image_size' : (False, int,  None),      # [bytes]
+    'firmware_valid_image_sha256': (False, str, re.compile(r'^[0-9a-fA-F]{64}$')),
+}
+_PORT_FIELDS    = tuple(_PORT_SCHEMA)
+_RE_PORTNAME    = re.compile(r'^Ethernet\d+$')
+
+_UNSET = object()
+
+class PortCfg(Mapping):
+    '''Read-only config of one port.
+
+    Fields not in the YAML file raise KeyError, like a dict; fields not in
+    _PORT_FIELDS are kept as well (in _extra).
+    '''
+    __slots__ = ('switch', 'port', '_extra') + _PORT_FIELDS
+
+    def __init__(self, switch, port, fields):
+        _set = object.__setattr__
+        _set(self, 'switch', switch)
+        _set(self, 'port', port)
+        extra = dict()
+        for k in _PORT_FIELDS:
+            _set(self, k, _UNSET)
+        for k,v in (fields if isinstance(fields, dict) else dict()).items():
+            if k in _PORT_FIELDS:
+                _set(self, k, v)
+            else:
+                extra[k] = v
+        _set(self, '_extra', types.MappingProxyType(extra))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('PortCfg is read-only')
+
+    def __getitem__(self, key):
+        if key in _PORT_FIELDS:
+            v = getattr(self, key)
+            if v is _UNSET:
+                raise KeyError(key)
+            return v
+        return self._extra[key]
+
+    def __iter__(self):
+        for k in _PORT_FIELDS:
+            if getattr(self, k) is not _UNSET:
+                yield k
+        for k in self._extra:
+            yield k
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return 'PortCfg(%s, %s, %r)' % (self.switch, self.port, dict(self))
+
+
+class TestCfg(Mapping):
+    '''Read-only parsed test config file; indexed by (switch, port).
+    '''
+    __slots__ = ('fname', 'mtime', 'digest', 'errors', 'valid', '_top', '_ports')
+
+    def __init__(self, fname, mtime, digest, yyy):
+        _set = object.__setattr__
+        _set(self, 'fname', fname)
+        _set(self, 'mtime', mtime)
+        _set(self, 'digest', digest)
+        _set(self, 'errors', tuple(test_cfg_errors(yyy)))
+        _set(self, 'valid', not self.errors)
+        ports = dict()
+        top = dict(yyy)
+        topology = yyy.get('topology')
+        if isinstance(topology, dict):
+            switches = dict()
+            for sw,swcfg in topology.items():
+                pcfgs = dict()
+                for port,fields in (swcfg if isinstance(swcfg, dict) else dict()).items():
+                    pcfgs[port] = ports[(sw, port)] = PortCfg(sw, port, fields)
+                switches[sw] = types.MappingProxyType(pcfgs)
+            top['topology'] = types.MappingProxyType(switches)
+        _set(self, '_top', types.MappingProxyType(top))
+        _set(self, '_ports', ports)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('TestCfg is read-only')
+
+    def __getitem__(self, key):
+        return self._top[key]
+
+    def __iter__(self):
+        return iter(self._top)
+
+    def __len__(self):
+        return len(self._top)
+
+    def port(self, switchname, portname):
+        '''Return PortCfg of <switchname>/<portname>, None if not in config'''
+        return self._ports.get((switchname, portname))
+
+
+_test_cfgs      = dict()    # abs. file path -> TestCfg
+_test_cfg_lock  = threading.Lock()
+
+
+#----------------------------------------------------------------------------
+# Parsed config cache
+# Parsing the bigger configs with pure-Python PyYAML (SONiC) takes a while,
+# and every pytest process does it again. So keep the parsed result next to
+# the YAML file (<file>.yaml.cache), keyed by the YAML content hash and
+# _TEST_CFG_CACHE_VER. Bump _TEST_CFG_CACHE_VER if what's cached changes.
+#----------------------------------------------------------------------------
+
+_TEST_CFG_CACHE_VER = 1
+_TEST_CFG_CACHE_EXT = '.cache'
+
+def _test_cfg_cache_read(path, digest):
+    '''Return parsed YAML (dict) from cache file of <path>, None if there's
+    no cache file or it's stale.'''
+    try:
+        with open(path + _TEST_CFG_CACHE_EXT, 'rb') as f:
+            ver, cdigest, yyy = pickle.loads(f.read())
+    except Exception:
+        return None
+    if ver != _TEST_CFG_CACHE_VER or cdigest != digest:
+        return None
+    return yyy
+
+def _test_cfg_cache_write(path, digest, yyy):
+    '''Write cache file of <path>; atomic (temp file + rename), so a parallel
+    run never reads a partial file. Errors are ignored; the cache is optional.'''
+    tmp = None
+    try:
+        data = pickle.dumps((_TEST_CFG_CACHE_VER, digest, yyy), pickle.HIGHEST_PROTOCOL)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp_cfg_')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path + _TEST_CFG_CACHE_EXT)
+        tmp = None
+    except Exception as ex:
+        print('test_cfg cache write error', ex)
+    finally:
+        if tmp and os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def _test_cfg_load(fname):
+    '''Return TestCfg for <fname>; parse the file only if it's new or changed.
+
+    A changed mtime alone (e.g. file touched or copied again) doesn't trigger
+    a re-parse as long as the content hash is the same. A new process gets
+    the parsed result from the cache file if it's up to date.
+    '''
+    path = os.path.abspath(fname)
+    mtime = os.stat(path).st_mtime_ns
+    with _test_cfg_lock:
+        cfg = _test_cfgs.get(path)
+        if cfg and cfg.mtime == mtime:
+            return cfg
+        with open(path, 'rb') as instream:
+            data = instream.read()
+        digest = hashlib.sha256(data).hexdigest()
+        if cfg and cfg.digest == digest:
+            object.__setattr__(cfg, 'mtime', mtime)
+            return cfg
+        yyy = _test_cfg_cache_read(path, digest)
+        if yyy is None:
+            yyy = yaml.load(data, Loader=_YAML_LOADER)
+            if not isinstance(yyy, dict):
+                raise yaml.YAMLError('%s: not a YAML mapping' % fname)
+            _test_cfg_cache_write(path, digest, yyy)
+        cfg = TestCfg(path, mtime, digest, yyy)
+        _test_cfgs[path] = cfg
+        return cfg
 
 
 def test_cfg_read(fname = TEST_CFG_DEFAULT_FILENAME):
     '''Read and parse transceiver_static_info.yaml test config file.
 
-    Return results as dict, or None on error.
+    Return results as TestCfg (read-only, reads like a dict), or None on error.
+    The file is only parsed again if it has changed since the last call, so
+    calling this once per test is cheap.
     
     TBD: YAML line "cmis_rev: 5.2" will be parsed as 'cmis_rev': 5.2. I.e.,
     you get a numeric value. And since YAML is hierarchical, just turning 
@@ -28,12 +244,16 @@ def test_cfg_read(fname = TEST_CFG_DEFAULT_FILENAME):
     string for example.
     For now, ignoring this and assuming the YAML file will be all strings.
     So, you need to quote numbers in the YAML file as in "cmis_rev: '5.2'"
+
+    fname TEST_CFG_AUTO (or default file not there): see test_cfg_auto().
     '''
     yyy = None
 
     try:
-        with open(fname) as instream:
-            yyy = yaml.safe_load(instream)
+        if fname == TEST_CFG_AUTO or \
+           (fname == TEST_CFG_DEFAULT_FILENAME and not os.path.isfile(fname)):
+            return test_cfg_auto()
+        yyy = _test_cfg_load(fname)
     except yaml.YAMLError as ex:
         print(ex)
     except:
@@ -42,8 +262,139 @@ def test_cfg_read(fname = TEST_CFG_DEFAULT_FILENAME):
     return yyy
 
 
-def test_cfg_valid(yyy):
-    '''Partial validation of YAML config.
+#----------------------------------------------------------------------------
+# Auto-selected config
+# Instead of copying the right transceiver_static_info_XXX.yaml to
+# transceiver_static_info.yaml before a run, pick each port's record from
+# all config files by the identity (Vendor PN + SN) of the module plugged in.
+# Detected once per session (HwSKU, namespace, file pattern); every
+# test_cfg_read() after that returns the same TestCfg without running any
+# command, until test_cfg_auto_reset() (modules swapped).
+#----------------------------------------------------------------------------
+
+cmd_hwsku = 'sonic-cfggen -d -v DEVICE_METADATA.localhost.hwsku'
+
+_test_cfg_autos = dict()    # (switch, selected records) -> TestCfg
+_test_cfg_auto_memo = dict()    # (switch, namespace, pattern) -> TestCfg or None
+_test_cfg_hwsku = [None]
+
+_test_cfg_indexes = dict()  # pattern -> (file digests, index)
+
+def test_cfg_index(pattern=TEST_CFG_FILE_PATTERN):
+    '''Read all config files matching <pattern>; return dict
+    {(vendor_pn, vendor_sn): PortCfg}.
+
+    Files that fail to parse or validate are skipped. If the same module is
+    in several files, the first (sorted by name) wins. Rebuilt only if one
+    of the files has changed.
+    '''
+    cfgs = list()
+    for fname in sorted(glob.glob(pattern)):
+        try:
+            cfg = _test_cfg_load(fname)
+        except Exception as ex:
+            print('test_cfg_index: skipping %s: %s' % (fname, ex))
+            continue
+        if not cfg.valid:
+            print('test_cfg_index: skipping %s: invalid' % fname)
+            continue
+        cfgs.append(cfg)
+
+    digests = tuple((cfg.fname, cfg.digest) for cfg in cfgs)
+    cached = _test_cfg_indexes.get(pattern)
+    if cached and cached[0] == digests:
+        return cached[1]
+
+    index = dict()
+    for cfg in cfgs:
+        for portcfg in cfg._ports.values():
+            key = (portcfg['vendor_pn'].strip(), portcfg['vendor_sn'].strip())
+            if key in index and dict(index[key]) != dict(portcfg):
+                print('test_cfg_index: %s %s in %s differs, using %s/%s' %
+                      (key[0], key[1], os.path.basename(cfg.fname),
+                       index[key].switch, index[key].port))
+            index.setdefault(key, portcfg)
+    _test_cfg_indexes[pattern] = (digests, index)
+    return index
+
+def test_cfg_auto(switchname=None, namespace='', pattern=TEST_CFG_FILE_PATTERN):
+    '''Build config for the modules currently plugged in.
+
+    Reads the identity of all ports in one go (STATE_DB), and picks each
+    port's record from test_cfg_index() by (Vendor PN, Vendor SN). Ports
+    with unknown modules are left out. <switchname> defaults to the HwSKU,
+    which is what the config files use as switch name.
+
+    Detected on the first call only (see test_cfg_auto_reset).
+
+    Return TestCfg, or None if no port matched.
+    '''
+    if not switchname:
+        with _test_cfg_lock:
+            if not _test_cfg_hwsku[0]:
+                _test_cfg_hwsku[0] = (cli_wrap(cmd_hwsku) or '').strip()
+            switchname = _test_cfg_hwsku[0]
+        assert switchname, 'test_cfg_auto: failed to get HwSKU'
+
+    memo_key = (switchname, namespace, pattern)
+    with _test_cfg_lock:
+        if memo_key in _test_cfg_auto_memo:
+            return _test_cfg_auto_memo[memo_key]
+    cfg = _test_cfg_auto_detect(switchname, namespace, pattern)
+    with _test_cfg_lock:
+        _test_cfg_auto_memo[memo_key] = cfg
+    return cfg
+
+def test_cfg_auto_reset():
+    '''Detect the modules again on the next test_cfg_auto() (e.g. after
+    modules were swapped).'''
+    with _test_cfg_lock:
+        _test_cfg_auto_memo.clear()
+
+def _test_cfg_auto_detect(switchname, namespace, pattern):
+    index = test_cfg_index(pattern)
+    idents = list()
+    for port,clidict in db_transceiver_views(None, namespace).items():
+        pn = clidict.get('Vendor PN', '').strip()
+        sn = clidict.get('Vendor SN', '').strip()
+        if (pn, sn) in index:
+            idents.append((port, pn, sn))
+    if not idents:
+        print('test_cfg_auto: no configured module found')
+        return None
+
+    # same modules, same records -> same TestCfg
+    ports = dict((port, dict(index[(pn, sn)])) for port,pn,sn in idents)
+    key = (switchname, tuple(sorted((port, tuple(sorted(rec.items()))) for port,rec in ports.items())))
+    with _test_cfg_lock:
+        cfg = _test_cfg_autos.get(key)
+        if cfg is None:
+            yyy = {'topology': {switchname: ports}}
+            # no file; digest of the records, so it identifies the config all the same
+            cfg = TestCfg(TEST_CFG_AUTO, None, hashlib.sha256(repr(key).encode()).hexdigest(), yyy)
+            _test_cfg_autos[key] = cfg
+    return cfg
+
+
+def _test_cfg_image_errors(where, portcfg):
+    '''Check firmware image of one port: file exists, size and sha256 match
+    (if firmware_valid_image_size/_sha256 are given).'''
+    errors = []
+    img_path = portcfg.get('firmware_valid_image')
+    if not isinstance(img_path, str):
+        return errors
+    if not os.path.isfile(img_path):
+        return ['%s: firmware_valid_image %s not found' % (where, img_path)]
+    size = portcfg.get('firmware_valid_image_size')
+    if isinstance(size, int) and os.path.getsize(img_path) != size:
+        errors.append('%s: %s size %d, expected %d' % (where, img_path, os.path.getsize(img_path), size))
+    sha256 = portcfg.get('firmware_valid_image_sha256')
+    if isinstance(sha256, str) and fw_file_sha256(img_path) != sha256.lower():
+        errors.append('%s: %s sha256 mismatch' % (where, img_path))
+    return errors
+
+def test_cfg_errors(yyy, images=False):
+    '''Validate YAML config; return list of ALL errors found (empty if valid).
 
     topology:
         <device_name>:
@@ -51,20 +402,66 @@ def test_cfg_valid(yyy):
                 active_firmware: <active_firmware_version>
                 ...
 
-    There should be at least one switch/router and one port.
+    There should be at least one switch/router and one port. Every port is
+    checked against _PORT_SCHEMA; unknown fields (typos) are errors too.
+    If <images>, also check firmware image files (exist, size, sha256).
+    '''
+    errors = []
+    topology = yyy.get('topology') if isinstance(yyy, Mapping) else None
+    if not isinstance(topology, Mapping) or not len(topology):
+        return ['no topology or no switch in topology']
+
+    for switchname,swcfg in topology.items():
+        if not isinstance(switchname, str) or len(switchname) <= 3:    # min switch name length?
+            errors.append('invalid switch name %r' % (switchname,))
+        if not isinstance(swcfg, Mapping) or not len(swcfg):
+            errors.append('%s: no ports' % (switchname,))
+            continue
+        for portname,portcfg in swcfg.items():
+            where = '%s/%s' % (switchname, portname)
+            if not isinstance(portname, str) or not _RE_PORTNAME.match(portname):
+                errors.append('%s: invalid port name' % where)
+            if not isinstance(portcfg, Mapping):
+                errors.append('%s: no port config' % where)
+                continue
+            for field,(required,ftype,regex) in _PORT_SCHEMA.items():
+                if field not in portcfg:
+                    if required:
+                        errors.append('%s: %s missing' % (where, field))
+                    continue
+                value = portcfg[field]
+                if type(value) is not ftype:    # not isinstance(); bool is an int
+                    errors.append('%s: %s %r is %s, expected %s%s'
+                                  % (where, field, value, type(value).__name__, ftype.__name__,
+                                     ' (quote it)' if ftype is str else ''))
+                elif regex and not regex.match(value):
+                    errors.append('%s: %s %r invalid format' % (where, field, value))
+            for field in portcfg:
+                if field not in _PORT_SCHEMA:
+                    errors.append('%s: unknown field %r' % (where, field))
+            if images:
+                errors += _test_cfg_image_errors(where, portcfg)
+    return errors
+
+def test_cfg_valid(yyy, images=False):
+    '''Validate YAML config (see test_cfg_errors); print all errors found.
+
+    If <images>, also check firmware image files. Use this before firmware
+    tests, rather than finding out after half an hour of downloading.
     '''
-    valid = False
     try:
-        k1 = list( yyy.keys() )
-        if k1[0] == 'topology':
-            k2 = list( yyy[k1[0]].keys() )
-            if len(k2) and len(k2[0]) > 3:      # min switch name length?
-                k3 = list( yyy[k1[0]][k2[0]].keys() )
-                if len(k3) and len(k3[0]) > 8 and k3[0][:8]=='Ethernet':
-                    valid = True
+        if isinstance(yyy, TestCfg):
+            errors = list(yyy.errors)   # validated once when parsed
+            if images:
+                for (switchname,portname),portcfg in yyy._ports.items():
+                    errors += _test_cfg_image_errors('%s/%s' % (switchname, portname), portcfg)
+        else:
+            errors = test_cfg_errors(yyy, images)
     except Exception as ex:
-        print('test_cfg_valid exception', ex)   # skip this print; kind'a redundant?
-    return valid
+        errors = ['test_cfg_valid exception %s' % ex]
+    for err in errors:
+        print('test_cfg_valid:', err)
+    return not errors
 
 
 def test_cfg_switches(yyy):
@@ -111,10 +508,18 @@ def test_cfg_ports(yyy, switchname=None, namespace=''):
 def test_cfg_portcfg(yyy, switchname=None, portname=None, namespace=''):
     '''Get cfg for specified port (default is first port)
     '''
-    swcfg = test_cfg_switchcfg(yyy, switchname=None)
-    portcfg = None
+    if not switchname:
+        switchname = test_cfg_switches(yyy)[0]
     if not portname:
         portname = test_cfg_ports(yyy, switchname, namespace)[0]
+    if isinstance(yyy, TestCfg):
+        portcfg = yyy.port(switchname, portname)
+        if portcfg is None:
+            print('test_cfg_portcfg error')
+        return portcfg
+
+    swcfg = test_cfg_switchcfg(yyy, switchname)
+    portcfg = None
     try:
         portcfg = swcfg[portname]
     except:
@@ -128,7 +533,7 @@ def test_cfg_fw_img_ver(yyy, switchname, portname, namespace=''):
     assert switchname
     assert portname
 
-    test_cfg = test_cfg_read()
+    test_cfg = yyy if yyy else test_cfg_read()
     assert test_cfg, 'Failed to read test config file'
     assert test_cfg_valid(test_cfg)
     port_cfg = test_cfg_portcfg(test_cfg, switchname, portname, namespace)
@@ -150,20 +555,19 @@ def test_cfg_fw_img_path(yyy, switchname, portname, invalid=False, namespace='')
     
     TBD: Where to get filename? For now, assume it's added to test cfg YAML file.
 
-    There's no invalid image provided, we invalidate a copy on the fly. We COULD
-    use ‘dd’, but that seems risky (path specified in cfg file could be anything).
-    # copy
-    dd if=validfile.bin of=INvalidfile.bin
-    # muck up 1 byte at offset 200
-    dd if=/dev/random of=INvalidfile.bin iflag=count_bytes oflag=seek_bytes seek=200 count=1 conv=notrunc
+    The VALID image is checked against the port cfg (test_cfg_fw_image) and
+    the path returned is its copy staged in tmpfs.
+
+    There's no invalid image provided, we invalidate a copy on the fly; see
+    fw_invalid_image_for_port(). (Cached in tmpfs by image content and
+    corruption offset, so it's only built once and never stale.)
     '''
     assert switchname
     assert portname
 
     img_path = None
-    inval_path = None
 
-    test_cfg = test_cfg_read()
+    test_cfg = yyy if yyy else test_cfg_read()
     assert test_cfg, 'Failed to read test config file'
     assert test_cfg_valid(test_cfg)
     port_cfg = test_cfg_portcfg(test_cfg, switchname, portname, namespace)
@@ -180,47 +584,31 @@ def test_cfg_fw_img_path(yyy, switchname, portname, invalid=False, namespace='')
         img_path = None
 
     if img_path and invalid:
-        # create corrupt file unless aleady done
-        inval_path = 'inval_' + img_path
-        #if not os.path.isfile(inval_path):
-        if os.path.isfile(inval_path):
-            img_path = inval_path
-        else:
-            try:
-                # copy
-                cmdstr = 'cp' + ' ' + img_path + ' ' + inval_path
-                resp = cli_wrap_sh(cmdstr)
-                #if not os.path.isfile(inval_path):
-                #    print('test_cfg_fw_img_path(%s, %s): failed to copy %s' % (switchname, portname, img_path)
-                assert os.path.isfile(inval_path), 'failed to copy %s' % (img_path)
-
-                # muck up x bytes at offset y
-                byte_count = 1
-                #byte_offset = 200
-                # Byte offset must be greater than StartCmdPayloadSize in order
-                # for the error to be in the downloaded part of the image.
-                headersize = get_StartCmdPayloadSize(portname)
-                assert headersize != None
-                byte_offset = headersize + 200
-                #byte_offset = 4096+200  # TEMPORARY: try byte 4096+200 = 4296 instead
-                print('test_cfg_fw_img_path(): corrupting byte ', byte_offset) # TEMPORARY DEBUG
-
-                with open(inval_path, 'r+b') as f:
-                    f.seek(byte_offset)
-                    vals = f.read(byte_count)
-                    vals = bytearray(vals)
-                    for i in range(byte_count):
-                        vals[i] = vals[i] ^ 0xff
-
-                    f.seek(byte_offset)
-                    f.write(vals)
-                    f.close()
-
-                img_path = inval_path
-            except:
-                print('test_cfg_fw_img_path(%s, %s): failed to create invalid file' % (switchname, portname))
-                img_path = None
-
-            assert os.path.isfile(inval_path), 'failed to create %s' % (inval_path)
+        # Byte offset must be greater than StartCmdPayloadSize in order
+        # for the error to be in the downloaded part of the image.
+        inval_path = fw_invalid_image_for_port(img_path, portname)
+        assert inval_path, 'failed to create invalid %s (no StartCmdPayloadSize)' % (img_path)
+        img_path = inval_path
+    elif img_path:
+        img_path = test_cfg_fw_image(test_cfg, switchname, portname, namespace).staged_path
 
     return img_path
+
+def test_cfg_fw_image(yyy, switchname, portname, namespace=''):
+    '''Return FwImage of the VALID download image of the port, None if the
+    port has no image. Asserts if the image doesn't match the port cfg
+    (firmware_valid_image_size/_sha256); better now than after a 17-minute
+    download. A header not showing firmware_valid_image_ver is only warned
+    about (FwImage.check).
+    '''
+    port_cfg = test_cfg_portcfg(yyy, switchname, portname, namespace)
+    assert port_cfg
+    img_path = port_cfg.get('firmware_valid_image')
+    if not img_path or not os.path.isfile(img_path):
+        return None
+    img = fw_image_for_port(img_path, portname)
+    errors = img.check(ver=port_cfg.get('firmware_valid_image_ver'),
+                       size=port_cfg.get('firmware_valid_image_size'),
+                       sha256=port_cfg.get('firmware_valid_image_sha256'))
+    assert not errors, '; '.join(errors)
+    return img
@@ -3,8 +3,8 @@
 xcvr_onboarding_test_plan   sect. 1.4 Firmware Related Tests
 
 All the firmware related tests assume that the DOM monitoring is disabled for
-the corresponding port and the output of dmesg is analyzed to ensure that no 
-I2C errors are seen during firmware related testing.
+the corresponding port and the kernel log (klog_wrapper: /dev/kmsg, syslog) is
+analyzed to ensure that no I2C errors are seen during firmware related testing.
 
 Only checking presence (cli_interface_present) in the first test. If only a 
 subset of the tests is run, you may want to check presence in all the tests.
@@ -22,6 +22,13 @@ from api_wrapper    import *   # wrappers for (optoe, sfp, sfp_base, xcvr_api, c
 from cli_wrapper    import *   # wrappers for CLI
 from util_wrapper   import *   # wrappers replacing platform_tests/sfp/util.py
 from test_cfg       import *   # wrappers dealing with test config file etc.
+from fw_wrapper     import *   # firmware images, CDB download engine
+from sched_wrapper  import *   # concurrent per-port downloads
+from store_wrapper  import *   # download results and checkpoints on disk
+from caps_wrapper   import *   # per-port capability matrix
+from result_wrapper import *   # structured test results
+from trace_wrapper  import *   # timeline tracing (trace_sleep)
+from klog_wrapper   import *   # kernel log capture (I2C errors)
 
 
 # Local Constants
@@ -32,9 +39,21 @@ _DELAY_AFTER_IF_LPMODE_ON_S = 3.0
 _MAX_TIME_DOWNLOAD_S        = 30*60.0
 _DELAY_DOWNLOAD_KILL_S      = 20    # time to wait before killing download
 
+# Max. concurrent valid FW downloads (on ports on different I2C buses)
+_MAX_PARALLEL_DOWNLOADS     = 4
+
+# Valid FW download in process via CDB (fw_cdb_download) instead of sfputil.
+# Faster (max block size, EPL), but it's not what users run.
+_USE_CDB_ENGINE             = False
+
+# test_the_fw_tests resumes an interrupted run at the first incomplete test
+# and port (checkpoints in the store, set by the tests' per-port loops).
+# False: always start over.
+_RESUME_FW_TESTS            = True
+_FW_SUITE                   = 'test_the_fw_tests'
+
 # CLI commands
 cmd_int_trans_reset     = 'sudo sfputil reset '
-cmd_dmesg_i2c_err       = 'sudo dmesg | grep -iE "error|fail|warning" | grep optoe'
 cmd_fw_download         = 'sudo sfputil firmware download '
 cmd_fw_run              = 'sudo sfputil firmware run '
 cmd_fw_commit           = 'sudo sfputil firmware commit '
@@ -45,9 +64,79 @@ cmd_int_show_lpmode     = 'sudo sfputil show lpmode -p '
 
 
 # Record of normal dowlnoad times per switch/port.
-# Values to be inserted by test_download_valid_fw.
-# Used by test_download_abort to determine the times at which to abort.
-DownloadTimes = dict()
+# Values to be inserted by test_download_valid_fw, and kept in the store
+# (store_wrapper), so earlier runs' times are here from the start; read from
+# the store on first use (_download_times), not on import.
+# (test_download_abort used these to estimate when to abort; it now follows
+# the actual download progress instead.)
+DownloadTimes = None
+
+# Checkpoint digest (test config) while test_the_fw_tests runs, and the
+# ports each test is already done on; None: no checkpoints (pytest,
+# test_sched)
+_fw_resume = {'digest': None, 'done': dict()}
+
+
+def _download_times():
+    '''Return DownloadTimes, read from the store on first use.'''
+    global DownloadTimes
+    if DownloadTimes is None:
+        DownloadTimes = store_download_times()
+    return DownloadTimes
+
+def _fw_resumed(testname, intf):
+    '''Return True if <testname> is done on <intf> in the interrupted
+    test_the_fw_tests run being resumed; skip the port then.'''
+    digest = _fw_resume['digest']
+    if digest is None:
+        return False
+    done = _fw_resume['done'].get(testname)
+    if done is None:
+        done = _fw_resume['done'][testname] = store_checkpoint_ports(_FW_SUITE, digest, testname)
+    if intf in done:
+        result_skip(testname, intf, 'done, resumed')
+        return True
+    return False
+
+def _fw_port_done(testname, intf):
+    '''result_done(), and checkpoint <intf> if test_the_fw_tests is running.'''
+    result_done(testname, intf)
+    if _fw_resume['digest'] is not None:
+        store_checkpoint_done(_FW_SUITE, _fw_resume['digest'], testname, intf)
+
+
+def _download_valid_fw(intf, img):
+    '''Download valid FwImage <img> to <intf>'s inactive bank, the same way
+    test_download_valid_fw does; assert on failure. For tests that only need
+    the image there (see fw_ensure_inactive).
+    '''
+    if _USE_CDB_ENGINE:
+        res = fw_cdb_download(intf, img)
+        assert res.ok, '%s download failed: %s' % (intf, res.msg)
+    else:
+        clistr = cli_wrap_sh(cmd_fw_download + ' ' + intf + ' ' + img.staged_path)
+        assert clistr and 'firmware download complete success' in clistr.lower(), \
+            '%s download failed' % (intf)
+
+def _store_download(switchname, intf, img, t_elapsed):
+    '''Record successful download of FwImage <img> to <intf> in the store.'''
+    state = fw_bank_state(intf)
+    bank = state.inactive_bank() if state else None
+    store_download_put(switchname, intf, img.sha256, t_elapsed, ok=True,
+                       bank=bank, version=state.version(bank) if state else None)
+
+def _ensure_valid_fw(switchname, intf, img_path):
+    '''Make sure the valid image <img_path> is in <intf>'s inactive bank;
+    download it only if it's not there yet (fw_ensure_inactive). Downloads
+    recorded in the store by an earlier process count too.
+    '''
+    img = fw_image_for_port(img_path, intf)
+    record = store_download_get(switchname, intf, img.sha256)
+    if record and record['ok']:
+        fw_bank_restore(intf, record['bank'], img.sha256, record['version'])
+    t_start = time.time()
+    if fw_ensure_inactive(intf, img, _download_valid_fw):
+        _store_download(switchname, intf, img, time.time() - t_start)
 
 
 def test_download_invalid_fw(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
@@ -72,93 +161,97 @@ def test_download_invalid_fw(duthosts, enum_rand_one_per_hwsku_frontend_hostname
     global ans_host
     ans_host = duthost
     portmap, dev_conn = get_dev_conn(duthost, conn_graph_facts, enum_frontend_asic_index)
-    namespace = duthost.get_namespace_from_asic_id(enum_frontend_asic_index)
+    sess = util_session(duthost)
+    namespace = sess.namespace
+    port_caps = sess.caps()
 
-    test_cfg = test_cfg_read()
+    test_cfg = sess.test_cfg
     assert test_cfg, 'Failed to read test config file'
 
     for intf in dev_conn:
-        if intf not in xcvr_skip_list[duthost.hostname]:
-            switchname  = duthost.hostname
-
-            # Do not attempt if not dual-bank support!
-            # Downloading an invalid img might brick the txceiver depending
-            # on what exactly is invalid about the image.
-            port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
-            assert port_cfg
-            if not port_cfg['dual_bank_support']:
-                print('test_download_invalid_fw ', intf, ' Skipped (not dual bank)')
-                continue
-
-            # TBD: assert or allow partial test?
-            #assert cli_interface_present(intf)
-            if not cli_interface_present(intf):
-                print('%s not present? skipping test' % (intf))
-                continue
-
-            if not is_cmis(intf):
-                print('test_download_invalid_fw ', intf, ' Skipped (not CMIS)')
-                continue
-
-            sub_port = cli_interface_subport(intf, namespace)
-            # 0 = no breakout, 1 = first subport
-            if not (sub_port == 0 or sub_port == 1):
-                print('test_download_invalid_fw ', intf, ' Skipped (not main (sub)port)')
-                continue
-
-            # download image path
-            img_path = test_cfg_fw_img_path(test_cfg, switchname, intf, invalid=True, namespace=namespace)
-            if not img_path:
-                # don't assert; not all txceivers may have download files
-                print('test_download_invalid_fw ', intf, ' Skipped (no FW image)')
-                continue
-            # on the other hand, if it's specified it should be there
-            assert os.path.isfile(img_path)
-
-            # keep DOM disabled during test
-            with cli_dom_disabled(intf, namespace):
-
-                # get original FW versions
-                orig_active, orig_inactive = cli_fw_version(intf)
-                assert orig_active and orig_active == port_cfg['active_firmware']
-                assert orig_inactive and orig_inactive == port_cfg['inactive_firmware']
-
-                # get original link flap count
-                orig_flaps = cli_link_flap_count(intf, namespace)
-
-                print('DBG test_download_invalid_fw ', intf, ' download start') # TEMPORARY DEBUG
-
-                # Do the download
-                cmdstr = cmd_fw_download  + ' ' + intf + ' ' + img_path
-                #print('cmdstr: \n', cmdstr)                                    # TEMPORARY DEBUG
-                clistr = cli_wrap_sh(cmdstr)
-                #print('clistr: \n', clistr)                                    # TEMPORARY DEBUG
+        if intf not in xcvr_skip_list[duthost.hostname] and not _fw_resumed('test_download_invalid_fw', intf):
+            with result_step('test_download_invalid_fw', intf, 'port'):
+                switchname  = duthost.hostname
+                caps = port_caps[intf]
+
+                # Do not attempt if not dual-bank support!
+                # Downloading an invalid img might brick the txceiver depending
+                # on what exactly is invalid about the image.
+                port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
+                assert port_cfg
+                if not caps.dual_bank:
+                    result_skip('test_download_invalid_fw', intf, 'not dual bank')
+                    continue
+
+                # TBD: assert or allow partial test?
+                #assert cli_interface_present(intf)
+                if not caps.present:
+                    result_skip('test_download_invalid_fw', intf, 'not present')
+                    continue
+
+                if not caps.cmis:
+                    result_skip('test_download_invalid_fw', intf, 'not CMIS')
+                    continue
+
+                # 0 = no breakout, 1 = first subport
+                if not caps.main_port:
+                    result_skip('test_download_invalid_fw', intf, 'not main (sub)port')
+                    continue
+
+                # download image path
+                img_path = test_cfg_fw_img_path(test_cfg, switchname, intf, invalid=True, namespace=namespace)
+                if not img_path:
+                    # don't assert; not all txceivers may have download files
+                    result_skip('test_download_invalid_fw', intf, 'no FW image')
+                    continue
+                # on the other hand, if it's specified it should be there
+                assert os.path.isfile(img_path)
+
+                # keep DOM disabled during test
+                with cli_dom_disabled(intf, namespace):
+
+                    # get original FW versions
+                    orig_active, orig_inactive = cli_fw_version(intf)
+                    assert orig_active and orig_active == port_cfg['active_firmware']
+                    assert orig_inactive and orig_inactive == port_cfg['inactive_firmware']
+
+                    # get original link flap count
+                    orig_flaps = cli_link_flap_count(intf, namespace)
+
+                    print('DBG test_download_invalid_fw ', intf, ' download start') # TEMPORARY DEBUG
+
+                    # Do the download
+                    cmdstr = cmd_fw_download  + ' ' + intf + ' ' + img_path
+                    #print('cmdstr: \n', cmdstr)                                    # TEMPORARY DEBUG
+                    clistr = cli_wrap_sh(cmdstr)
+                    #print('clistr: \n', clistr)                                    # TEMPORARY DEBUG
 
-                # Exact type of failure may depend on how the img is invalid.
-                # cli_wrap returns None in case of an error code received.
-                assert clistr == None or 'fail' in clistr.lower()
+                    # Exact type of failure may depend on how the img is invalid.
+                    # cli_wrap returns None in case of an error code received.
+                    assert clistr == None or 'fail' in clistr.lower()
+                    fw_bank_downloaded(intf)    # whatever is in the inactive bank now, it's not ours
 
-                print('DBG test_download_invalid_fw ', intf, ' download end')   # TEMPORARY DEBUG
+                    print('DBG test_download_invalid_fw ', intf, ' download end')   # TEMPORARY DEBUG
 
-                # get current FW versions, check if they changed
-                curr_active, curr_inactive = cli_fw_version(intf)
-                # Active version should not change.
-                assert curr_active and curr_active == orig_active
-                # Inactive version may (a) stay the same in case of a wrong image 
-                # (for different txceiver) or (b) change to 0.0.0 in case of the
-                # right but corrupted image.
-                assert curr_inactive 
-                assert curr_inactive == orig_inactive or curr_inactive == '0.0.0'
+                    # get current FW versions, check if they changed
+                    curr_active, curr_inactive = cli_fw_version(intf)
+                    # Active version should not change.
+                    assert curr_active and curr_active == orig_active
+                    # Inactive version may (a) stay the same in case of a wrong image 
+                    # (for different txceiver) or (b) change to 0.0.0 in case of the
+                    # right but corrupted image.
+                    assert curr_inactive 
+                    assert curr_inactive == orig_inactive or curr_inactive == '0.0.0'
 
-                # ensure no link flap is seen
-                # just current state, not the history, will miss short blips
-                up = cli_interface_admin_status_up(intf)
-                assert up, 'link not up'
-                # actual flap count
-                curr_flaps = cli_link_flap_count(intf, namespace)
-                assert curr_flaps == orig_flaps, '%u link flaps' % (curr_flaps - orig_flaps)
+                    # ensure no link flap is seen
+                    # just current state, not the history, will miss short blips
+                    up = cli_interface_admin_status_up(intf)
+                    assert up, 'link not up'
+                    # actual flap count
+                    curr_flaps = cli_link_flap_count(intf, namespace)
+                    assert curr_flaps == orig_flaps, '%u link flaps' % (curr_flaps - orig_flaps)
 
-            print('test_download_invalid_fw ', intf, ' done') # TEMPORARY DEBUG
+                _fw_port_done('test_download_invalid_fw', intf)
 
 
 def test_download_valid_fw(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
@@ -173,7 +266,7 @@ def test_download_valid_fw(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
     Also, a return code of 0 will denote CLI executed successfully. (???)
     Ensure the inactive firmware version matches the downloaded firmware.
     Ensure no link flap is seen.
-    Ensure that no I2C error is seen. (cmd_dmesg_i2c_err)
+    Ensure that no I2C error is seen. (klog_errors)
     Ensure that the firmware download time is less than 30 minutes
 
     Note: Do not attempt if transceiver doesn't have dual-bank support(?)
@@ -185,32 +278,36 @@ def test_download_valid_fw(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
     global ans_host
     ans_host = duthost
     portmap, dev_conn = get_dev_conn(duthost, conn_graph_facts, enum_frontend_asic_index)
-    namespace = duthost.get_namespace_from_asic_id(enum_frontend_asic_index)
+    sess = util_session(duthost)
+    namespace = sess.namespace
+    port_caps = sess.caps()
 
-    test_cfg = test_cfg_read()
+    test_cfg = sess.test_cfg
     assert test_cfg, 'Failed to read test config file'
 
+    # pick ports and images first, then download (concurrently, see below)
+    todo = dict()   # intf -> (port_cfg, img_ver, img_path)
     for intf in dev_conn:
-        if intf not in xcvr_skip_list[duthost.hostname]:
+        if intf not in xcvr_skip_list[duthost.hostname] and not _fw_resumed('test_download_valid_fw', intf):
             switchname  = duthost.hostname
+            caps = port_caps[intf]
 
             # Do not attempt if not dual-bank support(?)
             # Even if the image is valid, download might fail for other
             # reasons, potentially bricking the txceiver.
             port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
             assert port_cfg
-            if not port_cfg['dual_bank_support']:
-                print('test_download_valid_fw ', intf, ' Skipped (not dual bank)')
+            if not caps.dual_bank:
+                result_skip('test_download_valid_fw', intf, 'not dual bank')
                 continue
 
-            if not is_cmis(intf):
-                print('test_download_valid_fw ', intf, ' Skipped (not CMIS)')
+            if not caps.cmis:
+                result_skip('test_download_valid_fw', intf, 'not CMIS')
                 continue
 
-            sub_port = cli_interface_subport(intf, namespace)
             # 0 = no breakout, 1 = first subport
-            if not (sub_port == 0 or sub_port == 1):
-                print('test_download_valid_fw ', intf, ' Skipped (not main (sub)port)')
+            if not caps.main_port:
+                result_skip('test_download_valid_fw', intf, 'not main (sub)port')
                 continue
 
             # version of download image (optional, don't assert if it's not there)
@@ -220,84 +317,98 @@ def test_download_valid_fw(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
             img_path = test_cfg_fw_img_path(test_cfg, switchname, intf, invalid=False, namespace=namespace)
             if not img_path:
                 # don't assert; not all txceivers may have download files
-                print('test_download_valid_fw ', intf, ' Skipped (no FW image)')
+                result_skip('test_download_valid_fw', intf, 'no FW image')
                 continue
             # on the other hand, if it's specified it should be there
             assert os.path.isfile(img_path)
-
-            # keep DOM disabled during test
-            with cli_dom_disabled(intf, namespace):
-
-                # get original FW versions (inactive may have been wiped out by invalid img test)
-                orig_active, orig_inactive = cli_fw_version(intf)
-                assert orig_active and orig_active == port_cfg['active_firmware']
-                assert orig_inactive and orig_inactive == port_cfg['inactive_firmware'] or orig_inactive=='0.0.0'
-
-                # get original link flap count
-                orig_flaps = cli_link_flap_count(intf, namespace)
-    
-                # get original I2C error (line) counts for later comparison
-                #clistr = cli_wrap_sh(cmd_dmesg_i2c_err)
-                clistr = cli_wrap_sh_grep(cmd_dmesg_i2c_err)
-                orig_i2c_errors = len(clistr.splitlines())
-
-                print('DBG test_download_valid_fw ', intf, ' download start')  # TEMPORARY DEBUG
-
-                # Record the start time
-                t_start = time.time()
-
-                # Do the download
-                cmdstr = cmd_fw_download  + ' ' + intf + ' ' + img_path
-                clistr = cli_wrap_sh(cmdstr)
-                # expect something like this on success:
-                #   CDB: Starting firmware download
-                #   Downloading ...  [###################################-]   99%  00:00:00
-                #   CDB: firmware download complete
-                #   Firmware download complete success
-                #   Total download Time: 0:17:11.060937
-                assert clistr
-                assert 'firmware download complete'         in clistr.lower()
-                assert 'firmware download complete success' in clistr.lower()
-
-                # Record the stop time
-                t_stop = time.time()
-
-                print('DBG test_download_valid_fw ', intf, ' download end')     # TEMPORARY DEBUG
-                #print('DBG clistr: \n', clistr, '\n')                               # TEMPORARY DEBUG
-
-                # Ensure the inactive firmware version matches the downloaded firmware.
-                # get current FW versions, check if they changed
-                curr_active, curr_inactive = cli_fw_version(intf)
-                # active should be unchanged
-                assert curr_active and curr_active == orig_active
-                # inactive should match cfg (if listed there)
-                if img_ver:
-                    assert curr_inactive and curr_inactive == img_ver
-    
-                # ensure no link flap is seen
-                # "show interface status" just gives the current state, not the
-                #  history, so it will miss short blips
-                up = cli_interface_admin_status_up(intf)
-                assert up, 'link not up'
-                #
-                curr_flaps = cli_link_flap_count(intf, namespace)
-                assert curr_flaps == orig_flaps, '%u link flaps' % (curr_flaps - orig_flaps)
-    
-                # Ensure that no I2C error is seen.
-                #clistr = cli_wrap_sh(cmd_dmesg_i2c_err)
-                clistr = cli_wrap_sh_grep(cmd_dmesg_i2c_err)
-                curr_i2c_errors = len(clistr.splitlines())
-                new_i2c_errors = curr_i2c_errors - orig_i2c_errors
-                assert new_i2c_errors == 0
-    
-                # Ensure that the firmware download time is less than 30 minutes
-                t_elapsed = t_stop - t_start
-                assert t_elapsed <= _MAX_TIME_DOWNLOAD_S
-
-                # On success, record the download time for later use by abort test.
-                DownloadTimes[switchname,intf] = t_elapsed
-
-            print('test_download_valid_fw ', intf, ' done') # TEMPORARY DEBUG
+            todo[intf] = (port_cfg, img_ver, img_path)
+
+    def download(intf):
+        port_cfg, img_ver, img_path = todo[intf]
+        switchname = duthost.hostname
+
+        # get original FW versions (inactive may have been wiped out by invalid img test)
+        orig_active, orig_inactive = cli_fw_version(intf)
+        assert orig_active and orig_active == port_cfg['active_firmware']
+        assert orig_inactive and orig_inactive == port_cfg['inactive_firmware'] or orig_inactive=='0.0.0'
+
+        # get original link flap count
+        orig_flaps = cli_link_flap_count(intf, namespace)
+
+        # I2C errors from here on (kernel log capture, see klog_wrapper)
+        i2c_mark = klog_mark()
+
+        print('DBG test_download_valid_fw ', intf, ' download start')  # TEMPORARY DEBUG
+
+        # Record the start time
+        t_start = time.time()
+
+        # Do the download
+        if _USE_CDB_ENGINE:
+            res = fw_cdb_download(intf, img_path)
+            print('DBG test_download_valid_fw ', res)                  # TEMPORARY DEBUG
+            assert res.ok, '%s download failed: %s' % (intf, res.msg)
+        else:
+            cmdstr = cmd_fw_download  + ' ' + intf + ' ' + img_path
+            clistr = cli_wrap_sh(cmdstr)
+            # expect something like this on success:
+            #   CDB: Starting firmware download
+            #   Downloading ...  [###################################-]   99%  00:00:00
+            #   CDB: firmware download complete
+            #   Firmware download complete success
+            #   Total download Time: 0:17:11.060937
+            assert clistr
+            assert 'firmware download complete'         in clistr.lower()
+            assert 'firmware download complete success' in clistr.lower()
+
+        # Record the stop time
+        t_stop = time.time()
+        img = fw_image_for_port(img_path, intf)
+        fw_bank_downloaded(intf, img)
+
+        print('DBG test_download_valid_fw ', intf, ' download end')     # TEMPORARY DEBUG
+        #print('DBG clistr: \n', clistr, '\n')                               # TEMPORARY DEBUG
+
+        # Ensure the inactive firmware version matches the downloaded firmware.
+        # get current FW versions, check if they changed
+        curr_active, curr_inactive = cli_fw_version(intf)
+        # active should be unchanged
+        assert curr_active and curr_active == orig_active
+        # inactive should match cfg (if listed there)
+        if img_ver:
+            assert curr_inactive and curr_inactive == img_ver
+
+        # ensure no link flap is seen
+        # "show interface status" just gives the current state, not the
+        #  history, so it will miss short blips
+        up = cli_interface_admin_status_up(intf)
+        assert up, 'link not up'
+        #
+        curr_flaps = cli_link_flap_count(intf, namespace)
+        assert curr_flaps == orig_flaps, '%u link flaps' % (curr_flaps - orig_flaps)
+
+        # Ensure that no I2C error is seen.
+        # (only errors on this port's I2C buses, or not naming a bus; with
+        # concurrent downloads the latter fail every port downloading at the
+        # time. Conservative, but fine.)
+        new_i2c_errors = klog_errors(i2c_mark, intf)
+        assert not new_i2c_errors, '%s: I2C errors: %s' % (intf, new_i2c_errors)
+
+        # Ensure that the firmware download time is less than 30 minutes
+        t_elapsed = t_stop - t_start
+        assert t_elapsed <= _MAX_TIME_DOWNLOAD_S
+
+        # On success, record the download time.
+        download_times[switchname,intf] = t_elapsed
+        _store_download(switchname, intf, img, t_elapsed)
+
+        _fw_port_done('test_download_valid_fw', intf)
+
+    download_times = _download_times()   # loaded before the threads
+
+    # Ports on different I2C buses download concurrently, see sched_fw_download.
+    # It also keeps DOM disabled during each download.
+    sched_fw_download(list(todo), download, _MAX_PARALLEL_DOWNLOADS, namespace)
 
 
 def test_download_kill(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
@@ -317,77 +428,81 @@ def test_download_kill(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
     global ans_host
     ans_host = duthost
     portmap, dev_conn = get_dev_conn(duthost, conn_graph_facts, enum_frontend_asic_index)
-    namespace = duthost.get_namespace_from_asic_id(enum_frontend_asic_index)
+    sess = util_session(duthost)
+    namespace = sess.namespace
+    port_caps = sess.caps()
 
-    test_cfg = test_cfg_read()
+    test_cfg = sess.test_cfg
     assert test_cfg, 'Failed to read test config file'
 
     for intf in dev_conn:
-        if intf not in xcvr_skip_list[duthost.hostname]:
-            switchname = duthost.hostname
-
-            # Do not attempt if not dual-bank support!
-            port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
-            assert port_cfg
-            if not port_cfg['dual_bank_support']:
-                print('test_download_kill ', intf, ' Skipped (not dual bank)')
-                continue
-
-            if not is_cmis(intf):
-                print('test_download_kill ', intf, ' Skipped (not CMIS)')
-                continue
+        if intf not in xcvr_skip_list[duthost.hostname] and not _fw_resumed('test_download_kill', intf):
+            with result_step('test_download_kill', intf, 'port'):
+                switchname = duthost.hostname
+                caps = port_caps[intf]
+
+                # Do not attempt if not dual-bank support!
+                port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
+                assert port_cfg
+                if not caps.dual_bank:
+                    result_skip('test_download_kill', intf, 'not dual bank')
+                    continue
+
+                if not caps.cmis:
+                    result_skip('test_download_kill', intf, 'not CMIS')
+                    continue
+
+                # 0 = no breakout, 1 = first subport
+                if not caps.main_port:
+                    result_skip('test_download_kill', intf, 'not main (sub)port')
+                    continue
+
+                img_path = test_cfg_fw_img_path(test_cfg, switchname, intf, invalid=False, namespace=namespace)
+                if not img_path:
+                    # don't assert; not all txceivers may have download files
+                    result_skip('test_download_kill', intf, 'no FW image')
+                    continue
+                # on the other hand, if the file is specified it should be there
+                assert os.path.isfile(img_path)
+
+                # keep DOM disabled during test
+                with cli_dom_disabled(intf, namespace):
+
+                    # get original FW versions
+                    orig_active, orig_inactive = cli_fw_version(intf)
+
+                    # get original link flap count
+                    orig_flaps = cli_link_flap_count(intf, namespace)
 
-            sub_port = cli_interface_subport(intf, namespace)
-            # 0 = no breakout, 1 = first subport
-            if not (sub_port == 0 or sub_port == 1):
-                print('test_download_kill ', intf, ' Skipped (not main (sub)port)')
-                continue
-
-            img_path = test_cfg_fw_img_path(test_cfg, switchname, intf, invalid=False, namespace=namespace)
-            if not img_path:
-                # don't assert; not all txceivers may have download files
-                print('test_download_kill ', intf, ' Skipped (no FW image)')
-                continue
-            # on the other hand, if the file is specified it should be there
-            assert os.path.isfile(img_path)
-
-            # keep DOM disabled during test
-            with cli_dom_disabled(intf, namespace):
-
-                # get original FW versions
-                orig_active, orig_inactive = cli_fw_version(intf)
-
-                # get original link flap count
-                orig_flaps = cli_link_flap_count(intf, namespace)
-
-                # start download
-                cmdstr = cmd_fw_download  + ' ' + intf + ' ' + img_path
-                p = cli_proc_spawn(cmdstr)
-                assert cli_proc_running(p) , 'failed to start download process'
-                # (after this, don't assert until after p.kill)
+                    # start download
+                    cmdstr = cmd_fw_download  + ' ' + intf + ' ' + img_path
+                    p = cli_proc_spawn(cmdstr)
+                    assert cli_proc_running(p) , 'failed to start download process'
+                    # (after this, don't assert until after p.kill)
 
-                print('waiting %ds before killing download..' % (_DELAY_DOWNLOAD_KILL_S)) # TEMPORARY
-                time.sleep(_DELAY_DOWNLOAD_KILL_S)
+                    print('waiting %ds before killing download..' % (_DELAY_DOWNLOAD_KILL_S)) # TEMPORARY
+                    trace_sleep(_DELAY_DOWNLOAD_KILL_S)
 
-                # kill the download process
-                cli_proc_kill(p)
-                time.sleep(0.5)
-                assert not cli_proc_running(p) , 'failed to kill download process'
+                    # kill the download process
+                    cli_proc_kill(p)
+                    trace_sleep(0.5)
+                    assert not cli_proc_running(p) , 'failed to kill download process'
+                    fw_bank_downloaded(intf)
 
-                # get and check FW versions
-                curr_active, curr_inactive = cli_fw_version(intf)
-                #print('killed download ', intf, ' FW act/inact=', curr_active,'/',curr_inactive) # TEMPORARY
-                assert curr_active and curr_active == orig_active
-                assert curr_inactive and curr_inactive == '0.0.0'
+                    # get and check FW versions
+                    curr_active, curr_inactive = cli_fw_version(intf)
+                    #print('killed download ', intf, ' FW act/inact=', curr_active,'/',curr_inactive) # TEMPORARY
+                    assert curr_active and curr_active == orig_active
+                    assert curr_inactive and curr_inactive == '0.0.0'
 
-                # ensure no link flap is seen
-                up = cli_interface_admin_status_up(intf)
-                assert up, 'link not up'
-                #
-                curr_flaps = cli_link_flap_count(intf, namespace)
-                assert curr_flaps == orig_flaps, '%u link flaps' % (curr_flaps - orig_flaps)
+                    # ensure no link flap is seen
+                    up = cli_interface_admin_status_up(intf)
+                    assert up, 'link not up'
+                    #
+                    curr_flaps = cli_link_flap_count(intf, namespace)
+                    assert curr_flaps == orig_flaps, '%u link flaps' % (curr_flaps - orig_flaps)
 
-            print('test_download_kill ', intf, ' done') # TEMPORARY DEBUG
+                _fw_port_done('test_download_kill', intf)
 
 
 def test_download_abort(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
@@ -400,10 +515,10 @@ def test_download_abort(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
 
     Abort the same way as in the "kill" test.
 
-    For "percentage done", we can't capture the "%" output that' constantly 
-    overwritten. It does not show up in stdout. Instead, we use a global dict
-    with <switchname,portname> as keys and total download time as values. 
-    Here, we're assuming this was populated by test_download_valid_fw.
+    For "percentage done", sfputil only draws its progress bar on a terminal,
+    so the download runs on a pty and we parse the bar (cli_proc_spawn_pty).
+    With _USE_CDB_ENGINE, the engine's progress callback aborts instead.
+    Either way no reference download time (calibration run) is needed.
     '''
     logging.info("Check process abort during Download")
 
@@ -411,82 +526,85 @@ def test_download_abort(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
     global ans_host
     ans_host = duthost
     portmap, dev_conn = get_dev_conn(duthost, conn_graph_facts, enum_frontend_asic_index)
-    namespace = duthost.get_namespace_from_asic_id(enum_frontend_asic_index)
+    sess = util_session(duthost)
+    namespace = sess.namespace
+    port_caps = sess.caps()
 
-    test_cfg = test_cfg_read()
+    test_cfg = sess.test_cfg
     assert test_cfg, 'Failed to read test config file'
 
     for intf in dev_conn:
-        if intf not in xcvr_skip_list[duthost.hostname]:
-            switchname = duthost.hostname
-
-            # Get total download time (needed to figure out when to abort)
-            if not (switchname,intf) in DownloadTimes:
-                print('test_download_abort ', intf, ' Skipped (no reference download time)')
-                continue
-            t_base = DownloadTimes[switchname,intf]
-            assert t_base > 100, 'Invalid total download time %u recorded?' % (t_base)
-
-            # Do not attempt if not dual-bank support!
-            port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
-            assert port_cfg
-            if not port_cfg['dual_bank_support']:
-                print('test_download_abort ', intf, ' Skipped (not dual bank)')
-                continue
-
-            if not is_cmis(intf):
-                print('test_download_abort ', intf, ' Skipped (not CMIS)')
-                continue
-
-            sub_port = cli_interface_subport(intf, namespace)
-            # 0 = no breakout, 1 = first subport
-            if not (sub_port == 0 or sub_port == 1):
-                print('test_download_abort ', intf, ' Skipped (not main (sub)port)')
-                continue
-
-            img_path = test_cfg_fw_img_path(test_cfg, switchname, intf, invalid=False, namespace=namespace)
-            if not img_path:
-                # don't assert; not all txceivers may have download files
-                print('test_download_abort ', intf, ' Skipped (no FW image)')
-                continue
-            # on the other hand, if the file is specified it should be there
-            assert os.path.isfile(img_path)
-
-            # keep DOM disabled during test
-            with cli_dom_disabled(intf, namespace):
-
-                # get original FW versions
-                orig_active, orig_inactive = cli_fw_version(intf)
-
-                # for each percentage
-                for percentage in (20, 40, 60, 80, 98):
-                    t_abort = t_base * percentage / 100.0
-
-                    print('test_download_abort(%d%%)... ' % (percentage)) # TEMPORARY(?)
-
-                    # start download
-                    cmdstr = cmd_fw_download  + ' ' + intf + ' ' + img_path
-                    p = cli_proc_spawn(cmdstr)
-                    assert cli_proc_running(p) , 'failed to start download process'
-                    # (after this, don't assert until after p.kill)
-
-                    print('waiting %ds before aborting download..' % (t_abort)) # TEMPORARY
-                    time.sleep(t_abort)
-
-                    # kill the download process
-                    cli_proc_kill(p)
-                    time.sleep(0.5)
-                    assert not cli_proc_running(p) , 'failed to kill download process'
-
-                    # get and check FW versions
-                    curr_active, curr_inactive = cli_fw_version(intf)
-                    print('aborted download ', intf, ' FW act/inact=', curr_active,'/',curr_inactive) # TEMPORARY
-                    assert curr_active and curr_active == orig_active
-                    assert curr_inactive and curr_inactive == '0.0.0'
-
-                    print('test_download_abort(%d%%) done ' % (percentage)) # TEMPORARY(?)
-
-            print('test_download_abort ', intf, ' done') # TEMPORARY
+        if intf not in xcvr_skip_list[duthost.hostname] and not _fw_resumed('test_download_abort', intf):
+            with result_step('test_download_abort', intf, 'port'):
+                switchname = duthost.hostname
+                caps = port_caps[intf]
+
+                # Do not attempt if not dual-bank support!
+                port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
+                assert port_cfg
+                if not caps.dual_bank:
+                    result_skip('test_download_abort', intf, 'not dual bank')
+                    continue
+
+                if not caps.cmis:
+                    result_skip('test_download_abort', intf, 'not CMIS')
+                    continue
+
+                # 0 = no breakout, 1 = first subport
+                if not caps.main_port:
+                    result_skip('test_download_abort', intf, 'not main (sub)port')
+                    continue
+
+                img_path = test_cfg_fw_img_path(test_cfg, switchname, intf, invalid=False, namespace=namespace)
+                if not img_path:
+                    # don't assert; not all txceivers may have download files
+                    result_skip('test_download_abort', intf, 'no FW image')
+                    continue
+                # on the other hand, if the file is specified it should be there
+                assert os.path.isfile(img_path)
+
+                # keep DOM disabled during test
+                with cli_dom_disabled(intf, namespace):
+
+                    # get original FW versions
+                    orig_active, orig_inactive = cli_fw_version(intf)
+
+                    # for each percentage
+                    for percentage in (20, 40, 60, 80, 98):
+
+                        print('test_download_abort(%d%%)... ' % (percentage)) # TEMPORARY(?)
+
+                        if _USE_CDB_ENGINE:
+                            abort_at = lambda done, total: done * 100 < total * percentage
+                            res = fw_cdb_download(intf, img_path, progress=abort_at)
+                            assert not res.ok and 'aborted' in res.msg, \
+                                'download not aborted at %d%%: %s' % (percentage, res.msg)
+                        else:
+                            # start download
+                            cmdstr = cmd_fw_download  + ' ' + intf + ' ' + img_path
+                            p = cli_proc_spawn_pty(cmdstr)
+                            assert cli_proc_running(p) , 'failed to start download process'
+                            # (after this, don't assert until after p.kill)
+
+                            progress = cli_proc_wait_progress(p, percentage, _MAX_TIME_DOWNLOAD_S)
+
+                            # kill the download process
+                            cli_proc_kill(p)
+                            trace_sleep(0.5)
+                            assert not cli_proc_running(p) , 'failed to kill download process'
+                            assert progress >= percentage and progress < 100, \
+                                'download at %d%%, not aborted at %d%%' % (progress, percentage)
+                        fw_bank_downloaded(intf)
+
+                        # get and check FW versions
+                        curr_active, curr_inactive = cli_fw_version(intf)
+                        print('aborted download ', intf, ' FW act/inact=', curr_active,'/',curr_inactive) # TEMPORARY
+                        assert curr_active and curr_active == orig_active
+                        assert curr_inactive and curr_inactive == '0.0.0'
+
+                        print('test_download_abort(%d%%) done ' % (percentage)) # TEMPORARY(?)
+
+                _fw_port_done('test_download_abort', intf)
 
 
 def test_download_lpmode(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
@@ -502,89 +620,99 @@ def test_download_lpmode(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
     global ans_host
     ans_host = duthost
     portmap, dev_conn = get_dev_conn(duthost, conn_graph_facts, enum_frontend_asic_index)
+    sess = util_session(duthost)
 
     logging.info("Check download in LPMode")
 
-    namespace = duthost.get_namespace_from_asic_id(enum_frontend_asic_index)
-    test_cfg = test_cfg_read()
+    namespace = sess.namespace
+    port_caps = sess.caps()
+    test_cfg = sess.test_cfg
     assert test_cfg, 'Failed to read test config file'
 
     for intf in dev_conn:
-        if intf not in xcvr_skip_list[duthost.hostname]:
-            switchname  = duthost.hostname
-            portlist    = test_cfg_ports(test_cfg, switchname, namespace=namespace)
-            port_cfg = test_cfg_portcfg(test_cfg, switchname, intf)
-            assert port_cfg
+        if intf not in xcvr_skip_list[duthost.hostname] and not _fw_resumed('test_download_lpmode', intf):
+            with result_step('test_download_lpmode', intf, 'port'):
+                switchname  = duthost.hostname
+                caps = port_caps[intf]
+                portlist    = test_cfg_ports(test_cfg, switchname, namespace=namespace)
+                port_cfg = test_cfg_portcfg(test_cfg, switchname, intf)
+                assert port_cfg
+
+                # 0 = no breakout, 1 = first subport
+                if not caps.main_port:
+                    result_skip('test_download_lpmode', intf, 'not main (sub)port')
+                    continue
+
+                # check if LPMode supported, otherwise skip this port
+                if not caps.lpmode:
+                    logging.info("Skip LPMode test, %s does not support LPMode" % (intf))
+                    print("Skip LPMode test, %s does not support LPMode" % (intf))
+                    continue
 
-            sub_port = cli_interface_subport(intf, namespace)
-            # 0 = no breakout, 1 = first subport
-            if not (sub_port == 0 or sub_port == 1):
-                print('test_download_lpmode ', intf, ' Skipped (not main (sub)port)')
-                continue
-
-            # check if LPMode supported, otherwise skip this port
-            if not has_lpmode(intf):
-                logging.info("Skip LPMode test, %s does not support LPMode" % (intf))
-                print("Skip LPMode test, %s does not support LPMode" % (intf))
-                continue
-
-            # get original FW versions
-            orig_active, orig_inactive = cli_fw_version(intf)
+                # get original FW versions
+                orig_active, orig_inactive = cli_fw_version(intf)
 
-            # version of download image
-            img_ver = test_cfg_fw_img_ver(test_cfg, switchname, intf, namespace=namespace)
+                # version of download image
+                img_ver = test_cfg_fw_img_ver(test_cfg, switchname, intf, namespace=namespace)
 
-            # download image path
-            img_path = test_cfg_fw_img_path(test_cfg, switchname, intf, invalid=False, namespace=namespace)
-            if not img_path:
-                print('test_download_lpmode ', intf, ' Skipped (no FW image)')
-                continue
-            assert os.path.isfile(img_path)
+                # download image path
+                img_path = test_cfg_fw_img_path(test_cfg, switchname, intf, invalid=False, namespace=namespace)
+                if not img_path:
+                    result_skip('test_download_lpmode', intf, 'no FW image')
+                    continue
+                assert os.path.isfile(img_path)
 
-            # keep DOM disabled during test
-            with cli_dom_disabled(intf, namespace):
+                # keep DOM disabled during test
+                with cli_dom_disabled(intf, namespace):
 
-                # set LPMode
-                cmdstr = cmd_int_set_lpmode + intf
-                resp = cli_wrap(cmdstr)
-                assert resp, '%s failed' % (cmdstr)
-                time.sleep(_DELAY_AFTER_IF_LPMODE_ON_S)
+                    # set LPMode
+                    cmdstr = cmd_int_set_lpmode + intf
+                    resp = cli_wrap(cmdstr)
+                    assert resp, '%s failed' % (cmdstr)
+                    trace_sleep(_DELAY_AFTER_IF_LPMODE_ON_S)
 
-                # Ensure the port is in low power mode 
-                cmdstr = cmd_int_show_lpmode + intf
-                clistr = cli_wrap(cmdstr)
-                lines = clistr.splitlines()
-                assert intf in lines[2] and 'On' in lines[2]
+                    # Ensure the port is in low power mode 
+                    cli_step_reset()    # LPMode changed
+                    lpmode = cli_interface_lpmode(intf)
+                    assert lpmode == 'On', '%s not LPMode' % (intf)
 
-                print('DBG test_download_lpmode ', intf, ' download start')  # TEMPORARY DEBUG
+                    print('DBG test_download_lpmode ', intf, ' download start')  # TEMPORARY DEBUG
 
-                # download
-                cmdstr = cmd_fw_download  + ' ' + intf + ' ' + img_path
-                clistr = cli_wrap_sh(cmdstr)
+                    # download; always, even if the image is already in the inactive
+                    # bank (fw_ensure_inactive): downloading in LPMode is the test
+                    cmdstr = cmd_fw_download  + ' ' + intf + ' ' + img_path
+                    t_start = time.time()
+                    clistr = cli_wrap_sh(cmdstr)
+                    t_elapsed = time.time() - t_start
 
-                print('DBG test_download_lpmode ', intf, ' download end')  # TEMPORARY DEBUG
+                    print('DBG test_download_lpmode ', intf, ' download end')  # TEMPORARY DEBUG
 
-                # Ensure the firmware download is successful. 
-                assert 'firmware download complete'         in clistr.lower()
-                assert 'firmware download complete success' in clistr.lower()
+                    # Ensure the firmware download is successful. 
+                    assert 'firmware download complete'         in clistr.lower()
+                    assert 'firmware download complete success' in clistr.lower()
+                    img = fw_image_for_port(img_path, intf)
+                    fw_bank_downloaded(intf, img)
 
-                # Ensure active and inactive firmware versions are as expected 
-                curr_active, curr_inactive = cli_fw_version(intf)
-                # active should be unchanged
-                assert curr_active and curr_active == orig_active
-                # inactive should match cfg (if listed there)
-                if img_ver:
-                    assert curr_inactive and curr_inactive == img_ver
+                    # Ensure active and inactive firmware versions are as expected 
+                    curr_active, curr_inactive = cli_fw_version(intf)
+                    # active should be unchanged
+                    assert curr_active and curr_active == orig_active
+                    # inactive should match cfg (if listed there)
+                    if img_ver:
+                        assert curr_inactive and curr_inactive == img_ver
+                    # the image is in the inactive bank now, also for a later
+                    # process (_ensure_valid_fw after a resume)
+                    _store_download(switchname, intf, img, t_elapsed)
 
-                # Revert the port to high power mode after the test
-                cmdstr = cmd_int_clr_lpmode + intf
-                resp = cli_wrap(cmdstr)
-                assert resp, '%s failed' % (cmdstr)
+                    # Revert the port to high power mode after the test
+                    cmdstr = cmd_int_clr_lpmode + intf
+                    resp = cli_wrap(cmdstr)
+                    assert resp, '%s failed' % (cmdstr)
 
-                # probably no need to wait for link up here; subsequent tests are
-                # only concerned with download functionality(?)
+                    # probably no need to wait for link up here; subsequent tests are
+                    # only concerned with download functionality(?)
 
-            print('test_download_lpmode ', intf, ' done') # TEMPORARY DEBUG
+                _fw_port_done('test_download_lpmode', intf)
 
 
 def test_download_reset(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
@@ -601,8 +729,9 @@ def test_download_reset(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
     reliably check link down. Which seems redundant and irrelevant anyway; it's
     already checked in the sfputil tests.)
 
-    Requires that a (valid) download was done right before. Here we're ASSUMING
-    that was done, so we do NOT need to do another.
+    Requires a valid image in the inactive bank. Normally the previous download
+    test left it there; fw_ensure_inactive only downloads if it did not (e.g.
+    when this test is run alone).
     '''
     logging.info("Check reset after Download")
 
@@ -610,60 +739,71 @@ def test_download_reset(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
     global ans_host
     ans_host = duthost
     portmap, dev_conn = get_dev_conn(duthost, conn_graph_facts, enum_frontend_asic_index)
-    namespace = duthost.get_namespace_from_asic_id(enum_frontend_asic_index)
+    sess = util_session(duthost)
+    namespace = sess.namespace
+    port_caps = sess.caps()
 
-    test_cfg = test_cfg_read()
+    test_cfg = sess.test_cfg
     assert test_cfg, 'Failed to read test config file'
 
     for intf in dev_conn:
-        if intf not in xcvr_skip_list[duthost.hostname]:
-            switchname = duthost.hostname
-            portlist = test_cfg_ports(test_cfg, switchname, namespace=namespace)
-            subports = cli_interface_all_subports(intf, portlist, namespace)
-
-            if not is_cmis(intf):
-                print('test_download_reset ', intf, ' Skipped (not CMIS)')
-                continue
-
-            sub_port = cli_interface_subport(intf, namespace)
-            # 0 = no breakout, 1 = first subport
-            if not (sub_port == 0 or sub_port == 1):
-                print('test_download_reset ', intf, ' Skipped (not main (sub)port)')
-                continue
-
-            # keep DOM disabled during test
-            with cli_dom_disabled(intf, namespace):
-
-                # get original FW versions
-                orig_active, orig_inactive = cli_fw_version(intf)
+        if intf not in xcvr_skip_list[duthost.hostname] and not _fw_resumed('test_download_reset', intf):
+            with result_step('test_download_reset', intf, 'port'):
+                switchname = duthost.hostname
+                caps = port_caps[intf]
+                portlist = test_cfg_ports(test_cfg, switchname, namespace=namespace)
+                subports = cli_interface_all_subports(intf, portlist, namespace)
+
+                if not caps.cmis:
+                    result_skip('test_download_reset', intf, 'not CMIS')
+                    continue
+
+                # 0 = no breakout, 1 = first subport
+                if not caps.main_port:
+                    result_skip('test_download_reset', intf, 'not main (sub)port')
+                    continue
+
+                # image for the inactive bank, if any (not for single bank modules)
+                img_path = None
+                if caps.dual_bank and caps.fw_img:
+                    img_path = test_cfg_fw_img_path(test_cfg, switchname, intf, invalid=False, namespace=namespace)
+
+                # keep DOM disabled during test
+                with cli_dom_disabled(intf, namespace):
+
+                    # valid image in inactive bank; download only if not there yet
+                    if img_path:
+                        _ensure_valid_fw(switchname, intf, img_path)
+
+                    # get original FW versions
+                    orig_active, orig_inactive = cli_fw_version(intf)
     
-                # assuming download already done
+                    # reset
+                    cmdstr = cmd_int_trans_reset + ' ' + intf
+                    resp = cli_wrap(cmdstr)
+                    caps_invalidate(intf)  # module (caps) read again when next needed
+                    assert resp, '%s failed' % (cmdstr)
+                    # wait for port to power down
+                    trace_sleep(_DELAY_AFTER_IF_RESET_S)
     
-                # reset
-                cmdstr = cmd_int_trans_reset + ' ' + intf
-                resp = cli_wrap(cmdstr)
-                assert resp, '%s failed' % (cmdstr)
-                # wait for port to power down
-                time.sleep(_DELAY_AFTER_IF_RESET_S)
+                    if switchname != 'Arista-7050CX3-32S-C32' :
+                        # Ensure port is linked down
+                        up = cli_interface_oper_status_up(intf)
+                        assert not up, '%s not down' % (intf)
     
-                if switchname != 'Arista-7050CX3-32S-C32' :
-                    # Ensure port is linked down
-                    up = cli_interface_oper_status_up(intf)
-                    assert not up, '%s not down' % (intf)
+                    # shutdown/startup all subports related to intf
+                    for sub in subports:
+                        cli_interface_shutdown(sub)
+                    trace_sleep(_DELAY_AFTER_IF_SHUTDOWN_S)
+                    for sub in subports:
+                        cli_interface_startup(sub)
     
-                # shutdown/startup all subports related to intf
-                for sub in subports:
-                    cli_interface_shutdown(sub)
-                time.sleep(_DELAY_AFTER_IF_SHUTDOWN_S)
-                for sub in subports:
-                    cli_interface_startup(sub)
-    
-                # get current FW versions, check if they changed
-                curr_active, curr_inactive = cli_fw_version(intf)
-                assert curr_active and curr_active == orig_active
-                assert curr_inactive and curr_inactive == orig_inactive
+                    # get current FW versions, check if they changed
+                    curr_active, curr_inactive = cli_fw_version(intf)
+                    assert curr_active and curr_active == orig_active
+                    assert curr_inactive and curr_inactive == orig_inactive
 
-            print('test_download_reset ', intf, ' done') # TEMPORARY DEBUG
+                _fw_port_done('test_download_reset', intf)
 
 
 def test_download_run(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
@@ -678,8 +818,9 @@ def test_download_run(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
     firmware version. 
     Ensure that no I2C error is seen.
 
-    Requires that a (valid) download was done right before. Here we're ASSUMING
-    that was done, so we do NOT need to do another.
+    Requires a valid image in the inactive bank. Normally the previous download
+    test left it there; fw_ensure_inactive only downloads if it did not (e.g.
+    when this test is run alone).
     '''
     logging.info("Check Run after Download")
 
@@ -687,72 +828,81 @@ def test_download_run(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
     global ans_host
     ans_host = duthost
     portmap, dev_conn = get_dev_conn(duthost, conn_graph_facts, enum_frontend_asic_index)
-    namespace = duthost.get_namespace_from_asic_id(enum_frontend_asic_index)
+    sess = util_session(duthost)
+    namespace = sess.namespace
+    port_caps = sess.caps()
 
-    test_cfg = test_cfg_read()
+    test_cfg = sess.test_cfg
     assert test_cfg, 'Failed to read test config file'
 
     for intf in dev_conn:
-        if intf not in xcvr_skip_list[duthost.hostname]:
-            switchname  = duthost.hostname
-            portlist = test_cfg_ports(test_cfg, switchname, namespace=namespace)
-
-            if not is_cmis(intf):
-                print('test_download_run ', intf, ' Skipped (not CMIS)')
-                continue
-
-            sub_port = cli_interface_subport(intf, namespace)
-            # 0 = no breakout, 1 = first subport
-            if not (sub_port == 0 or sub_port == 1):
-                print('test_download_run ', intf, ' Skipped (not main (sub)port)')
-                continue
+        if intf not in xcvr_skip_list[duthost.hostname] and not _fw_resumed('test_download_run', intf):
+            with result_step('test_download_run', intf, 'port'):
+                switchname  = duthost.hostname
+                caps = port_caps[intf]
+                portlist = test_cfg_ports(test_cfg, switchname, namespace=namespace)
+
+                if not caps.cmis:
+                    result_skip('test_download_run', intf, 'not CMIS')
+                    continue
+
+                # 0 = no breakout, 1 = first subport
+                if not caps.main_port:
+                    result_skip('test_download_run', intf, 'not main (sub)port')
+                    continue
+
+                # image for the inactive bank, if any (not for single bank modules)
+                img_path = None
+                if caps.dual_bank and caps.fw_img:
+                    img_path = test_cfg_fw_img_path(test_cfg, switchname, intf, invalid=False, namespace=namespace)
+
+                #shutdown port (and subports)
+                subports = cli_interface_all_subports(intf, portlist, namespace)
+                for sub in subports:
+                    cli_interface_shutdown(sub)
+                trace_sleep(_DELAY_AFTER_IF_SHUTDOWN_S)
 
-            #shutdown port (and subports)
-            subports = cli_interface_all_subports(intf, portlist, namespace)
-            for sub in subports:
-                cli_interface_shutdown(sub)
-            time.sleep(_DELAY_AFTER_IF_SHUTDOWN_S)
+                # keep DOM disabled during test
+                with cli_dom_disabled(intf, namespace):
 
-            # keep DOM disabled during test
-            with cli_dom_disabled(intf, namespace):
+                    # valid image in inactive bank; download only if not there yet
+                    if img_path:
+                        _ensure_valid_fw(switchname, intf, img_path)
 
-                # get original FW versions
-                orig_active, orig_inactive = cli_fw_version(intf)
+                    # get original FW versions
+                    orig_active, orig_inactive = cli_fw_version(intf)
     
-                # get original I2C error (line) counts for later comparison
-                #clistr = cli_wrap_sh(cmd_dmesg_i2c_err)
-                clistr = cli_wrap_sh_grep(cmd_dmesg_i2c_err)
-                orig_i2c_errors = len(clistr.splitlines())
+                    # I2C errors from here on (kernel log capture, see klog_wrapper)
+                    i2c_mark = klog_mark()
     
-                # issue run command
-                #   admin@sonic:~$ sudo sfputil firmware run Ethernet32
-                #   Running firmware: Non-hitless Reset to Inactive Image
-                #   Firmware run in mode=0 success
-                cmdstr = cmd_fw_run + intf
-                clistr = cli_wrap_sh(cmdstr)
-                assert 'firmware run in mode=0 success' in clistr.lower()
+                    # issue run command
+                    #   admin@sonic:~$ sudo sfputil firmware run Ethernet32
+                    #   Running firmware: Non-hitless Reset to Inactive Image
+                    #   Firmware run in mode=0 success
+                    cmdstr = cmd_fw_run + intf
+                    clistr = cli_wrap_sh(cmdstr)
+                    fw_bank_invalidate(intf)    # banks swapped
+                    caps_invalidate(intf)
+                    assert 'firmware run in mode=0 success' in clistr.lower()
     
-                # get current FW versions, check if they changed
-                curr_active, curr_inactive = cli_fw_version(intf)
-                assert curr_active   and curr_active == orig_inactive # swapped
-                assert curr_inactive and curr_inactive == orig_active # swapped
+                    # get current FW versions, check if they changed
+                    curr_active, curr_inactive = cli_fw_version(intf)
+                    assert curr_active   and curr_active == orig_inactive # swapped
+                    assert curr_inactive and curr_inactive == orig_active # swapped
     
-                # Ensure that no I2C error is seen.
-                #clistr = cli_wrap_sh(cmd_dmesg_i2c_err)
-                clistr = cli_wrap_sh_grep(cmd_dmesg_i2c_err)
-                curr_i2c_errors = len(clistr.splitlines())
-                new_i2c_errors = curr_i2c_errors - orig_i2c_errors
-                assert new_i2c_errors == 0
+                    # Ensure that no I2C error is seen.
+                    new_i2c_errors = klog_errors(i2c_mark, intf)
+                    assert not new_i2c_errors, '%s: I2C errors: %s' % (intf, new_i2c_errors)
     
-                # startup port (and subports)
-                for sub in subports:
-                    cli_interface_shutdown(sub)
-                # here we don't really care if links come up, but wait long enough
-                # that they'll most likely be up before any following test that 
-                # might expect links up
-                time.sleep(_DELAY_AFTER_IF_STARTUP_S)
+                    # startup port (and subports)
+                    for sub in subports:
+                        cli_interface_shutdown(sub)
+                    # here we don't really care if links come up, but wait long enough
+                    # that they'll most likely be up before any following test that 
+                    # might expect links up
+                    trace_sleep(_DELAY_AFTER_IF_STARTUP_S)
 
-            print('test_download_run ', intf, ' done') # TEMPORARY DEBUG
+                _fw_port_done('test_download_run', intf)
 
 
 def test_download_commit(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
@@ -774,72 +924,71 @@ def test_download_commit(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
     global ans_host
     ans_host = duthost
     portmap, dev_conn = get_dev_conn(duthost, conn_graph_facts, enum_frontend_asic_index)
-    namespace = duthost.get_namespace_from_asic_id(enum_frontend_asic_index)
+    sess = util_session(duthost)
+    namespace = sess.namespace
+    port_caps = sess.caps()
 
-    test_cfg = test_cfg_read()
+    test_cfg = sess.test_cfg
     assert test_cfg, 'Failed to read test config file'
 
     for intf in dev_conn:
-        if intf not in xcvr_skip_list[duthost.hostname]:
-            switchname  = duthost.hostname
-            portlist = test_cfg_ports(test_cfg, switchname, namespace=namespace)
-
-            if not is_cmis(intf):
-                print('test_download_commit ', intf, ' Skipped (not CMIS)')
-                continue
-
-            sub_port = cli_interface_subport(intf, namespace)
-            # 0 = no breakout, 1 = first subport
-            if not (sub_port == 0 or sub_port == 1):
-                print('test_download_commit ', intf, ' Skipped (not main (sub)port)')
-                continue
-
-            #shutdown port (and subports)
-            subports = cli_interface_all_subports(intf, portlist, namespace)
-            for sub in subports:
-                cli_interface_shutdown(sub)
-            time.sleep(_DELAY_AFTER_IF_SHUTDOWN_S)
+        if intf not in xcvr_skip_list[duthost.hostname] and not _fw_resumed('test_download_commit', intf):
+            with result_step('test_download_commit', intf, 'port'):
+                switchname  = duthost.hostname
+                caps = port_caps[intf]
+                portlist = test_cfg_ports(test_cfg, switchname, namespace=namespace)
+
+                if not caps.cmis:
+                    result_skip('test_download_commit', intf, 'not CMIS')
+                    continue
+
+                # 0 = no breakout, 1 = first subport
+                if not caps.main_port:
+                    result_skip('test_download_commit', intf, 'not main (sub)port')
+                    continue
+
+                #shutdown port (and subports)
+                subports = cli_interface_all_subports(intf, portlist, namespace)
+                for sub in subports:
+                    cli_interface_shutdown(sub)
+                trace_sleep(_DELAY_AFTER_IF_SHUTDOWN_S)
 
-            # keep DOM disabled during test
-            with cli_dom_disabled(intf, namespace):
+                # keep DOM disabled during test
+                with cli_dom_disabled(intf, namespace):
 
-                # get original committed bank (and corresponding version)
-                orig_bank, orig_ver = cli_committed_fw_bank_ver(intf)
+                    # get original committed bank (and corresponding version)
+                    orig_bank, orig_ver = cli_committed_fw_bank_ver(intf)
     
-                # get original I2C error (line) counts for later comparison
-                #clistr = cli_wrap_sh(cmd_dmesg_i2c_err)
-                clistr = cli_wrap_sh_grep(cmd_dmesg_i2c_err)
-                orig_i2c_errors = len(clistr.splitlines())
+                    # I2C errors from here on (kernel log capture, see klog_wrapper)
+                    i2c_mark = klog_mark()
     
-                # do the commit
-                #   admin@sonic:~$ sfputil firmware commit Ethernet180
-                #   Firmware commit successful
-                cmdstr = cmd_fw_commit + intf
-                clistr = cli_wrap_sh(cmdstr)
-                assert 'firmware commit successful' in clistr.lower()
+                    # do the commit
+                    #   admin@sonic:~$ sfputil firmware commit Ethernet180
+                    #   Firmware commit successful
+                    cmdstr = cmd_fw_commit + intf
+                    clistr = cli_wrap_sh(cmdstr)
+                    fw_bank_invalidate(intf)
+                    assert 'firmware commit successful' in clistr.lower()
     
-                # get current committed bank
-                curr_bank, curr_ver = cli_committed_fw_bank_ver(intf)
-                assert curr_bank and curr_bank != orig_bank
-                # no guarantee that the two banks don't contain the same version
-                #assert curr_ver and curr_ver != orig_ver
+                    # get current committed bank
+                    curr_bank, curr_ver = cli_committed_fw_bank_ver(intf)
+                    assert curr_bank and curr_bank != orig_bank
+                    # no guarantee that the two banks don't contain the same version
+                    #assert curr_ver and curr_ver != orig_ver
     
-                # Ensure that no I2C error is seen.
-                #clistr = cli_wrap_sh(cmd_dmesg_i2c_err)
-                clistr = cli_wrap_sh_grep(cmd_dmesg_i2c_err)
-                curr_i2c_errors = len(clistr.splitlines())
-                new_i2c_errors = curr_i2c_errors - orig_i2c_errors
-                assert new_i2c_errors == 0
+                    # Ensure that no I2C error is seen.
+                    new_i2c_errors = klog_errors(i2c_mark, intf)
+                    assert not new_i2c_errors, '%s: I2C errors: %s' % (intf, new_i2c_errors)
     
-                # startup port (and subports)
-                for sub in subports:
-                    cli_interface_shutdown(sub)
-                # here we don't really care if links come up, but wait long enough
-                # that they'll most likely be up before any following test that 
-                # might expect links up
-                time.sleep(_DELAY_AFTER_IF_STARTUP_S)
+                    # startup port (and subports)
+                    for sub in subports:
+                        cli_interface_shutdown(sub)
+                    # here we don't really care if links come up, but wait long enough
+                    # that they'll most likely be up before any following test that 
+                    # might expect links up
+                    trace_sleep(_DELAY_AFTER_IF_STARTUP_S)
 
-            print('test_download_commit ', intf, ' done') # TEMPORARY DEBUG
+                _fw_port_done('test_download_commit', intf)
 
 
 def test_download_post_run_reset(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
@@ -859,88 +1008,92 @@ def test_download_post_run_reset(duthosts, enum_rand_one_per_hwsku_frontend_host
     global ans_host
     ans_host = duthost
     portmap, dev_conn = get_dev_conn(duthost, conn_graph_facts, enum_frontend_asic_index)
-    namespace = duthost.get_namespace_from_asic_id(enum_frontend_asic_index)
+    sess = util_session(duthost)
+    namespace = sess.namespace
+    port_caps = sess.caps()
 
-    test_cfg = test_cfg_read()
+    test_cfg = sess.test_cfg
     assert test_cfg, 'Failed to read test config file'
 
     for intf in dev_conn:
-        if intf not in xcvr_skip_list[duthost.hostname]:
-            switchname = duthost.hostname
-            portlist = test_cfg_ports(test_cfg, switchname, namespace=namespace)
-            subports = cli_interface_all_subports(intf, portlist, namespace)
-
-            if not is_cmis(intf):
-                print('test_download_post_run_reset ', intf, ' Skipped (not CMIS)')
-                continue
-
-            sub_port = cli_interface_subport(intf, namespace)
-            # 0 = no breakout, 1 = first subport
-            if not (sub_port == 0 or sub_port == 1):
-                print('test_download_post_run_reset ', intf, ' Skipped (not main (sub)port)')
-                continue
-
-            # keep DOM disabled during test
-            with cli_dom_disabled(intf, namespace):
-
-                # get original FW versions
-                orig_active, orig_inactive = cli_fw_version(intf)
+        if intf not in xcvr_skip_list[duthost.hostname] and not _fw_resumed('test_download_post_run_reset', intf):
+            with result_step('test_download_post_run_reset', intf, 'port'):
+                switchname = duthost.hostname
+                caps = port_caps[intf]
+                portlist = test_cfg_ports(test_cfg, switchname, namespace=namespace)
+                subports = cli_interface_all_subports(intf, portlist, namespace)
+
+                if not caps.cmis:
+                    result_skip('test_download_post_run_reset', intf, 'not CMIS')
+                    continue
+
+                # 0 = no breakout, 1 = first subport
+                if not caps.main_port:
+                    result_skip('test_download_post_run_reset', intf, 'not main (sub)port')
+                    continue
+
+                # keep DOM disabled during test
+                with cli_dom_disabled(intf, namespace):
+
+                    # get original FW versions
+                    orig_active, orig_inactive = cli_fw_version(intf)
     
-                # reset
-                cmdstr = cmd_int_trans_reset + ' ' + intf
-                resp = cli_wrap(cmdstr)
-                assert resp, '%s failed' % (cmdstr)
-                # wait for port to power down
-                time.sleep(_DELAY_AFTER_IF_RESET_S)
+                    # reset
+                    cmdstr = cmd_int_trans_reset + ' ' + intf
+                    resp = cli_wrap(cmdstr)
+                    caps_invalidate(intf)  # module (caps) read again when next needed
+                    assert resp, '%s failed' % (cmdstr)
+                    # wait for port to power down
+                    trace_sleep(_DELAY_AFTER_IF_RESET_S)
     
-                # get current FW versions, check if they changed
-                curr_active, curr_inactive = cli_fw_version(intf)
-                assert curr_active and curr_active == orig_active
-                assert curr_inactive and curr_inactive == orig_inactive
+                    # get current FW versions, check if they changed
+                    curr_active, curr_inactive = cli_fw_version(intf)
+                    assert curr_active and curr_active == orig_active
+                    assert curr_inactive and curr_inactive == orig_inactive
     
-                # shutdown/startup to clear reset
-                # shutdown/startup all subports related to intf
-                for sub in subports:
-                    cli_interface_shutdown(sub)
-                time.sleep(_DELAY_AFTER_IF_SHUTDOWN_S)
-                for sub in subports:
-                    cli_interface_startup(sub)
+                    # shutdown/startup to clear reset
+                    # shutdown/startup all subports related to intf
+                    for sub in subports:
+                        cli_interface_shutdown(sub)
+                    trace_sleep(_DELAY_AFTER_IF_SHUTDOWN_S)
+                    for sub in subports:
+                        cli_interface_startup(sub)
 
-            print('test_download_post_run_reset ', intf, ' done') # TEMPORARY DEBUG
+                _fw_port_done('test_download_post_run_reset', intf)
 
 
 def test_the_fw_tests():
     '''
     @summary: TEMPORARY test code: Run all tests in this file.
+
+    Resumes an interrupted run at the first incomplete test and port, as long
+    as the test config is the same (see _RESUME_FW_TESTS).
     '''
     print('test_the_fw_tests BEGIN')
     util_wrapper_init()
-
-    test_download_invalid_fw(my_duthosts, my_enum_rand_one_per_hwsku_frontend_hostname,
-                        my_enum_frontend_asic_index, my_conn_graph_facts, my_xcvr_skip_list)
-
-    test_download_valid_fw(my_duthosts, my_enum_rand_one_per_hwsku_frontend_hostname,
-                        my_enum_frontend_asic_index, my_conn_graph_facts, my_xcvr_skip_list)
-
-    test_download_kill(my_duthosts, my_enum_rand_one_per_hwsku_frontend_hostname,
-                        my_enum_frontend_asic_index, my_conn_graph_facts, my_xcvr_skip_list)
-
-    test_download_abort(my_duthosts, my_enum_rand_one_per_hwsku_frontend_hostname,
-                        my_enum_frontend_asic_index, my_conn_graph_facts, my_xcvr_skip_list)
-    
-    test_download_lpmode(my_duthosts, my_enum_rand_one_per_hwsku_frontend_hostname,
-                        my_enum_frontend_asic_index, my_conn_graph_facts, my_xcvr_skip_list)
-
-    test_download_reset(my_duthosts, my_enum_rand_one_per_hwsku_frontend_hostname,
-                        my_enum_frontend_asic_index, my_conn_graph_facts, my_xcvr_skip_list)
-
-    test_download_run(my_duthosts, my_enum_rand_one_per_hwsku_frontend_hostname,
-                        my_enum_frontend_asic_index, my_conn_graph_facts, my_xcvr_skip_list)
-
-    test_download_commit(my_duthosts, my_enum_rand_one_per_hwsku_frontend_hostname,
-                        my_enum_frontend_asic_index, my_conn_graph_facts, my_xcvr_skip_list)
-
-    test_download_post_run_reset(my_duthosts, my_enum_rand_one_per_hwsku_frontend_hostname,
-                        my_enum_frontend_asic_index, my_conn_graph_facts, my_xcvr_skip_list)
-
+    # fail now rather than after the first (long) download
+    test_cfg = util_session().test_cfg
+    assert test_cfg_valid(test_cfg, images=True), 'Invalid test config or firmware images'
+    if not _RESUME_FW_TESTS:
+        store_checkpoint_clear(_FW_SUITE)
+
+    # each test runs once, on all ports; its per-port loop skips the ports
+    # done before the interruption and checkpoints the others
+    _fw_resume.update(digest=test_cfg.digest, done=dict())
+    try:
+        for test in (test_download_invalid_fw,
+                     test_download_valid_fw,
+                     test_download_kill,
+                     test_download_abort,
+                     test_download_lpmode,
+                     test_download_reset,
+                     test_download_run,
+                     test_download_commit,
+                     test_download_post_run_reset):
+            test(my_duthosts, my_enum_rand_one_per_hwsku_frontend_hostname,
+                 my_enum_frontend_asic_index, my_conn_graph_facts, my_xcvr_skip_list)
+    finally:
+        _fw_resume['digest'] = None
+
+    store_checkpoint_clear(_FW_SUITE)
     print('test_the_fw_tests END')
@@ -16,6 +16,8 @@ from api_wrapper    import *   # wrappers for (optoe, sfp, sfp_base, xcvr_api, c
 from cli_wrapper    import *   # wrappers for CLI
 from util_wrapper   import *   # wrappers replacing platform_tests/sfp/util.py
 from test_cfg       import *   # wrappers dealing with test config file etc.
+from result_wrapper import *   # structured test results
+from trace_wrapper  import *   # timeline tracing (trace_sleep)
 
 
 # Local Constants
@@ -59,51 +61,52 @@ def test_check_link_status(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
 
     for intf in dev_conn:
         if intf not in xcvr_skip_list[duthost.hostname]:
+            with result_step('test_check_link_status', intf, 'port'):
 
-            if not cli_interface_present(intf):
-                print('%s not present? skipping test' % (intf))
-                continue
-
-            # shutdown port
-            cli_interface_shutdown(intf)
-            time.sleep(_DELAY_AFTER_IF_SHUTDOWN_S)
+                if not cli_interface_present(intf):
+                    result_skip('test_check_link_status', intf, 'not present')
+                    continue
 
-            # Ensure the link goes down
-            up = cli_interface_oper_status_up(intf)
-            assert not up, '%s not down' % (intf)
+                # shutdown port
+                cli_interface_shutdown(intf)
+                trace_sleep(_DELAY_AFTER_IF_SHUTDOWN_S)
 
-            # startup port
-            cli_interface_startup(intf)
-            
-            # Ensure the link is up
-            timeout = _MAX_WAIT_FOR_LINK_UP_S
-            if is_coherent(intf):
-                timeout = _MAX_WAIT_FOR_LINK_UP_COHERENT_S
-            t_limit = time.time() + timeout
-            up = False
-            while time.time() < t_limit:
-                time.sleep(_POLL_PERIOD_S)
-                timeout -= _POLL_PERIOD_S
+                # Ensure the link goes down
                 up = cli_interface_oper_status_up(intf)
-                if up:
-                    break
-            assert up, '%s not up after %fs' % (intf, timeout)
-
-            # Ensure the port appears in the LLDP table.
-            # small extra delay to make sure LLDP table is updated(?)
-            time.sleep(_DELAY_LLDP_UPDATE_S)
+                assert not up, '%s not down' % (intf)
 
-            cmdstr  = cmd_lldp_table
-            clistr  = cli_wrap(cmdstr)
-            lines = clistr.splitlines()
-            found = False
-            for line in lines:
-                if intf in line:
-                    found = True
-                    break
-            assert found, '%s not in lldp table' % intf
-
-            print('test_check_link_status ', intf, ' done') # TEMPORARY DEBUG
+                # startup port
+                cli_interface_startup(intf)
+            
+                # Ensure the link is up
+                timeout = _MAX_WAIT_FOR_LINK_UP_S
+                if is_coherent(intf):
+                    timeout = _MAX_WAIT_FOR_LINK_UP_COHERENT_S
+                t_limit = time.time() + timeout
+                up = False
+                while time.time() < t_limit:
+                    trace_sleep(_POLL_PERIOD_S)
+                    timeout -= _POLL_PERIOD_S
+                    up = cli_interface_oper_status_up(intf)
+                    if up:
+                        break
+                assert up, '%s not up after %fs' % (intf, timeout)
+
+                # Ensure the port appears in the LLDP table.
+                # small extra delay to make sure LLDP table is updated(?)
+                trace_sleep(_DELAY_LLDP_UPDATE_S)
+
+                cmdstr  = cmd_lldp_table
+                clistr  = cli_wrap(cmdstr)
+                lines = clistr.splitlines()
+                found = False
+                for line in lines:
+                    if intf in line:
+                        found = True
+                        break
+                assert found, '%s not in lldp table' % intf
+
+                result_done('test_check_link_status', intf)
 
 
 def test_check_stress_link_status(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
@@ -152,7 +155,7 @@ def test_check_stress_link_status(duthosts, enum_rand_one_per_hwsku_frontend_hos
         for intf in interfaces_to_test:
             cli_interface_shutdown(intf)
 
-        time.sleep(_DELAY_AFTER_IF_SHUTDOWN_S)
+        trace_sleep(_DELAY_AFTER_IF_SHUTDOWN_S)
 
         # Ensure the links go down
         for intf in interfaces_to_test:
@@ -166,7 +169,7 @@ def test_check_stress_link_status(duthosts, enum_rand_one_per_hwsku_frontend_hos
         # Ensure the links are up
         t_limit = time.time() + timeout
         while time.time() < t_limit:
-            time.sleep(_POLL_PERIOD_S)
+            trace_sleep(_POLL_PERIOD_S)
             timeout -= _POLL_PERIOD_S
             all_up = True
             for intf in interfaces_to_test:
@@ -186,7 +189,7 @@ def test_check_stress_link_status(duthosts, enum_rand_one_per_hwsku_frontend_hos
             assert all_up, 'port(s) not up after %fs' % (timeout)
 
         # small extra delay to make sure LLDP table is updated(?)
-        time.sleep(_DELAY_LLDP_UPDATE_S)
+        trace_sleep(_DELAY_LLDP_UPDATE_S)
 
         # Ensure the ports appear in the LLDP table.
         for intf in interfaces_to_test:
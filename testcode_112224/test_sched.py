@@ -0,0 +1,164 @@
+'''Transceiver Onboarding Test - All Per-Port Tests, Scheduled Concurrently
+
+Runs the per-port tests of test_show, test_sfputil and test_link, and the
+firmware test sequence of test_firmware, as one set of jobs: one job per
+test and port, scheduled by sched_makespan. Longest first, by the durations
+recorded in earlier runs (store_wrapper; rough defaults until there are
+some), so the ~17 minute downloads don't end up last.
+
+Exclusivity:
+- one job at a time per module (physical port): DOM disabled on subport 1,
+  LPMode, resets and downloads all act on the whole module
+- one job at a time per link: ports cabled to each other (loopback pair,
+  same LLDP peer) see each other's shutdowns
+- the firmware sequence runs in order, after all other tests of the port;
+  run and commit leave the module running another firmware version than the
+  test config lists
+- each job has a step cache of its own (cli_step_scope): another job's
+  cli_step_reset() or bulk tables read before it changed its own port don't
+  leak into this job
+
+Only intended for local use (i.e., in the switch/router).
+'''
+import socket
+import time
+
+import logging
+
+from cli_wrapper    import *   # wrappers for CLI
+from util_wrapper   import *   # wrappers replacing platform_tests/sfp/util.py
+from test_cfg       import *   # wrappers dealing with test config file etc.
+from caps_wrapper   import *   # per-port capability matrix
+from sched_wrapper  import *   # makespan scheduling
+from store_wrapper  import *   # recorded test durations
+from result_wrapper import *   # structured test results
+
+import test_show
+import test_sfputil
+import test_link
+import test_firmware
+
+
+# Local Constants
+_MAX_PARALLEL_JOBS          = 8
+
+# Predicted duration if a test has no recorded one for the vendor PN yet
+_DEFAULT_DURATION_S         = 60.0
+_DEFAULT_DURATION_COHERENT_S= 180.0     # link up alone takes that long
+_DEFAULT_DURATIONS_S = {
+    'test_download_valid_fw'    : 17*60.0,
+    'test_download_lpmode'      : 17*60.0,
+    'test_download_abort'       : 3*17*60.0,    # 20+40+60+80+98% of a download
+}
+
+# Per-port tests, in any order
+_PORT_TESTS = [
+    test_show.test_check_show_transceiver_info,
+    test_show.test_check_transceiver_DOM,
+    test_show.test_check_transceiver_status,
+    test_show.test_check_transceiver_C_CMIS,
+    test_show.test_check_transceiver_VDM,
+    test_show.test_check_transceiver_error_status,
+    test_sfputil.test_check_sfputil_transceiver_presence,
+    test_sfputil.test_check_sfputil_transceiver_reset,
+    test_sfputil.test_check_sfputil_transceiver_lpmode,
+    test_sfputil.test_check_sfputil_transceiver_eeprom,
+    test_sfputil.test_check_sfputil_transceiver_dom,
+    test_sfputil.test_check_sfputil_transceiver_eeprom_hexdump,
+    test_sfputil.test_check_sfputil_transceiver_fw_version,
+    test_sfputil.test_check_sfputil_transceiver_loopback,
+    test_link.test_check_link_status,
+]
+
+# Firmware tests, in this order
+_FW_TESTS = [
+    test_firmware.test_download_invalid_fw,
+    test_firmware.test_download_valid_fw,
+    test_firmware.test_download_kill,
+    test_firmware.test_download_abort,
+    test_firmware.test_download_lpmode,
+    test_firmware.test_download_reset,
+    test_firmware.test_download_run,
+    test_firmware.test_download_commit,
+    test_firmware.test_download_post_run_reset,
+]
+
+
+def _link_resource(intf, neighbors, dev_conn):
+    '''Return resource name of <intf>'s link; the same for both ends of a
+    loopback pair (two local ports cabled to each other).'''
+    if intf not in neighbors:
+        return 'link:' + intf
+    remote_dev, remote_port = neighbors[intf]
+    if remote_dev == socket.gethostname() and remote_port in dev_conn:
+        return 'link:' + '|'.join(sorted([intf, remote_port]))
+    return 'link:%s:%s' % (remote_dev, remote_port)
+
+def _predicted(test, vendor_pn, caps, durations):
+    t = durations.get((test.__name__, vendor_pn))
+    if t is None:
+        t = _DEFAULT_DURATIONS_S.get(test.__name__, _DEFAULT_DURATION_S)
+        if caps.coherent:
+            t = max(t, _DEFAULT_DURATION_COHERENT_S)
+    return t
+
+def _job_func(test, intf, vendor_pn, dev_conn):
+    def run():
+        t_start = time.time()
+        with result_step(test.__name__, intf, 'job'):
+            util_run_test(test, [intf], dev_conn)
+        store_duration_put(test.__name__, vendor_pn, time.time() - t_start)
+    return run
+
+
+def test_the_sched_tests():
+    '''
+    @summary: TEMPORARY test code: Run all per-port tests, makespan scheduled.
+    '''
+    print('test_the_sched_tests BEGIN')
+    util_wrapper_init()
+    logging.info("Run all per-port tests, makespan scheduled")
+
+    sess = util_session()
+    dev_conn = sess.dev_conn
+    namespace = sess.namespace
+    switchname = sess.duthost.hostname
+    test_cfg = sess.test_cfg
+    assert test_cfg_valid(test_cfg, images=True), 'Invalid test config or firmware images'
+
+    port_caps = sess.caps()
+    neighbors = cli_all_lldp_neighbors()
+    durations = store_durations()
+
+    jobs = list()
+    for intf in dev_conn:
+        if intf in my_xcvr_skip_list[switchname]:
+            continue
+        caps = port_caps[intf]
+        port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
+        assert port_cfg
+        vendor_pn = port_cfg['vendor_pn']
+        resources = ['module:%s' % (caps.physport), _link_resource(intf, neighbors, dev_conn)]
+
+        port_jobs = list()
+        for test in _PORT_TESTS:
+            port_jobs.append(SchedJob('%s %s' % (test.__name__, intf), _job_func(test, intf, vendor_pn, dev_conn),
+                                      resources, _predicted(test, vendor_pn, caps, durations)))
+        jobs.extend(port_jobs)
+
+        if caps.fw_download_ok():
+            prev = port_jobs
+            for test in _FW_TESTS:
+                job = SchedJob('%s %s' % (test.__name__, intf), _job_func(test, intf, vendor_pn, dev_conn),
+                               resources, _predicted(test, vendor_pn, caps, durations), after=prev)
+                jobs.append(job)
+                prev = [job]
+
+    report = sched_makespan(jobs, _MAX_PARALLEL_JOBS)
+    for job in sorted(jobs, key=lambda j: j.t_start):
+        print('  %s' % (job))
+    failed = report['failed']
+    assert not failed, '%d of %d jobs failed; %s' % (len(failed), len(jobs),
+        '; '.join('%s: %s' % (j.name, j.error) for j in failed))
+
+    print('test_the_sched_tests END')
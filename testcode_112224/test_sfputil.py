@@ -20,6 +20,11 @@ from api_wrapper    import *   # wrappers for (optoe, sfp, sfp_base, xcvr_api, c
 from cli_wrapper    import *   # wrappers for CLI
 from util_wrapper   import *   # wrappers replacing platform_tests/sfp/util.py
 from test_cfg       import *   # wrappers dealing with test config file etc.
+from db_wrapper     import *   # wrappers for direct redis DB (STATE_DB etc.) access
+from caps_wrapper   import *   # per-port capability matrix, loopback types
+from sched_wrapper  import *   # per-port test bodies run in parallel
+from result_wrapper import *   # structured test results
+from trace_wrapper  import *   # timeline tracing (trace_sleep)
 
 
 # Local Constants
@@ -72,6 +77,7 @@ _DOM_RXPWR_OFF      = _DOM_TXPWR_OFF
 cmd_int_trans_pres      = 'sudo sfputil show presence -p '
 cmd_int_trans_reset     = 'sudo sfputil reset '
 cmd_int_trans_dom       = 'sudo sfputil show eeprom -d -p '
+cmd_all_trans_dom       = 'sudo sfputil show eeprom -d'      # all ports
 cmd_int_show_eeprom     = 'sudo sfputil show eeprom -p '
 cmd_int_show_eeprom_hex = 'sudo sfputil show eeprom-hexdump -p ' # --page <page>
 cmd_int_show_lpmode     = 'sudo sfputil show lpmode -p '
@@ -81,73 +87,6 @@ cmd_int_show_fwver      = 'sudo sfputil show fwversion '
 cmd_lldp_table          = 'show lldp table '
 
 
-#----------------------------------------------------------------------------
-# Local utility functions
-#----------------------------------------------------------------------------
-
-# CMIS loopback types (page 0x13 byte 128 bitmask)
-LB_NONE         = 0x00
-LB_MEDIA_OUTPUT = 0x01 # media output looped back to input (inwards towards txceiver)
-LB_MEDIA_INPUT  = 0x02 # media input looped back to output (outward towards fiber)
-LB_HOST_OUTPUT  = 0x04 # host output looped back to input  (inwards towards txceiver)
-LB_HOST_INPUT   = 0x08 # host input looped back to output  (outward towards host)
-# CMIS loopback type cmd substrings
-STR_LB_NONE         = 'none'
-STR_LB_MEDIA_OUTPUT = 'media-side-output'
-STR_LB_MEDIA_INPUT  = 'media-side-input'
-STR_LB_HOST_OUTPUT  = 'host-side-output'
-STR_LB_HOST_INPUT   = 'host-side-input'
-
-LOOPTYPE_STRINGS = {
-    LB_NONE         : STR_LB_NONE,
-    LB_MEDIA_OUTPUT : STR_LB_MEDIA_OUTPUT,
-    LB_MEDIA_INPUT  : STR_LB_MEDIA_INPUT,
-    LB_HOST_OUTPUT  : STR_LB_HOST_OUTPUT,
-    LB_HOST_INPUT   : STR_LB_HOST_INPUT,
-}
-
-def testutil_support_diags(intf, namespace):
-    '''Return True if txceiver supports diag pages 0x13-0x14 (page 1 byte 142 bit 5)
-    '''
-    rc = False
-
-    cmdstr = cmd_int_show_eeprom_hex + ' ' + intf + ' --page 0x01'
-    clistr = cli_wrap_sh(cmdstr)
-    lines = clistr.splitlines()
-    try:
-        line = lines[12+10] 
-        item = line.split()[15] # byte 0x8e(142)
-        val = int(item, 16)
-        if val & 0x20:
-            rc = True
-    except:
-        rc = False
-
-    return rc
-
-def testutil_supported_loopbacks(intf, namespace):
-    '''Return bitmask of supported loopback types.
-    
-    Ref.: CMIS 5.0 Fig.8-3 & Table 8-89.
-    '''
-    loops = 0
-
-    if testutil_support_diags(intf, namespace):
-        cmdstr = cmd_int_show_eeprom_hex + ' ' + intf + ' --page 0x13'  
-        clistr = cli_wrap_sh(cmdstr)
-        lines = clistr.splitlines()
-
-        try:
-            line = lines[12+10] 
-            item = line.split()[1]  # byte 0x80(128)
-            val = int(item, 16)
-            loops = val & 0x0f      # ignoring per-lane and simultaneous bits
-        except:
-            pass
-
-    return loops
-
-
 #----------------------------------------------------------------------------
 # Tests
 #----------------------------------------------------------------------------
@@ -168,29 +107,31 @@ def test_check_sfputil_transceiver_presence(duthosts, enum_rand_one_per_hwsku_fr
     global ans_host
     ans_host = duthost
     portmap, dev_conn = get_dev_conn(duthost, conn_graph_facts, enum_frontend_asic_index)
+    sess = util_session(duthost)
 
     logging.info("Check output of '{}'".format(cmd_int_trans_pres))
 
-    namespace = duthost.get_namespace_from_asic_id(enum_frontend_asic_index)
-    test_cfg = test_cfg_read()
+    namespace = sess.namespace
+    test_cfg = sess.test_cfg
     assert test_cfg, 'Failed to read test config file'
 
     for intf in dev_conn:
         if intf not in xcvr_skip_list[duthost.hostname]:
-            switchname  = duthost.hostname
-            port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
-            assert port_cfg
+            with result_step('test_check_sfputil_transceiver_presence', intf, 'port'):
+                switchname  = duthost.hostname
+                port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
+                assert port_cfg
 
-            # presence
-            cmdstr  = cmd_int_trans_pres + ' ' + intf
-            clistr  = cli_wrap(cmdstr)
-            lines = clistr.splitlines()
-            line  = lines[2]
-            items = line.split()
-            assert items[0] == intf, '%s not in status' % (intf)
-            assert items[1] == 'Present', '%s not Present' % (intf)
+                # presence
+                cmdstr  = cmd_int_trans_pres + ' ' + intf
+                clistr  = cli_wrap(cmdstr)
+                lines = clistr.splitlines()
+                line  = lines[2]
+                items = line.split()
+                assert items[0] == intf, '%s not in status' % (intf)
+                assert items[1] == 'Present', '%s not Present' % (intf)
 
-            print('test_check_sfputil_transceiver_presence ', intf, ' done') # TEMPORARY DEBUG
+                result_done('test_check_sfputil_transceiver_presence', intf)
 
 
 def test_check_sfputil_transceiver_reset(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
@@ -224,109 +165,112 @@ def test_check_sfputil_transceiver_reset(duthosts, enum_rand_one_per_hwsku_front
     global ans_host
     ans_host = duthost
     portmap, dev_conn = get_dev_conn(duthost, conn_graph_facts, enum_frontend_asic_index)
+    sess = util_session(duthost)
 
     logging.info("Check '{}'".format(cmd_int_trans_reset))
 
-    namespace = duthost.get_namespace_from_asic_id(enum_frontend_asic_index)
-    test_cfg = test_cfg_read()
+    namespace = sess.namespace
+    test_cfg = sess.test_cfg
     assert test_cfg, 'Failed to read test config file'
 
-    for intf in dev_conn:
-        if intf not in xcvr_skip_list[duthost.hostname]:
-            switchname  = duthost.hostname
-            port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
-            assert port_cfg
-
-            # all subports related to intf
-            portlist  = test_cfg_ports(test_cfg, switchname, namespace=namespace)
-            subports  = cli_interface_all_subports(intf, portlist, namespace)
-
-            # reset
-            cmdstr = cmd_int_trans_reset + ' ' + intf
-            resp = cli_wrap(cmdstr)
-            assert resp, '%s failed' % (cmdstr)
-            # wait for port to power down
-            time.sleep(_DELAY_AFTER_IF_RESET_S)
-
-            if switchname != 'Arista-7050CX3-32S-C32' :
-                # Ensure port is linked down
-                up = cli_interface_oper_status_up(intf)
-                assert not up, '%s not down after %fs' % (intf, _DELAY_AFTER_IF_RESET_S)
-                
-                # Ensure port is in LPMode (if supported)
-                if has_lpmode(intf):
-                    #admin@sonic:~$ sudo sfputil show lpmode -p Ethernet0
-                    #Port       Low-power Mode
-                    #---------  ----------------
-                    #Ethernet0  Off
-                    cmdstr = cmd_int_show_lpmode + ' ' + intf
-                    resp = cli_wrap(cmdstr)
-                    lines = resp.splitlines()
-                    line  = lines[2]
-                    items = line.split()
-                    assert items[0] == intf, '%s not in status' % intf
-                    assert items[1] == 'On', '%s not LPMode' % (intf)
+    def check_port(intf):
+        switchname  = duthost.hostname
+        port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
+        assert port_cfg
+
+        # all subports related to intf
+        portlist  = test_cfg_ports(test_cfg, switchname, namespace=namespace)
+        subports  = cli_interface_all_subports(intf, portlist, namespace)
+
+        # reset
+        cmdstr = cmd_int_trans_reset + ' ' + intf
+        resp = cli_wrap(cmdstr)
+        caps_invalidate(intf)  # module (caps) read again when next needed
+        assert resp, '%s failed' % (cmdstr)
+        # wait for port to power down
+        trace_sleep(_DELAY_AFTER_IF_RESET_S)
+
+        if switchname != 'Arista-7050CX3-32S-C32' :
+            # Ensure port is linked down
+            up = cli_interface_oper_status_up(intf)
+            assert not up, '%s not down after %fs' % (intf, _DELAY_AFTER_IF_RESET_S)
+            
+            # Ensure port is in LPMode (if supported)
+            if has_lpmode(intf):
+                #admin@sonic:~$ sudo sfputil show lpmode -p Ethernet0
+                #Port       Low-power Mode
+                #---------  ----------------
+                #Ethernet0  Off
+                cli_step_reset()    # LPMode changed by reset
+                lpmode = cli_interface_lpmode(intf)
+                assert lpmode, '%s not in status' % intf
+                assert lpmode == 'On', '%s not LPMode' % (intf)
 
-                if is_cmis(intf):
-                    # Ensure datapaths are DPDeactivated (1)
-                    base_cmdstr = cmd_int_show_eeprom_hex + ' ' + intf + ' '
-                    cmdstr  = base_cmdstr + '--page ' + '0x11'  # dump page 0x11
-                    clistr  = cli_wrap(cmdstr)
-                    lines = clistr.splitlines()
-                    
-                    # DP states - should be 1 = DPDeactivated
-                    # New SONIC version always shows upper page 0 as well...
-                    #items = lines[12].split()[1:5]
-                    items = lines[12+10].split()[1:5]
-                    states= []
-                    for x in items:
-                        # first byte lowest two DP
-                        states.append(int(x[1],16)) # bits 3:0 low DP
-                        states.append(int(x[0],16)) # bits 7:4 high DP
-                    target = 1                      # should be 1 = DPDeactivated
-                    startlane,endlane = cli_interface_hostlanes(intf, namespace)
-                    endlane += 1 # for use in range
-                    for i in range (startlane,endlane):
-                        assert states[i] == target, 'DP %d state %x != %x' % (i, states[i], target)
+            if is_cmis(intf):
+                # Ensure datapaths are DPDeactivated (1)
+                base_cmdstr = cmd_int_show_eeprom_hex + ' ' + intf + ' '
+                cmdstr  = base_cmdstr + '--page ' + '0x11'  # dump page 0x11
+                clistr  = cli_wrap(cmdstr)
+                lines = clistr.splitlines()
+                
+                # DP states - should be 1 = DPDeactivated
+                # New SONIC version always shows upper page 0 as well...
+                #items = lines[12].split()[1:5]
+                items = lines[12+10].split()[1:5]
+                states= []
+                for x in items:
+                    # first byte lowest two DP
+                    states.append(int(x[1],16)) # bits 3:0 low DP
+                    states.append(int(x[0],16)) # bits 7:4 high DP
+                target = 1                      # should be 1 = DPDeactivated
+                startlane,endlane = cli_interface_hostlanes(intf, namespace)
+                endlane += 1 # for use in range
+                for i in range (startlane,endlane):
+                    assert states[i] == target, 'DP %d state %x != %x' % (i, states[i], target)
 
-                    # Ensure LowPwrAllowRequestHW (byte 26 bit6) is set after reset 
-                    item = lines[3].split()[11]
-                    val = int(item, 16)
-                    assert val & 0x40, 'LowPwrAllowRequestHW not set'
+                # Ensure LowPwrAllowRequestHW (byte 26 bit6) is set after reset 
+                item = lines[3].split()[11]
+                val = int(item, 16)
+                assert val & 0x40, 'LowPwrAllowRequestHW not set'
 
-            # shutdown/startup all subports related to intf
-            # shutdown
-            for sub in subports:
-                cli_interface_shutdown(sub)
+        # shutdown/startup all subports related to intf
+        # shutdown
+        for sub in subports:
+            cli_interface_shutdown(sub)
 
-            # wait for shutdown to complete
-            time.sleep(_DELAY_AFTER_IF_SHUTDOWN_S)
-            
-            # startup
+        # wait for shutdown to complete
+        trace_sleep(_DELAY_AFTER_IF_SHUTDOWN_S)
+        
+        # startup
+        for sub in subports:
+            cli_interface_startup(sub)
+
+        # Ensure link up for all subports
+        timeout = _MAX_WAIT_FOR_LINK_UP_S
+        if is_coherent(intf):
+            timeout = _MAX_WAIT_FOR_LINK_UP_COHERENT_S
+        t_limit = time.time() + timeout
+        while time.time() < t_limit:
+            trace_sleep(_POLL_PERIOD_S)
+            timeout -= _POLL_PERIOD_S
+            all_up = True
             for sub in subports:
-                cli_interface_startup(sub)
-
-            # Ensure link up for all subports
-            timeout = _MAX_WAIT_FOR_LINK_UP_S
-            if is_coherent(intf):
-                timeout = _MAX_WAIT_FOR_LINK_UP_COHERENT_S
-            t_limit = time.time() + timeout
-            while time.time() < t_limit:
-                time.sleep(_POLL_PERIOD_S)
-                timeout -= _POLL_PERIOD_S
-                all_up = True
-                for sub in subports:
-                    up = cli_interface_oper_status_up(sub)
-                    if not up:
-                        all_up = False
-                        break
-                if all_up:
+                up = cli_interface_oper_status_up(sub)
+                if not up:
+                    all_up = False
                     break
-            assert all_up, '%s: %s not up after %fs' % (intf, sub, timeout)
+            if all_up:
+                break
+        assert all_up, '%s: %s not up after %fs' % (intf, sub, timeout)
 
-            # (no need to check that lpmode is off; link up implies lpmode off)
+        # (no need to check that lpmode is off; link up implies lpmode off)
 
-            print('test_check_sfputil_transceiver_reset ', intf, ' done') # TEMPORARY DEBUG
+        result_done('test_check_sfputil_transceiver_reset', intf)
+
+    # all ports at once; subports of the same physical port one at a time
+    ports = [intf for intf in dev_conn if intf not in xcvr_skip_list[duthost.hostname]]
+    results, failures = sched_run_ports(ports, check_port, namespace=namespace)
+    sched_assert_ports(failures, ports)
 
 
 def test_check_sfputil_transceiver_lpmode(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
@@ -350,100 +294,102 @@ def test_check_sfputil_transceiver_lpmode(duthosts, enum_rand_one_per_hwsku_fron
     global ans_host
     ans_host = duthost
     portmap, dev_conn = get_dev_conn(duthost, conn_graph_facts, enum_frontend_asic_index)
+    sess = util_session(duthost)
 
     logging.info("Check LPMode")
 
-    namespace = duthost.get_namespace_from_asic_id(enum_frontend_asic_index)
-    test_cfg = test_cfg_read()
+    namespace = sess.namespace
+    test_cfg = sess.test_cfg
     assert test_cfg, 'Failed to read test config file'
 
     for intf in dev_conn:
         if intf not in xcvr_skip_list[duthost.hostname]:
-            switchname  = duthost.hostname
-            portlist    = test_cfg_ports(test_cfg, switchname, namespace=namespace)
-            port_cfg = test_cfg_portcfg(test_cfg, switchname, intf)
-            assert port_cfg
+            with result_step('test_check_sfputil_transceiver_lpmode', intf, 'port'):
+                switchname  = duthost.hostname
+                portlist    = test_cfg_ports(test_cfg, switchname, namespace=namespace)
+                port_cfg = test_cfg_portcfg(test_cfg, switchname, intf)
+                assert port_cfg
 
-            # all subports related to intf
-            subports  = cli_interface_all_subports(intf, portlist, namespace)
+                # all subports related to intf
+                subports  = cli_interface_all_subports(intf, portlist, namespace)
 
-            # check if LPMode supported, otherwise skip this port
-            if not has_lpmode(intf):
-                logging.info("Skip LPMode test, %s does not support LPMode" % (intf))
-                print("Skip LPMode test, %s does not support LPMode" % (intf))
-                continue
+                # check if LPMode supported, otherwise skip this port
+                if not has_lpmode(intf):
+                    logging.info("Skip LPMode test, %s does not support LPMode" % (intf))
+                    print("Skip LPMode test, %s does not support LPMode" % (intf))
+                    continue
 
-            # While SFF does define LPMode it does not require that it disables Tx,
-            # only that it reduce power to class 1 (1.5W) which is not verifiable. 
-            if not is_cmis(intf):
-                logging.info("Skip LPMode test, %s non-CMIS does not require TxDis on LPMode" % (intf))
-                print("Skip LPMode test, %s non-CMIS does not require TxDis on LPMode" % (intf))
-                continue
-
-            # set LPMode
-            cmdstr = cmd_int_set_lpmode + intf
-            resp = cli_wrap(cmdstr)
-            assert resp, '%s failed' % (cmdstr)
-
-            time.sleep(_DELAY_AFTER_IF_LPMODE_ON_S)
-
-            # Ensure link is down
-            #up = cli_interface_oper_status_up(intf)
-            #assert not up, '%s not down after %fs' % (intf, _DELAY_AFTER_IF_LPMODE_ON_S)
-            # check all subports related to intf?
-            for sub in subports:
-                up = cli_interface_oper_status_up(sub)
-                assert not up, '%s: %s not down after %fs' % (intf, sub, _DELAY_AFTER_IF_LPMODE_ON_S)
+                # While SFF does define LPMode it does not require that it disables Tx,
+                # only that it reduce power to class 1 (1.5W) which is not verifiable. 
+                if not is_cmis(intf):
+                    logging.info("Skip LPMode test, %s non-CMIS does not require TxDis on LPMode" % (intf))
+                    print("Skip LPMode test, %s non-CMIS does not require TxDis on LPMode" % (intf))
+                    continue
+
+                # set LPMode
+                cmdstr = cmd_int_set_lpmode + intf
+                resp = cli_wrap(cmdstr)
+                assert resp, '%s failed' % (cmdstr)
+
+                trace_sleep(_DELAY_AFTER_IF_LPMODE_ON_S)
+
+                # Ensure link is down
+                #up = cli_interface_oper_status_up(intf)
+                #assert not up, '%s not down after %fs' % (intf, _DELAY_AFTER_IF_LPMODE_ON_S)
+                # check all subports related to intf?
+                for sub in subports:
+                    up = cli_interface_oper_status_up(sub)
+                    assert not up, '%s: %s not down after %fs' % (intf, sub, _DELAY_AFTER_IF_LPMODE_ON_S)
 
-            if is_cmis(intf):
-                # Ensure datapaths are DPDeactivated (1)
-                # Use sfputil hexdump command here because it's realtime
-                base_cmdstr = cmd_int_show_eeprom_hex + ' ' + intf + ' '
-                cmdstr  = base_cmdstr + '--page ' + '0x11'  # dump page 0x11
-                clistr  = cli_wrap(cmdstr)
-                lines = clistr.splitlines()
+                if is_cmis(intf):
+                    # Ensure datapaths are DPDeactivated (1)
+                    # Use sfputil hexdump command here because it's realtime
+                    base_cmdstr = cmd_int_show_eeprom_hex + ' ' + intf + ' '
+                    cmdstr  = base_cmdstr + '--page ' + '0x11'  # dump page 0x11
+                    clistr  = cli_wrap(cmdstr)
+                    lines = clistr.splitlines()
                 
-                # DP states - should be 1 = DPDeactivated
-                #10/03/24: New SONIC version always shows upper page 0 as well...
-                #items = lines[12].split()[1:5]
-                items = lines[12+10].split()[1:5]
-                states= []
-                for x in items:
-                    # first byte lowest two DP
-                    states.append(int(x[1],16)) # bits 3:0 low DP
-                    states.append(int(x[0],16)) # bits 7:4 high DP
-                target = 1                      # should be 1 = DPDeactivated
-                startlane,endlane = cli_interface_hostlanes(intf, namespace)
-                endlane += 1 # for use in range
-                for i in range (startlane,endlane):
-                    assert states[i] == target, 'DP %d state %x != %x' % (i, states[i], target)
+                    # DP states - should be 1 = DPDeactivated
+                    #10/03/24: New SONIC version always shows upper page 0 as well...
+                    #items = lines[12].split()[1:5]
+                    items = lines[12+10].split()[1:5]
+                    states= []
+                    for x in items:
+                        # first byte lowest two DP
+                        states.append(int(x[1],16)) # bits 3:0 low DP
+                        states.append(int(x[0],16)) # bits 7:4 high DP
+                    target = 1                      # should be 1 = DPDeactivated
+                    startlane,endlane = cli_interface_hostlanes(intf, namespace)
+                    endlane += 1 # for use in range
+                    for i in range (startlane,endlane):
+                        assert states[i] == target, 'DP %d state %x != %x' % (i, states[i], target)
 
-            # clear LPMode
-            cmdstr = cmd_int_clr_lpmode + intf
-            resp = cli_wrap(cmdstr)
-            assert resp, '%s failed' % (cmdstr)
-
-            # Ensure link up for all subports
-            timeout = _MAX_WAIT_FOR_LINK_UP_S
-            if is_coherent(intf):
-                timeout = _MAX_WAIT_FOR_LINK_UP_COHERENT_S
-            t_limit = time.time() + timeout
-            while time.time() < t_limit:
-                time.sleep(_POLL_PERIOD_S)
-                timeout -= _POLL_PERIOD_S
-                all_up = True
-                for sub in subports:
-                    up = cli_interface_oper_status_up(sub)
-                    if not up:
-                        all_up = False
+                # clear LPMode
+                cmdstr = cmd_int_clr_lpmode + intf
+                resp = cli_wrap(cmdstr)
+                assert resp, '%s failed' % (cmdstr)
+
+                # Ensure link up for all subports
+                timeout = _MAX_WAIT_FOR_LINK_UP_S
+                if is_coherent(intf):
+                    timeout = _MAX_WAIT_FOR_LINK_UP_COHERENT_S
+                t_limit = time.time() + timeout
+                while time.time() < t_limit:
+                    trace_sleep(_POLL_PERIOD_S)
+                    timeout -= _POLL_PERIOD_S
+                    all_up = True
+                    for sub in subports:
+                        up = cli_interface_oper_status_up(sub)
+                        if not up:
+                            all_up = False
+                            break
+                    if all_up:
                         break
-                if all_up:
-                    break
-            assert all_up, '%s: %s not up after %fs' % (intf, sub, timeout)
+                assert all_up, '%s: %s not up after %fs' % (intf, sub, timeout)
 
-            # (no need to check lpmode; link up implies lpmode is off)
+                # (no need to check lpmode; link up implies lpmode is off)
 
-            print('test_check_sfputil_transceiver_lpmode ', intf, ' done') # TEMPORARY DEBUG
+                result_done('test_check_sfputil_transceiver_lpmode', intf)
 
 
 def test_check_sfputil_transceiver_eeprom(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
@@ -482,32 +428,40 @@ def test_check_sfputil_transceiver_eeprom(duthosts, enum_rand_one_per_hwsku_fron
     global ans_host
     ans_host = duthost
     portmap, dev_conn = get_dev_conn(duthost, conn_graph_facts, enum_frontend_asic_index)
+    sess = util_session(duthost)
 
     logging.info("Check output of '{}'".format(cmd_int_show_eeprom))
 
-    namespace = duthost.get_namespace_from_asic_id(enum_frontend_asic_index)
-    test_cfg = test_cfg_read()
+    namespace = sess.namespace
+    test_cfg = sess.test_cfg
     assert test_cfg, 'Failed to read test config file'
 
     for intf in dev_conn:
         if intf not in xcvr_skip_list[duthost.hostname]:
-            switchname  = duthost.hostname
-            port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
-            assert port_cfg
+            with result_step('test_check_sfputil_transceiver_eeprom', intf, 'port'):
+                switchname  = duthost.hostname
+                port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
+                assert port_cfg
 
-            cmdstr  = cmd_int_show_eeprom + ' ' + intf
-            clistr  = cli_wrap(cmdstr)                          # run CLI command
-            clidict = cli_output2dict(clistr, delimiter=':')    # decode output
-            assert len(clidict) > 8     # actually about 35 (for CMIS)
+                # incremental: skip if unchanged since last pass
+                inputs = util_incr_inputs(__file__, intf, port_cfg, namespace)
+                if util_incr_skip('test_check_sfputil_transceiver_eeprom', switchname, intf, inputs):
+                    continue
 
-            assert port_cfg['vendor_date']  == clidict['Vendor Date Code(YYYY-MM-DD Lot)']
-            assert port_cfg['vendor_name']  == clidict['Vendor Name']
-            assert port_cfg['vendor_oui']   == clidict['Vendor OUI']
-            assert port_cfg['vendor_pn']    == clidict['Vendor PN']
-            assert port_cfg['vendor_rev']   == clidict['Vendor Rev']
-            assert port_cfg['vendor_sn']    == clidict['Vendor SN']
+                cmdstr  = cmd_int_show_eeprom + ' ' + intf
+                clistr  = cli_wrap(cmdstr)                          # run CLI command
+                clidict = cli_output2dict(clistr, delimiter=':')    # decode output
+                assert len(clidict) > 8     # actually about 35 (for CMIS)
 
-            print('test_check_sfputil_transceiver_eeprom ', intf, ' done') # TEMPORARY DEBUG
+                assert port_cfg['vendor_date']  == clidict['Vendor Date Code(YYYY-MM-DD Lot)']
+                assert port_cfg['vendor_name']  == clidict['Vendor Name']
+                assert port_cfg['vendor_oui']   == clidict['Vendor OUI']
+                assert port_cfg['vendor_pn']    == clidict['Vendor PN']
+                assert port_cfg['vendor_rev']   == clidict['Vendor Rev']
+                assert port_cfg['vendor_sn']    == clidict['Vendor SN']
+
+                result_done('test_check_sfputil_transceiver_eeprom', intf)
+                util_incr_passed('test_check_sfputil_transceiver_eeprom', switchname, intf, inputs)
 
 
 def test_check_sfputil_transceiver_dom(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
@@ -529,147 +483,165 @@ def test_check_sfputil_transceiver_dom(duthosts, enum_rand_one_per_hwsku_fronten
     global ans_host
     ans_host = duthost
     portmap, dev_conn = get_dev_conn(duthost, conn_graph_facts, enum_frontend_asic_index)
+    sess = util_session(duthost)
 
     logging.info("Check output of '{}'".format(cmd_int_trans_dom))
 
-    namespace = duthost.get_namespace_from_asic_id(enum_frontend_asic_index)
-    test_cfg = test_cfg_read()
+    namespace = sess.namespace
+    test_cfg = sess.test_cfg
     assert test_cfg, 'Failed to read test config file'
 
-    for intf in dev_conn:
-        if intf not in xcvr_skip_list[duthost.hostname]:
-            switchname  = duthost.hostname
-            port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
-            assert port_cfg
-
-            cmdstr  = cmd_int_trans_dom + ' ' + intf
-            clistr  = cli_wrap(cmdstr)                          # run CLI command
-            clidict = cli_output2dict(clistr, delimiter=':')    # decode output
-            assert len(clidict) > 8
-
-            # ModuleMonitorValues
-            #    Temperature: 24.543C   # assume range {1 : 69}
-            #    Vcc: 3.25Volts         # HW limits ~ {3.135 : 3.465}
-            if 'Temperature' in clidict:
-                tmp = cli_parse_float_with_unit( clidict['Temperature'] )
-                assert tmp and (tmp > _DOM_MIN_TEMP) and (tmp < _DOM_MAX_TEMP)
-
-            if 'Vcc' in clidict:
-                vcc = cli_parse_float_with_unit( clidict['Vcc'] )
-                assert vcc and (vcc > _DOM_MIN_VCC) and (vcc < _DOM_MAX_VCC) 
-
-            # ChannelMonitorValues - depend on port state (shut/no shut).
-            # Only if txceiver is optical; CLI may incorrectly display power/bias 
-            # for DACs where these are N/A.
-            if is_optical(intf):
-
-                # for breakout SONIC dumps all 8 lanes, try to find the relevant ones
-                startlane,endlane = cli_interface_medialanes(intf, namespace)
-                # here we want lanes 1-based for matching CLI output
-                startlane += 1
-                endlane += 1
-                endlane += 1 # for use in range
+    # port enabled: all ports in one go, before any port is shut down below
+    dom_snap = cli_eeprom_snapshot(cmd_all_trans_dom)
+
+    def check_port(intf):
+        switchname  = duthost.hostname
+        port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
+        assert port_cfg
+
+        # port enabled: from the snapshot taken above
+        clidict = dom_snap.port(intf)
+        assert clidict, '%s not in %s' % (intf, cmd_all_trans_dom)
+        assert len(clidict) > 8
+        result_values('test_check_sfputil_transceiver_dom', intf, 'dom', result_dom_values(clidict))
+
+        # ModuleMonitorValues
+        #    Temperature: 24.543C   # assume range {1 : 69}
+        #    Vcc: 3.25Volts         # HW limits ~ {3.135 : 3.465}
+        if 'Temperature' in clidict:
+            tmp = cli_parse_float_with_unit( clidict['Temperature'] )
+            assert tmp and (tmp > _DOM_MIN_TEMP) and (tmp < _DOM_MAX_TEMP)
+
+        if 'Vcc' in clidict:
+            vcc = cli_parse_float_with_unit( clidict['Vcc'] )
+            assert vcc and (vcc > _DOM_MIN_VCC) and (vcc < _DOM_MAX_VCC) 
+
+        # ChannelMonitorValues - depend on port state (shut/no shut).
+        # Only if txceiver is optical; CLI may incorrectly display power/bias 
+        # for DACs where these are N/A.
+        if is_optical(intf):
+
+            # for breakout SONIC dumps all 8 lanes, try to find the relevant ones
+            startlane,endlane = cli_interface_medialanes(intf, namespace)
+            # here we want lanes 1-based for matching CLI output
+            startlane += 1
+            endlane += 1
+            endlane += 1 # for use in range
+
+            # (1) port enabled, assuming this is the default state
+            # check TX<lane>Power
+            for lane in range(startlane, endlane):
+                tgt = 'TX' + str(lane) + 'Power'
+                if tgt in clidict:
+                    txpwr = cli_parse_float_with_unit( clidict[tgt] )
+                    assert txpwr and (txpwr > _DOM_MIN_TXPWR_ON) and (txpwr < _DOM_MAX_TXPWR_ON)
+                else:
+                    break
+            
+            # check TX<lane>Bias
+            for lane in range(startlane, endlane):
+                tgt = 'TX' + str(lane) + 'Bias'
+                if tgt in clidict:
+                    txbias = cli_parse_float_with_unit( clidict[tgt] )
+                    assert txbias and (txbias > _DOM_MIN_TXBIAS_ON) and (txbias < _DOM_MAX_TXBIAS_ON)
+                else:
+                    break
+            
+            # check RX<lane>Power - assuming other end is transmitting
+            for lane in range(startlane, endlane):
+                tgt = 'RX' + str(lane) + 'Power'
+                if tgt in clidict:
+                    rxpwr = cli_parse_float_with_unit( clidict[tgt] )
+                    assert rxpwr and (rxpwr > _DOM_MIN_RXPWR_ON) and (rxpwr < _DOM_MAX_RXPWR_ON)
+                else:
+                    break
+
+            # While SFF does define LPMode it does not require that it disables Tx,
+            # only that it reduce power to class 1 (1.5W) which is not verifiable. 
+            if is_cmis(intf):
+                # (2) port disabled
+
+                # disable port
+                t_change = time.time()
+                cli_interface_shutdown(intf)
+
+                # wait for port to power down and DOM to be updated: instead of a
+                # fixed sleep, poll the module until a sample shows all Tx off (at
+                # most as long as the fixed sleep was)
+                tx_off  = lambda d: all(cli_parse_float_with_unit(d['TX%dPower' % n]) == _DOM_TXPWR_OFF
+                                        for n in range(startlane, endlane) if 'TX%dPower' % n in d)
+                clidict = dom_wait_fresh(intf, t_change, namespace, source='eeprom', ready=tx_off,
+                                         timeout=_DELAY_AFTER_IF_SHUTDOWN_S)
+                # this check is mostly DEBUG:
+                up = cli_interface_oper_status_up(intf)
+                assert not up, '%s not down after %fs' % (intf, time.time() - t_change)
 
-                # (1) port enabled, assuming this is the default state
+                if not clidict:
+                    # timed out; read once more and let the checks below report it
+                    cmdstr  = cmd_int_trans_dom + ' ' + intf
+                    clistr  = cli_wrap(cmdstr)                          # run CLI command
+                    clidict = cli_output2dict(clistr, delimiter=':')    # decode output
+                assert len(clidict) > 8
+                result_values('test_check_sfputil_transceiver_dom', intf, 'dom_shutdown', result_dom_values(clidict))
+                
                 # check TX<lane>Power
                 for lane in range(startlane, endlane):
                     tgt = 'TX' + str(lane) + 'Power'
                     if tgt in clidict:
                         txpwr = cli_parse_float_with_unit( clidict[tgt] )
-                        assert txpwr and (txpwr > _DOM_MIN_TXPWR_ON) and (txpwr < _DOM_MAX_TXPWR_ON)
+                        
+                        #if not txpwr: print('not txpwr')                          # TEMPORARY DEBUG
+                        #elif not (txpwr == _DOM_TXPWR_OFF): print('txpwr=',txpwr) # TEMPORARY DEBUG
+                        assert txpwr and (txpwr == _DOM_TXPWR_OFF)
                     else:
                         break
                 
                 # check TX<lane>Bias
                 for lane in range(startlane, endlane):
-                    tgt = 'TX' + str(lane) + 'Bias'
+                    tgt = 'Tx' + str(lane) + 'Bias'
                     if tgt in clidict:
                         txbias = cli_parse_float_with_unit( clidict[tgt] )
-                        assert txbias and (txbias > _DOM_MIN_TXBIAS_ON) and (txbias < _DOM_MAX_TXBIAS_ON)
+                
+                        #if not txbias:
+                        #    print('not txbias')                        # TEMPORARY DEBUG
+                        #    print('tgt=%s' % (tgt))
+                        #elif not (txbias == _DOM_TXBIAS_OFF): print('txbias=',txbias) # TEMPORARY DEBUG
+                
+                        assert txbias and (txbias == _DOM_TXBIAS_OFF)
                     else:
                         break
                 
-                # check RX<lane>Power - assuming other end is transmitting
-                for lane in range(startlane, endlane):
-                    tgt = 'RX' + str(lane) + 'Power'
-                    if tgt in clidict:
-                        rxpwr = cli_parse_float_with_unit( clidict[tgt] )
-                        assert rxpwr and (rxpwr > _DOM_MIN_RXPWR_ON) and (rxpwr < _DOM_MAX_RXPWR_ON)
-                    else:
+                # DON'T check RX<lane>Power again here. It wouldn't have changed;
+                # the other end wasn't shut down, and Rx power is reported even
+                # if a port is shut down.
+                
+                # (3) re-enable port
+                cli_interface_startup(intf)
+                
+                # wait for port to power up
+                # We COULD do this only once outside of this loop, but that wouldn't
+                # work for channelized ports. (E.g. if Ethernet0/Ethernet4 were part 
+                # of the same 2x100G physical port.)
+                #time.sleep(_DELAY_AFTER_IF_STARTUP_S)
+                timeout = _MAX_WAIT_FOR_LINK_UP_S
+                if is_coherent(intf):
+                    timeout = _MAX_WAIT_FOR_LINK_UP_COHERENT_S
+                t_limit = time.time() + timeout
+                up = False
+                while time.time() < t_limit:
+                    trace_sleep(_POLL_PERIOD_S)
+                    timeout -= _POLL_PERIOD_S
+                    up = cli_interface_oper_status_up(intf)
+                    if up:
                         break
+                assert up, '%s not up after %fs' % (intf, timeout)
 
-                # While SFF does define LPMode it does not require that it disables Tx,
-                # only that it reduce power to class 1 (1.5W) which is not verifiable. 
-                if is_cmis(intf):
-                    # (2) port disabled
-
-                    # disable port
-                    cli_interface_shutdown(intf)
-                    
-                    # wait for port to power down (and DOM to be updated)
-                    time.sleep(_DELAY_AFTER_IF_SHUTDOWN_S)
-                    # this check is mostly DEBUG:
-                    up = cli_interface_oper_status_up(intf)
-                    assert not up, '%s not down after %fs' % (intf, _DELAY_AFTER_IF_SHUTDOWN_S)
-                    
-                    cmdstr  = cmd_int_trans_dom + ' ' + intf
-                    clistr  = cli_wrap(cmdstr)                          # run CLI command
-                    clidict = cli_output2dict(clistr, delimiter=':')    # decode output
-                    assert len(clidict) > 8
-                    
-                    # check TX<lane>Power
-                    for lane in range(startlane, endlane):
-                        tgt = 'TX' + str(lane) + 'Power'
-                        if tgt in clidict:
-                            txpwr = cli_parse_float_with_unit( clidict[tgt] )
-                            
-                            #if not txpwr: print('not txpwr')                          # TEMPORARY DEBUG
-                            #elif not (txpwr == _DOM_TXPWR_OFF): print('txpwr=',txpwr) # TEMPORARY DEBUG
-                            assert txpwr and (txpwr == _DOM_TXPWR_OFF)
-                        else:
-                            break
-                    
-                    # check TX<lane>Bias
-                    for lane in range(startlane, endlane):
-                        tgt = 'Tx' + str(lane) + 'Bias'
-                        if tgt in clidict:
-                            txbias = cli_parse_float_with_unit( clidict[tgt] )
-                    
-                            #if not txbias:
-                            #    print('not txbias')                        # TEMPORARY DEBUG
-                            #    print('tgt=%s' % (tgt))
-                            #elif not (txbias == _DOM_TXBIAS_OFF): print('txbias=',txbias) # TEMPORARY DEBUG
-                    
-                            assert txbias and (txbias == _DOM_TXBIAS_OFF)
-                        else:
-                            break
-                    
-                    # DON'T check RX<lane>Power again here. It wouldn't have changed;
-                    # the other end wasn't shut down, and Rx power is reported even
-                    # if a port is shut down.
-                    
-                    # (3) re-enable port
-                    cli_interface_startup(intf)
-                    
-                    # wait for port to power up
-                    # We COULD do this only once outside of this loop, but that wouldn't
-                    # work for channelized ports. (E.g. if Ethernet0/Ethernet4 were part 
-                    # of the same 2x100G physical port.)
-                    #time.sleep(_DELAY_AFTER_IF_STARTUP_S)
-                    timeout = _MAX_WAIT_FOR_LINK_UP_S
-                    if is_coherent(intf):
-                        timeout = _MAX_WAIT_FOR_LINK_UP_COHERENT_S
-                    t_limit = time.time() + timeout
-                    up = False
-                    while time.time() < t_limit:
-                        time.sleep(_POLL_PERIOD_S)
-                        timeout -= _POLL_PERIOD_S
-                        up = cli_interface_oper_status_up(intf)
-                        if up:
-                            break
-                    assert up, '%s not up after %fs' % (intf, timeout)
+        result_done('test_check_sfputil_transceiver_dom', intf)
 
-            print('test_check_sfputil_transceiver_dom ', intf, ' done') # TEMPORARY DEBUG
+    # all ports at once; subports of the same physical port one at a time
+    ports = [intf for intf in dev_conn if intf not in xcvr_skip_list[duthost.hostname]]
+    results, failures = sched_run_ports(ports, check_port, namespace=namespace)
+    sched_assert_ports(failures, ports)
 
 
 def test_check_sfputil_transceiver_eeprom_hexdump(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
@@ -735,168 +707,176 @@ def test_check_sfputil_transceiver_eeprom_hexdump(duthosts, enum_rand_one_per_hw
     global ans_host
     ans_host = duthost
     portmap, dev_conn = get_dev_conn(duthost, conn_graph_facts, enum_frontend_asic_index)
+    sess = util_session(duthost)
 
     logging.info("Check output of '{}'".format(cmd_int_trans_dom))
 
-    namespace = duthost.get_namespace_from_asic_id(enum_frontend_asic_index)
-    test_cfg = test_cfg_read()
+    namespace = sess.namespace
+    test_cfg = sess.test_cfg
     assert test_cfg, 'Failed to read test config file'
 
     for intf in dev_conn:
         if intf not in xcvr_skip_list[duthost.hostname]:
-            switchname  = duthost.hostname
-            port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
-            assert port_cfg
+            with result_step('test_check_sfputil_transceiver_eeprom_hexdump', intf, 'port'):
+                switchname  = duthost.hostname
+                port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
+                assert port_cfg
 
-            base_cmdstr = cmd_int_show_eeprom_hex + ' ' + intf + ' '
+                # incremental: skip if unchanged since last pass
+                inputs = util_incr_inputs(__file__, intf, port_cfg, namespace)
+                if util_incr_skip('test_check_sfputil_transceiver_eeprom_hexdump', switchname, intf, inputs):
+                    continue
 
-            if is_cmis(intf):
-                # page 0
-                cmdstr  = base_cmdstr + '--page ' + '0'
-                clistr  = cli_wrap(cmdstr)
-                lines = clistr.splitlines()
+                base_cmdstr = cmd_int_show_eeprom_hex + ' ' + intf + ' '
+
+                if is_cmis(intf):
+                    # page 0
+                    cmdstr  = base_cmdstr + '--page ' + '0'
+                    clistr  = cli_wrap(cmdstr)
+                    lines = clistr.splitlines()
                 
-                # CMIS rev "52" -> "5.2"
-                items = lines[2].split()
-                s = items[2][0] + '.' + items[2][1]
-                assert port_cfg['cmis_rev'] == s
+                    # CMIS rev "52" -> "5.2"
+                    items = lines[2].split()
+                    s = items[2][0] + '.' + items[2][1]
+                    assert port_cfg['cmis_rev'] == s
                 
-                # vendor name "48 69 73 65 6e 73 65  20 20..." -> "Hisense"
-                items1 = lines[12].split()
-                items2 = lines[13].split()
-                s = ''
-                for x in items1[2:17]:
+                    # vendor name "48 69 73 65 6e 73 65  20 20..." -> "Hisense"
+                    items1 = lines[12].split()
+                    items2 = lines[13].split()
+                    s = ''
+                    for x in items1[2:17]:
+                        s += chr(int(x,16))
+                    x = items2[1]
                     s += chr(int(x,16))
-                x = items2[1]
-                s += chr(int(x,16))
-                assert port_cfg['vendor_name'] == s.strip() 
+                    assert port_cfg['vendor_name'] == s.strip() 
                 
-                # vendor PN "44 45 46 38 35 30 34 2d 32 43 30 32" -> "DEF8504-2C02"
-                items1 = lines[13].split()[5:17]
-                items2 = lines[14].split()[1:5]
-                s = ''
-                for x in items1: s += chr(int(x,16))
-                for x in items2: s += chr(int(x,16))
-                assert port_cfg['vendor_pn'] == s.strip() 
+                    # vendor PN "44 45 46 38 35 30 34 2d 32 43 30 32" -> "DEF8504-2C02"
+                    items1 = lines[13].split()[5:17]
+                    items2 = lines[14].split()[1:5]
+                    s = ''
+                    for x in items1: s += chr(int(x,16))
+                    for x in items2: s += chr(int(x,16))
+                    assert port_cfg['vendor_pn'] == s.strip() 
                 
-                # vendor SN
-                items1 = lines[14].split()[7:17]
-                items2 = lines[15].split()[1:7]
-                s = ''
-                for x in items1: s += chr(int(x,16))
-                for x in items2: s += chr(int(x,16))
-                assert port_cfg['vendor_sn'] == s.strip() 
+                    # vendor SN
+                    items1 = lines[14].split()[7:17]
+                    items2 = lines[15].split()[1:7]
+                    s = ''
+                    for x in items1: s += chr(int(x,16))
+                    for x in items2: s += chr(int(x,16))
+                    assert port_cfg['vendor_sn'] == s.strip() 
                 
-                # vendor date
-                # EEPROM "32 33 31 31 32 30" -> port_cfg format '2023-11-20'
-                items1 = lines[15].split()[7:13]
-                s = ''
-                for x in items1: s += chr(int(x,16))
-                s2 = '20' + s[0:2] + '-' + s[2:4] + '-' + s[4:6]
-                assert port_cfg['vendor_date'] == s2
+                    # vendor date
+                    # EEPROM "32 33 31 31 32 30" -> port_cfg format '2023-11-20'
+                    items1 = lines[15].split()[7:13]
+                    s = ''
+                    for x in items1: s += chr(int(x,16))
+                    s2 = '20' + s[0:2] + '-' + s[2:4] + '-' + s[4:6]
+                    assert port_cfg['vendor_date'] == s2
                 
-                # page 0x11
-                cmdstr  = base_cmdstr + '--page ' + '0x11'
-                clistr  = cli_wrap(cmdstr)
-                lines = clistr.splitlines()
+                    # page 0x11
+                    cmdstr  = base_cmdstr + '--page ' + '0x11'
+                    clistr  = cli_wrap(cmdstr)
+                    lines = clistr.splitlines()
                 
-                # DP states - should be 4 = Activated
-                #10/03/24: New SONIC version always shows upper page 0 as well...
-                #items = lines[12].split()[1:5]
-                items = lines[12+10].split()[1:5]
-                states= []
-                for x in items:
-                    # first byte lowest two DP
-                    states.append(int(x[1],16)) # bits 3:0 low DP
-                    states.append(int(x[0],16)) # bits 7:4 high DP
-                target = 4
-                startlane,endlane = cli_interface_hostlanes(intf, namespace)
-                endlane += 1 # for use in range
-                for i in range (startlane,endlane):
-                    assert states[i] == target, 'DP %d state %x != %x' % (i, states[i], target)
+                    # DP states - should be 4 = Activated
+                    #10/03/24: New SONIC version always shows upper page 0 as well...
+                    #items = lines[12].split()[1:5]
+                    items = lines[12+10].split()[1:5]
+                    states= []
+                    for x in items:
+                        # first byte lowest two DP
+                        states.append(int(x[1],16)) # bits 3:0 low DP
+                        states.append(int(x[0],16)) # bits 7:4 high DP
+                    target = 4
+                    startlane,endlane = cli_interface_hostlanes(intf, namespace)
+                    endlane += 1 # for use in range
+                    for i in range (startlane,endlane):
+                        assert states[i] == target, 'DP %d state %x != %x' % (i, states[i], target)
 
-            elif is_sff8436(intf) or is_sff8636(intf):
-                # page 0
-                cmdstr  = base_cmdstr + '--page ' + '0'
-                clistr  = cli_wrap(cmdstr)
-                lines = clistr.splitlines()
-                assert len(lines) >= 20
-
-                # vendor name
-                items1 = lines[13].split()[5:17]
-                items2 = lines[14].split()[1:5]
-                s = ''
-                for x in items1: s += chr(int(x,16))
-                for x in items2: s += chr(int(x,16))
-                assert port_cfg['vendor_name'] == s.strip() 
-
-                # vendor PN
-                items1 = lines[14].split()[9:17]
-                items2 = lines[15].split()[1:9]
-                s = ''
-                for x in items1: s += chr(int(x,16))
-                for x in items2: s += chr(int(x,16))
-                assert port_cfg['vendor_pn'] == s.strip() 
-
-                # vendor SN
-                items1 = lines[16].split()[5:17]
-                items2 = lines[17].split()[1:5]
-                s = ''
-                for x in items1: s += chr(int(x,16))
-                for x in items2: s += chr(int(x,16))
-                assert port_cfg['vendor_sn'] == s.strip() 
-
-                # vendor date
-                # EEPROM "32 33 31 31 32 30" -> port_cfg format '2023-11-20'
-                items1 = lines[17].split()[5:13]
-                s = ''
-                for x in items1: s += chr(int(x,16))
-                s2 = '20' + s[0:2] + '-' + s[2:4] + '-' + s[4:6]
-                assert port_cfg['vendor_date'] == s2
-
-            elif is_sff8472(intf):
-                # page 0
-                cmdstr  = base_cmdstr + '--page ' + '0'
-                clistr  = cli_wrap(cmdstr)
-                lines = clistr.splitlines()
-                assert len(lines) >= 10
-
-                # 20-35 vendor name
-                items1 = lines[3].split()[5:17]
-                items2 = lines[4].split()[1:5]
-                s = ''
-                for x in items1: s += chr(int(x,16))
-                for x in items2: s += chr(int(x,16))
-                assert port_cfg['vendor_name'] == s.strip() 
-
-                # 40-55 vendor PN
-                items1 = lines[4].split()[9:17]
-                items2 = lines[5].split()[1:9]
-                s = ''
-                for x in items1: s += chr(int(x,16))
-                for x in items2: s += chr(int(x,16))
-                assert port_cfg['vendor_pn'] == s.strip() 
-
-                # 68-83 vendor SN
-                items1 = lines[6].split()[5:17]
-                items2 = lines[7].split()[1:5]
-                s = ''
-                for x in items1: s += chr(int(x,16))
-                for x in items2: s += chr(int(x,16))
-                assert port_cfg['vendor_sn'] == s.strip() 
-
-                # 84-91 vendor date
-                # EEPROM "32 33 31 31 32 30" -> port_cfg format '2023-11-20'
-                items1 = lines[6].split()[5:13]
-                s = ''
-                for x in items1: s += chr(int(x,16))
-                s2 = '20' + s[0:2] + '-' + s[2:4] + '-' + s[4:6]
-                assert port_cfg['vendor_date'] == s2
-
-            else:
-                print('test_check_sfputil_transceiver_eeprom_hexdump ', intf, ' Skipped (unsupported type)')
-
-            print('test_check_sfputil_transceiver_eeprom_hexdump ', intf, ' done') # TEMPORARY DEBUG
+                elif is_sff8436(intf) or is_sff8636(intf):
+                    # page 0
+                    cmdstr  = base_cmdstr + '--page ' + '0'
+                    clistr  = cli_wrap(cmdstr)
+                    lines = clistr.splitlines()
+                    assert len(lines) >= 20
+
+                    # vendor name
+                    items1 = lines[13].split()[5:17]
+                    items2 = lines[14].split()[1:5]
+                    s = ''
+                    for x in items1: s += chr(int(x,16))
+                    for x in items2: s += chr(int(x,16))
+                    assert port_cfg['vendor_name'] == s.strip() 
+
+                    # vendor PN
+                    items1 = lines[14].split()[9:17]
+                    items2 = lines[15].split()[1:9]
+                    s = ''
+                    for x in items1: s += chr(int(x,16))
+                    for x in items2: s += chr(int(x,16))
+                    assert port_cfg['vendor_pn'] == s.strip() 
+
+                    # vendor SN
+                    items1 = lines[16].split()[5:17]
+                    items2 = lines[17].split()[1:5]
+                    s = ''
+                    for x in items1: s += chr(int(x,16))
+                    for x in items2: s += chr(int(x,16))
+                    assert port_cfg['vendor_sn'] == s.strip() 
+
+                    # vendor date
+                    # EEPROM "32 33 31 31 32 30" -> port_cfg format '2023-11-20'
+                    items1 = lines[17].split()[5:13]
+                    s = ''
+                    for x in items1: s += chr(int(x,16))
+                    s2 = '20' + s[0:2] + '-' + s[2:4] + '-' + s[4:6]
+                    assert port_cfg['vendor_date'] == s2
+
+                elif is_sff8472(intf):
+                    # page 0
+                    cmdstr  = base_cmdstr + '--page ' + '0'
+                    clistr  = cli_wrap(cmdstr)
+                    lines = clistr.splitlines()
+                    assert len(lines) >= 10
+
+                    # 20-35 vendor name
+                    items1 = lines[3].split()[5:17]
+                    items2 = lines[4].split()[1:5]
+                    s = ''
+                    for x in items1: s += chr(int(x,16))
+                    for x in items2: s += chr(int(x,16))
+                    assert port_cfg['vendor_name'] == s.strip() 
+
+                    # 40-55 vendor PN
+                    items1 = lines[4].split()[9:17]
+                    items2 = lines[5].split()[1:9]
+                    s = ''
+                    for x in items1: s += chr(int(x,16))
+                    for x in items2: s += chr(int(x,16))
+                    assert port_cfg['vendor_pn'] == s.strip() 
+
+                    # 68-83 vendor SN
+                    items1 = lines[6].split()[5:17]
+                    items2 = lines[7].split()[1:5]
+                    s = ''
+                    for x in items1: s += chr(int(x,16))
+                    for x in items2: s += chr(int(x,16))
+                    assert port_cfg['vendor_sn'] == s.strip() 
+
+                    # 84-91 vendor date
+                    # EEPROM "32 33 31 31 32 30" -> port_cfg format '2023-11-20'
+                    items1 = lines[6].split()[5:13]
+                    s = ''
+                    for x in items1: s += chr(int(x,16))
+                    s2 = '20' + s[0:2] + '-' + s[2:4] + '-' + s[4:6]
+                    assert port_cfg['vendor_date'] == s2
+
+                else:
+                    result_skip('test_check_sfputil_transceiver_eeprom_hexdump', intf, 'unsupported type')
+
+                result_done('test_check_sfputil_transceiver_eeprom_hexdump', intf)
+                util_incr_passed('test_check_sfputil_transceiver_eeprom_hexdump', switchname, intf, inputs)
 
 
 def test_check_sfputil_transceiver_fw_version(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
@@ -953,51 +933,52 @@ def test_check_sfputil_transceiver_fw_version(duthosts, enum_rand_one_per_hwsku_
     global ans_host
     ans_host = duthost
     portmap, dev_conn = get_dev_conn(duthost, conn_graph_facts, enum_frontend_asic_index)
+    sess = util_session(duthost)
 
     logging.info("Check output of '{}'".format(cmd_int_show_fwver))
 
-    namespace = duthost.get_namespace_from_asic_id(enum_frontend_asic_index)
-    test_cfg = test_cfg_read()
+    namespace = sess.namespace
+    test_cfg = sess.test_cfg
     assert test_cfg, 'Failed to read test config file'
 
     for intf in dev_conn:
         if intf not in xcvr_skip_list[duthost.hostname]:
-            switchname  = duthost.hostname
-            port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
-            assert port_cfg
-
-            if not is_cmis(intf):
-                # N/A in the other older protocols
-                print('test_check_sfputil_transceiver_fw_version ', intf, ' Skipped (not CMIS)')
-                continue
-
-            # For breakout cables/ports, disable DOM polling on FIRST subport.
-            # To that end we need to find that first subport (the port itself 
-            # if no breakout).
-
-            # get list of test ports
-            yyy = test_cfg_read()
-            assert test_cfg_valid(yyy)
-            intf_list = test_cfg_ports(yyy, switchname, namespace=namespace)
-            assert intf_list and len(intf_list) > 1 and intf in intf_list
-
-            # find first subport corresponding to <intf> in test port list
-            first_intf = cli_interface_first_subport(intf, intf_list, namespace)
-            assert first_intf , 'FIRST subport not found for %s' % (intf)
-
-            # disable DOM, using context manager
-            with cli_dom_disabled(first_intf, namespace):
-                # now run the command we're supposed to test on <intf> itself
-                cmdstr  = cmd_int_show_fwver + ' ' + intf
-                clistr  = cli_wrap(cmdstr)
-                clidict = cli_output2dict(clistr, delimiter=':')
+            with result_step('test_check_sfputil_transceiver_fw_version', intf, 'port'):
+                switchname  = duthost.hostname
+                port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
+                assert port_cfg
+
+                if not is_cmis(intf):
+                    # N/A in the other older protocols
+                    result_skip('test_check_sfputil_transceiver_fw_version', intf, 'not CMIS')
+                    continue
+
+                # For breakout cables/ports, disable DOM polling on FIRST subport.
+                # To that end we need to find that first subport (the port itself 
+                # if no breakout).
+
+                # get list of test ports
+                assert test_cfg_valid(test_cfg)
+                intf_list = test_cfg_ports(test_cfg, switchname, namespace=namespace)
+                assert intf_list and len(intf_list) > 1 and intf in intf_list
+
+                # find first subport corresponding to <intf> in test port list
+                first_intf = cli_interface_first_subport(intf, intf_list, namespace)
+                assert first_intf , 'FIRST subport not found for %s' % (intf)
+
+                # disable DOM, using context manager
+                with cli_dom_disabled(first_intf, namespace):
+                    # now run the command we're supposed to test on <intf> itself
+                    cmdstr  = cmd_int_show_fwver + ' ' + intf
+                    clistr  = cli_wrap(cmdstr)
+                    clidict = cli_output2dict(clistr, delimiter=':')
                 
-                assert 'Active Firmware' in clidict
-                assert 'Inactive Firmware' in clidict
-                assert port_cfg['active_firmware']  == clidict['Active Firmware']
-                assert port_cfg['inactive_firmware']== clidict['Inactive Firmware']
+                    assert 'Active Firmware' in clidict
+                    assert 'Inactive Firmware' in clidict
+                    assert port_cfg['active_firmware']  == clidict['Active Firmware']
+                    assert port_cfg['inactive_firmware']== clidict['Inactive Firmware']
 
-            print('test_check_sfputil_transceiver_fw_version ', intf, ' done') # TEMPORARY DEBUG
+                result_done('test_check_sfputil_transceiver_fw_version', intf)
 
 
 def test_check_sfputil_transceiver_loopback(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
@@ -1026,12 +1007,14 @@ def test_check_sfputil_transceiver_loopback(duthosts, enum_rand_one_per_hwsku_fr
     global ans_host
     ans_host = duthost
     portmap, dev_conn = get_dev_conn(duthost, conn_graph_facts, enum_frontend_asic_index)
+    sess = util_session(duthost)
 
     logging.info("Check loopback")
 
-    namespace = duthost.get_namespace_from_asic_id(enum_frontend_asic_index)
-    test_cfg = test_cfg_read()
+    namespace = sess.namespace
+    test_cfg = sess.test_cfg
     assert test_cfg, 'Failed to read test config file'
+    port_caps = sess.caps()
 
     # cannot use RemotePortId (see function header comment)
     #chassis_mac = cli_chassis_mac(namespace)
@@ -1039,126 +1022,127 @@ def test_check_sfputil_transceiver_loopback(duthosts, enum_rand_one_per_hwsku_fr
 
     for intf in dev_conn:
         if intf not in xcvr_skip_list[duthost.hostname]:
-            switchname  = duthost.hostname
-            port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
-            assert port_cfg
-
-            # only test for "main ports" (?)
-            subport = cli_interface_subport(intf, namespace)
-            if subport and subport > 1:
-                print('test_check_sfputil_transceiver_loopback ', intf, ' Skipped (subport)')
-                continue
+            with result_step('test_check_sfputil_transceiver_loopback', intf, 'port'):
+                switchname  = duthost.hostname
+                port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
+                assert port_cfg
+                caps = port_caps[intf]
+
+                # only test for "main ports" (?)
+                if not caps.main_port:
+                    result_skip('test_check_sfputil_transceiver_loopback', intf, 'subport')
+                    continue
     
-            if not is_cmis(intf):
-                print('test_check_sfputil_transceiver_loopback ', intf, ' Skipped (not CMIS)')
-                continue
-
-            # which loops to test
-            # For "local" testing (running in switch), only loopbacks towards
-            # this switch (LB_MEDIA_OUTPUT, LB_HOST_INPUT) can be verified.
-            #loops_to_test = [LB_MEDIA_OUTPUT, LB_HOST_INPUT]
-            loops_to_test = [LB_MEDIA_OUTPUT]
-            # limit list to those supported
-            loops_supported = testutil_supported_loopbacks(intf, namespace) # bitmask
-            for l in loops_to_test:
-                if not l & loops_supported:
-                    loops_to_test.remove(l)
-
-            if not loops_to_test:
-                print('test_check_sfputil_transceiver_loopback ', intf, ' Skipped (N/A)')
-                continue
-
-            for looptype in loops_to_test:
-                # Set up loop.
-                #   $ sudo sfputil debug loopback Ethernet0 media-side-output
-                #   Ethernet0: Set media-side-output loopback
-                #
-                #   $ sudo sfputil debug loopback Ethernet0 media-side-output
-                #   Ethernet0: Set media-side-output loopback failed
-                typestr = LOOPTYPE_STRINGS[looptype]
-                cmdstr = 'sudo sfputil debug loopback ' + intf + ' ' + typestr
-                clistr = cli_wrap_sh(cmdstr)
-                assert clistr and not 'fail' in clistr.lower()
+                if not caps.cmis:
+                    result_skip('test_check_sfputil_transceiver_loopback', intf, 'not CMIS')
+                    continue
+
+                # which loops to test
+                # For "local" testing (running in switch), only loopbacks towards
+                # this switch (LB_MEDIA_OUTPUT, LB_HOST_INPUT) can be verified.
+                #loops_to_test = [LB_MEDIA_OUTPUT, LB_HOST_INPUT]
+                loops_to_test = [LB_MEDIA_OUTPUT]
+                # limit list to those supported
+                loops_supported = caps.loopbacks # bitmask
+                for l in loops_to_test:
+                    if not l & loops_supported:
+                        loops_to_test.remove(l)
+
+                if not loops_to_test:
+                    result_skip('test_check_sfputil_transceiver_loopback', intf, 'N/A')
+                    continue
+
+                for looptype in loops_to_test:
+                    # Set up loop.
+                    #   $ sudo sfputil debug loopback Ethernet0 media-side-output
+                    #   Ethernet0: Set media-side-output loopback
+                    #
+                    #   $ sudo sfputil debug loopback Ethernet0 media-side-output
+                    #   Ethernet0: Set media-side-output loopback failed
+                    typestr = LOOPTYPE_STRINGS[looptype]
+                    cmdstr = 'sudo sfputil debug loopback ' + intf + ' ' + typestr
+                    clistr = cli_wrap_sh(cmdstr)
+                    assert clistr and not 'fail' in clistr.lower()
                 
-                # check (wait for) link up
-                timeout = _MAX_WAIT_FOR_LINK_UP_S
-                if is_coherent(intf):
-                    timeout = _MAX_WAIT_FOR_LINK_UP_COHERENT_S
-                t_limit = time.time() + timeout
-                up = False
-                while time.time() < t_limit:
-                    time.sleep(_POLL_PERIOD_S)
-                    timeout -= _POLL_PERIOD_S
-                    up = cli_interface_oper_status_up(intf)
-                    if up:
-                        break
-                assert up, '%s not up after %fs' % (intf, timeout)
+                    # check (wait for) link up
+                    timeout = _MAX_WAIT_FOR_LINK_UP_S
+                    if is_coherent(intf):
+                        timeout = _MAX_WAIT_FOR_LINK_UP_COHERENT_S
+                    t_limit = time.time() + timeout
+                    up = False
+                    while time.time() < t_limit:
+                        trace_sleep(_POLL_PERIOD_S)
+                        timeout -= _POLL_PERIOD_S
+                        up = cli_interface_oper_status_up(intf)
+                        if up:
+                            break
+                    assert up, '%s not up after %fs' % (intf, timeout)
 
-                # TBD: do we need a small extra delay here to make sure LLDP table is updated?
-                time.sleep(_DELAY_LLDP_UPDATE_S)
+                    # TBD: do we need a small extra delay here to make sure LLDP table is updated?
+                    trace_sleep(_DELAY_LLDP_UPDATE_S)
 
-                # check LLDP table - should be local == remote
-                cmdstr = cmd_lldp_table
-                clistr = cli_wrap_sh(cmdstr)
-                lines = clistr.splitlines()
-                found = False
-                for line in lines:
-                    items = line.split()
-                    if len(items) == 5:
-                        local_port  = items[0]
-                        remote_port = items[4]
-                        remote_id   = items[2]
-                        if local_port == intf:
-                            found = True
-                            # cannot use RemotePortId (see function header comment)
-                            # Remote ID and remote port name should both match local.
-                            #assert remote_id == chassis_mac and remote_port == intf
-                            break
-                assert found, '%s not in lldp table' % intf
+                    # check LLDP table - should be local == remote
+                    cmdstr = cmd_lldp_table
+                    clistr = cli_wrap_sh(cmdstr)
+                    lines = clistr.splitlines()
+                    found = False
+                    for line in lines:
+                        items = line.split()
+                        if len(items) == 5:
+                            local_port  = items[0]
+                            remote_port = items[4]
+                            remote_id   = items[2]
+                            if local_port == intf:
+                                found = True
+                                # cannot use RemotePortId (see function header comment)
+                                # Remote ID and remote port name should both match local.
+                                #assert remote_id == chassis_mac and remote_port == intf
+                                break
+                    assert found, '%s not in lldp table' % intf
                 
-                # clear loop
-                cmdstr = 'sudo sfputil debug loopback ' + intf + ' none'
-                clistr = cli_wrap_sh(cmdstr)
-                assert clistr and not 'fail' in clistr.lower() and 'set none' in clistr.lower()
+                    # clear loop
+                    cmdstr = 'sudo sfputil debug loopback ' + intf + ' none'
+                    clistr = cli_wrap_sh(cmdstr)
+                    assert clistr and not 'fail' in clistr.lower() and 'set none' in clistr.lower()
                 
-                # check (wait for) link up
-                timeout = _MAX_WAIT_FOR_LINK_UP_S
-                if is_coherent(intf):
-                    timeout = _MAX_WAIT_FOR_LINK_UP_COHERENT_S
-                up = False
-                t_limit = time.time() + timeout
-                while time.time() < t_limit:
-                    time.sleep(_POLL_PERIOD_S)
-                    timeout -= _POLL_PERIOD_S
-                    up = cli_interface_oper_status_up(intf)
-                    if up:
-                        break
-                assert up, '%s not up after %fs' % (intf, timeout)
-
-                # small extra delay here to make sure LLDP table is updated(?)
-                time.sleep(_DELAY_LLDP_UPDATE_S)
-
-                # check LLDP table - should be local != remote
-                cmdstr = cmd_lldp_table
-                clistr = cli_wrap_sh(cmdstr)
-                lines = clistr.splitlines()
-                found = False
-                for line in lines:
-                    items = line.split()
-                    if len(items) == 5:
-                        local_port  = items[0]
-                        remote_port = items[4]
-                        remote_id   = items[2]
-                        if local_port == intf:
-                            found = True
-                            # cannot use RemotePortId (see function header comment)
-                            # Remote ID and remote port name shouldn't both match local.
-                            # Either one may match, but not both.
-                            #assert remote_id != chassis_mac or remote_port != intf
+                    # check (wait for) link up
+                    timeout = _MAX_WAIT_FOR_LINK_UP_S
+                    if is_coherent(intf):
+                        timeout = _MAX_WAIT_FOR_LINK_UP_COHERENT_S
+                    up = False
+                    t_limit = time.time() + timeout
+                    while time.time() < t_limit:
+                        trace_sleep(_POLL_PERIOD_S)
+                        timeout -= _POLL_PERIOD_S
+                        up = cli_interface_oper_status_up(intf)
+                        if up:
                             break
-                assert found, '%s not in lldp table' % intf
+                    assert up, '%s not up after %fs' % (intf, timeout)
 
-            print('test_check_sfputil_transceiver_fw_loopback ', intf, ' done') # TEMPORARY DEBUG
+                    # small extra delay here to make sure LLDP table is updated(?)
+                    trace_sleep(_DELAY_LLDP_UPDATE_S)
+
+                    # check LLDP table - should be local != remote
+                    cmdstr = cmd_lldp_table
+                    clistr = cli_wrap_sh(cmdstr)
+                    lines = clistr.splitlines()
+                    found = False
+                    for line in lines:
+                        items = line.split()
+                        if len(items) == 5:
+                            local_port  = items[0]
+                            remote_port = items[4]
+                            remote_id   = items[2]
+                            if local_port == intf:
+                                found = True
+                                # cannot use RemotePortId (see function header comment)
+                                # Remote ID and remote port name shouldn't both match local.
+                                # Either one may match, but not both.
+                                #assert remote_id != chassis_mac or remote_port != intf
+                                break
+                    assert found, '%s not in lldp table' % intf
+
+                result_done('test_check_sfputil_transceiver_loopback', intf)
 
 
 
@@ -16,6 +16,9 @@ from api_wrapper    import *   # wrappers for (optoe, sfp, sfp_base, xcvr_api, c
 from cli_wrapper    import *   # wrappers for CLI
 from util_wrapper   import *   # wrappers replacing platform_tests/sfp/util.py
 from test_cfg       import *   # wrappers dealing with test config file etc.
+from db_wrapper     import *   # wrappers for direct redis DB (STATE_DB etc.) access
+from result_wrapper import *   # structured test results
+from trace_wrapper  import *   # timeline tracing (trace_sleep)
 
 
 # Local Constants
@@ -36,6 +39,10 @@ _MAX_WAIT_FOR_LINK_UP_COHERENT_S = 180
 #_DELAY_PM_UPDATE_S          = 48.0
 _DELAY_PM_UPDATE_S          = 60.0
 
+# Read transceiver info straight from STATE_DB (what xcvrd published, all ports
+# in one redis round-trip) instead of through the "show" CLI.
+_USE_STATE_DB               = True
+
 
 # DOM min/max
 # Reasonable ranges expected in practice in these tests, not advertised limits.
@@ -62,6 +69,7 @@ _DOM_RXPWR_OFF      = _DOM_TXPWR_OFF
 # values to get updated. Using sfputil (realtime) instead of "show" as workaround.
 cmd_int_trans_info      = 'show interfaces transceiver info '
 cmd_int_trans_dom       = 'sudo sfputil show eeprom -d -p '
+cmd_all_trans_dom       = 'sudo sfputil show eeprom -d'      # all ports
 #cmd_int_trans_dom       = 'show interfaces transceiver eeprom -d ' # slow
 cmd_int_presence        = 'show interfaces transceiver presence '
 cmd_int_status          = 'show interfaces status '
@@ -77,48 +85,64 @@ def test_check_show_transceiver_info(duthosts, enum_rand_one_per_hwsku_frontend_
     @summary: Verify transceiver specific information through CLI
 
     Test "show interfaces transceiver info", comparing output to test config file.
+    The command is run once for all ports (see cli_eeprom_snapshot).
+
+    With _USE_STATE_DB, the same info is read from STATE_DB instead (the data
+    the CLI command would display), see db_transceiver_view.
     '''
     duthost = duthosts[enum_rand_one_per_hwsku_frontend_hostname]
     global ans_host
     ans_host = duthost
     portmap, dev_conn = get_dev_conn(duthost, conn_graph_facts, enum_frontend_asic_index)
+    sess = util_session(duthost)
 
     logging.info("Check output of '{}'".format(cmd_int_trans_info))
 
-    namespace = duthost.get_namespace_from_asic_id(enum_frontend_asic_index)
-    test_cfg = test_cfg_read()
+    namespace = sess.namespace
+    test_cfg = sess.test_cfg
     assert test_cfg, 'Failed to read test config file'
 
     for intf in dev_conn:
         if intf not in xcvr_skip_list[duthost.hostname]:
-            switchname  = duthost.hostname   # ???
-            port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
-            assert port_cfg
-
-            # TBD: assert or allow partial test?
-            #assert cli_interface_present(intf)
-            if not cli_interface_present(intf):
-                print('%s not present? skipping test' % (intf))
-                continue
-
-            cmdstr  = cmd_int_trans_info + ' ' + intf
-            clistr  = cli_wrap(cmdstr)                          # run CLI command
-            clidict = cli_output2dict(clistr, delimiter=':')    # decode output
-            assert len(clidict) > 8     # actually about 35 (for CMIS)
-
-            if is_cmis(intf):
-                assert port_cfg['active_firmware']  == clidict['Active Firmware']
-                assert port_cfg['inactive_firmware']== clidict['Inactive Firmware']
-                assert port_cfg['cmis_rev']         == clidict['CMIS Rev']
-
-            assert port_cfg['vendor_date']  == clidict['Vendor Date Code(YYYY-MM-DD Lot)']
-            assert port_cfg['vendor_name']  == clidict['Vendor Name']
-            assert port_cfg['vendor_oui']   == clidict['Vendor OUI']
-            assert port_cfg['vendor_pn']    == clidict['Vendor PN']
-            assert port_cfg['vendor_rev']   == clidict['Vendor Rev']
-            assert port_cfg['vendor_sn']    == clidict['Vendor SN']
+            with result_step('test_check_show_transceiver_info', intf, 'port'):
+                switchname  = duthost.hostname   # ???
+                port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
+                assert port_cfg
+
+                # incremental: skip if unchanged since last pass
+                inputs = util_incr_inputs(__file__, intf, port_cfg, namespace)
+                if util_incr_skip('test_check_show_transceiver_info', switchname, intf, inputs):
+                    continue
+
+                # TBD: assert or allow partial test?
+                #assert cli_interface_present(intf)
+                if not cli_interface_present(intf):
+                    result_skip('test_check_show_transceiver_info', intf, 'not present')
+                    continue
+
+                # all ports in one go, shared by all ports in this test
+                if _USE_STATE_DB:
+                    clidict = db_transceiver_view(intf, namespace)
+                    assert clidict, '%s not in STATE_DB' % (intf)
+                else:
+                    clidict = cli_eeprom_snapshot(cmd_int_trans_info).port(intf)
+                    assert clidict, '%s not in %s' % (intf, cmd_int_trans_info)
+                assert len(clidict) > 8     # actually about 35 (for CMIS)
+
+                if is_cmis(intf):
+                    assert port_cfg['active_firmware']  == clidict['Active Firmware']
+                    assert port_cfg['inactive_firmware']== clidict['Inactive Firmware']
+                    assert port_cfg['cmis_rev']         == clidict['CMIS Rev']
+
+                assert port_cfg['vendor_date']  == clidict['Vendor Date Code(YYYY-MM-DD Lot)']
+                assert port_cfg['vendor_name']  == clidict['Vendor Name']
+                assert port_cfg['vendor_oui']   == clidict['Vendor OUI']
+                assert port_cfg['vendor_pn']    == clidict['Vendor PN']
+                assert port_cfg['vendor_rev']   == clidict['Vendor Rev']
+                assert port_cfg['vendor_sn']    == clidict['Vendor SN']
             
-            print('test_check_show_transceiver_info ', intf, ' done') # TEMPORARY DEBUG
+                result_done('test_check_show_transceiver_info', intf)
+                util_incr_passed('test_check_show_transceiver_info', switchname, intf, inputs)
 
 
 def test_check_transceiver_DOM(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
@@ -153,140 +177,152 @@ def test_check_transceiver_DOM(duthosts, enum_rand_one_per_hwsku_frontend_hostna
     global ans_host
     ans_host = duthost
     portmap, dev_conn = get_dev_conn(duthost, conn_graph_facts, enum_frontend_asic_index)
+    sess = util_session(duthost)
 
     logging.info("Check output of '{}'".format(cmd_int_trans_dom))
 
-    namespace = duthost.get_namespace_from_asic_id(enum_frontend_asic_index)
-    test_cfg = test_cfg_read()
+    namespace = sess.namespace
+    test_cfg = sess.test_cfg
     assert test_cfg, 'Failed to read test config file'
 
     for intf in dev_conn:
         if intf not in xcvr_skip_list[duthost.hostname]:
-            switchname  = duthost.hostname   # ???
-            port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
-            assert port_cfg
-
-            cmdstr  = cmd_int_trans_dom + ' ' + intf
-            clistr  = cli_wrap(cmdstr)                          # run CLI command
-            clidict = cli_output2dict(clistr, delimiter=':')    # decode output
-            assert len(clidict) > 8
-
-            # ModuleMonitorValues
-            #    Temperature: 24.543C   # assume range {1 : 69}
-            #    Vcc: 3.25Volts         # HW limits ~ {3.135 : 3.465}
-            if 'Temperature' in clidict:
-                tmp = cli_parse_float_with_unit( clidict['Temperature'] )
-                assert tmp and (tmp > _DOM_MIN_TEMP) and (tmp < _DOM_MAX_TEMP)
-
-            if 'Vcc' in clidict:
-                vcc = cli_parse_float_with_unit( clidict['Vcc'] )
-                assert vcc and (vcc > _DOM_MIN_VCC) and (vcc < _DOM_MAX_VCC) 
-
-            # ChannelMonitorValues - depend on port state (shut/no shut).
-            # Only if txceiver is optical; CLI may incorrectly display power/bias 
-            # for DACs where these are N/A.
-            if is_optical(intf):
-
-                # for breakout SONIC dumps all 8 lanes, try to find the relevant ones
-                startlane,endlane = cli_interface_medialanes(intf, namespace)
-                # here we want lanes 1-based for matching CLI output
-                startlane += 1
-                endlane += 1
-                endlane += 1 # for use in range
-
-                # (1) port enabled, assuming this is the default state
-                # check TX<lane>Power
-                for lane in range(startlane, endlane):
-                    tgt = 'TX' + str(lane) + 'Power'
-                    if tgt in clidict:
-                        txpwr = cli_parse_float_with_unit( clidict[tgt] )
-                        assert txpwr and (txpwr > _DOM_MIN_TXPWR_ON) and (txpwr < _DOM_MAX_TXPWR_ON)
-                    else:
-                        break
-                
-                # check TX<lane>Bias
-                for lane in range(startlane, endlane):
-                    tgt = 'TX' + str(lane) + 'Bias'
-                    if tgt in clidict:
-                        txbias = cli_parse_float_with_unit( clidict[tgt] )
-                        assert txbias and (txbias > _DOM_MIN_TXBIAS_ON) and (txbias < _DOM_MAX_TXBIAS_ON)
-                    else:
-                        break
-                
-                # check RX<lane>Power - assuming other end is transmitting
-                for lane in range(startlane, endlane):
-                    tgt = 'RX' + str(lane) + 'Power'
-                    if tgt in clidict:
-                        rxpwr = cli_parse_float_with_unit( clidict[tgt] )
-                        assert rxpwr and (rxpwr > _DOM_MIN_RXPWR_ON) and (rxpwr < _DOM_MAX_RXPWR_ON)
-                    else:
-                        break
-
-                # While SFF does define LPMode it does not require that it disables Tx,
-                # only that it reduce power to class 1 (1.5W) which is not verifiable. 
-                if is_cmis(intf) and has_lpmode(intf):
-                    # (2) port disabled
-                    # disable port
-                    cli_interface_shutdown(intf)
-
-                    # wait for port to power down (and DOM to be updated)
-                    time.sleep(_DELAY_AFTER_IF_SHUTDOWN_S)
-                    # this check is mostly DEBUG:
-                    up = cli_interface_oper_status_up(intf)
-                    assert not up, '%s not down after %fs' % (intf, _DELAY_AFTER_IF_SHUTDOWN_S)
-                    
-                    cmdstr  = cmd_int_trans_dom + ' ' + intf
-                    clistr  = cli_wrap(cmdstr)                          # run CLI command
-                    clidict = cli_output2dict(clistr, delimiter=':')    # decode output
-                    assert len(clidict) > 8
-                    
+            with result_step('test_check_transceiver_DOM', intf, 'port'):
+                switchname  = duthost.hostname   # ???
+                port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
+                assert port_cfg
+
+                # port enabled: all ports in one go, shared by all ports in this test
+                clidict = cli_eeprom_snapshot(cmd_all_trans_dom).port(intf)
+                assert clidict, '%s not in %s' % (intf, cmd_all_trans_dom)
+                assert len(clidict) > 8
+                result_values('test_check_transceiver_DOM', intf, 'dom', result_dom_values(clidict))
+
+                # ModuleMonitorValues
+                #    Temperature: 24.543C   # assume range {1 : 69}
+                #    Vcc: 3.25Volts         # HW limits ~ {3.135 : 3.465}
+                if 'Temperature' in clidict:
+                    tmp = cli_parse_float_with_unit( clidict['Temperature'] )
+                    assert tmp and (tmp > _DOM_MIN_TEMP) and (tmp < _DOM_MAX_TEMP)
+
+                if 'Vcc' in clidict:
+                    vcc = cli_parse_float_with_unit( clidict['Vcc'] )
+                    assert vcc and (vcc > _DOM_MIN_VCC) and (vcc < _DOM_MAX_VCC) 
+
+                # ChannelMonitorValues - depend on port state (shut/no shut).
+                # Only if txceiver is optical; CLI may incorrectly display power/bias 
+                # for DACs where these are N/A.
+                if is_optical(intf):
+
+                    # for breakout SONIC dumps all 8 lanes, try to find the relevant ones
+                    startlane,endlane = cli_interface_medialanes(intf, namespace)
+                    # here we want lanes 1-based for matching CLI output
+                    startlane += 1
+                    endlane += 1
+                    endlane += 1 # for use in range
+
+                    # (1) port enabled, assuming this is the default state
                     # check TX<lane>Power
                     for lane in range(startlane, endlane):
                         tgt = 'TX' + str(lane) + 'Power'
                         if tgt in clidict:
                             txpwr = cli_parse_float_with_unit( clidict[tgt] )
-                            
-                            #if not txpwr: print('not txpwr')                          # TEMPORARY DEBUG
-                            #elif not (txpwr == _DOM_TXPWR_OFF): print('txpwr=',txpwr) # TEMPORARY DEBUG
-                            assert txpwr and (txpwr == _DOM_TXPWR_OFF)
+                            assert txpwr and (txpwr > _DOM_MIN_TXPWR_ON) and (txpwr < _DOM_MAX_TXPWR_ON)
                         else:
                             break
-                    
+                
                     # check TX<lane>Bias
                     for lane in range(startlane, endlane):
-                        tgt = 'Tx' + str(lane) + 'Bias'
+                        tgt = 'TX' + str(lane) + 'Bias'
                         if tgt in clidict:
                             txbias = cli_parse_float_with_unit( clidict[tgt] )
-                            assert txbias and (txbias == _DOM_TXBIAS_OFF)
+                            assert txbias and (txbias > _DOM_MIN_TXBIAS_ON) and (txbias < _DOM_MAX_TXBIAS_ON)
                         else:
                             break
-                    
-                    # DON'T check RX<lane>Power again here. It wouldn't have changed;
-                    # the other end wasn't shut down, and Rx power is reported even
-                    # if a port is shut down.
                 
-                    # (3) re-enable port
-                    cli_interface_startup(intf)
-                
-                    # wait for port to power up
-                    # We COULD do this only once outside of this loop, but that wouldn't
-                    # work for channelized ports. (E.g. if Ethernet0/Ethernet4 were part 
-                    # of the same 2x100G physical port.)
-                    #time.sleep(_DELAY_AFTER_IF_STARTUP_S)
-                    timeout = _MAX_WAIT_FOR_LINK_UP_S
-                    if is_coherent(intf):
-                        timeout = _MAX_WAIT_FOR_LINK_UP_COHERENT_S
-                    t_limit = time.time() + timeout
-                    up = False
-                    while time.time() < t_limit:
-                        time.sleep(_POLL_PERIOD_S)
-                        timeout -= _POLL_PERIOD_S
-                        up = cli_interface_oper_status_up(intf)
-                        if up:
+                    # check RX<lane>Power - assuming other end is transmitting
+                    for lane in range(startlane, endlane):
+                        tgt = 'RX' + str(lane) + 'Power'
+                        if tgt in clidict:
+                            rxpwr = cli_parse_float_with_unit( clidict[tgt] )
+                            assert rxpwr and (rxpwr > _DOM_MIN_RXPWR_ON) and (rxpwr < _DOM_MAX_RXPWR_ON)
+                        else:
                             break
-                    assert up, '%s not up after %fs' % (intf, timeout)
 
-            print('test_check_transceiver_dom ', intf, ' done') # TEMPORARY DEBUG
+                    # While SFF does define LPMode it does not require that it disables Tx,
+                    # only that it reduce power to class 1 (1.5W) which is not verifiable. 
+                    if is_cmis(intf) and has_lpmode(intf):
+                        # (2) port disabled
+                        # disable port
+                        t_change = time.time()
+                        cli_interface_shutdown(intf)
+
+                        # wait for port to power down and DOM to be updated: instead of a
+                        # fixed sleep, poll the module until a sample shows all Tx off (at
+                        # most as long as the fixed sleep was)
+                        tx_off  = lambda d: all(cli_parse_float_with_unit(d['TX%dPower' % n]) == _DOM_TXPWR_OFF
+                                                for n in range(startlane, endlane) if 'TX%dPower' % n in d)
+                        clidict = dom_wait_fresh(intf, t_change, namespace, source='eeprom', ready=tx_off,
+                                                 timeout=_DELAY_AFTER_IF_SHUTDOWN_S)
+                        # this check is mostly DEBUG:
+                        up = cli_interface_oper_status_up(intf)
+                        assert not up, '%s not down after %fs' % (intf, time.time() - t_change)
+
+                        if not clidict:
+                            # timed out; read once more and let the checks below report it
+                            cmdstr  = cmd_int_trans_dom + ' ' + intf
+                            clistr  = cli_wrap(cmdstr)                          # run CLI command
+                            clidict = cli_output2dict(clistr, delimiter=':')    # decode output
+                        assert len(clidict) > 8
+                        result_values('test_check_transceiver_DOM', intf, 'dom_shutdown', result_dom_values(clidict))
+                    
+                        # check TX<lane>Power
+                        for lane in range(startlane, endlane):
+                            tgt = 'TX' + str(lane) + 'Power'
+                            if tgt in clidict:
+                                txpwr = cli_parse_float_with_unit( clidict[tgt] )
+                            
+                                #if not txpwr: print('not txpwr')                          # TEMPORARY DEBUG
+                                #elif not (txpwr == _DOM_TXPWR_OFF): print('txpwr=',txpwr) # TEMPORARY DEBUG
+                                assert txpwr and (txpwr == _DOM_TXPWR_OFF)
+                            else:
+                                break
+                    
+                        # check TX<lane>Bias
+                        for lane in range(startlane, endlane):
+                            tgt = 'Tx' + str(lane) + 'Bias'
+                            if tgt in clidict:
+                                txbias = cli_parse_float_with_unit( clidict[tgt] )
+                                assert txbias and (txbias == _DOM_TXBIAS_OFF)
+                            else:
+                                break
+                    
+                        # DON'T check RX<lane>Power again here. It wouldn't have changed;
+                        # the other end wasn't shut down, and Rx power is reported even
+                        # if a port is shut down.
+                
+                        # (3) re-enable port
+                        cli_interface_startup(intf)
+                
+                        # wait for port to power up
+                        # We COULD do this only once outside of this loop, but that wouldn't
+                        # work for channelized ports. (E.g. if Ethernet0/Ethernet4 were part 
+                        # of the same 2x100G physical port.)
+                        #time.sleep(_DELAY_AFTER_IF_STARTUP_S)
+                        timeout = _MAX_WAIT_FOR_LINK_UP_S
+                        if is_coherent(intf):
+                            timeout = _MAX_WAIT_FOR_LINK_UP_COHERENT_S
+                        t_limit = time.time() + timeout
+                        up = False
+                        while time.time() < t_limit:
+                            trace_sleep(_POLL_PERIOD_S)
+                            timeout -= _POLL_PERIOD_S
+                            up = cli_interface_oper_status_up(intf)
+                            if up:
+                                break
+                        assert up, '%s not up after %fs' % (intf, timeout)
+
+                result_done('test_check_transceiver_DOM', intf)
 
 
 
@@ -331,108 +367,110 @@ def test_check_transceiver_status(duthosts, enum_rand_one_per_hwsku_frontend_hos
     global ans_host
     ans_host = duthost
     portmap, dev_conn = get_dev_conn(duthost, conn_graph_facts, enum_frontend_asic_index)
+    sess = util_session(duthost)
 
     logging.info("Check output of '{}'".format(cmd_int_status))
     logging.info("        and, of '{}'".format(cmd_lldp_table))
     logging.info("        and, of '{}'".format(cmd_int_presence)) # ?
 
-    namespace = duthost.get_namespace_from_asic_id(enum_frontend_asic_index)
-    test_cfg = test_cfg_read()
+    namespace = sess.namespace
+    test_cfg = sess.test_cfg
     assert test_cfg, 'Failed to read test config file'
 
     for intf in dev_conn:
         if intf not in xcvr_skip_list[duthost.hostname]:
-            switchname  = duthost.hostname   # ???
-            port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
-            assert port_cfg
-
-            # (1) port enabled, assuming this is the default state
-
-            # (1a) interface status
-            cmdstr  = cmd_int_status + ' ' + intf
-            clistr  = cli_wrap(cmdstr)                          # run CLI command
-            lines = clistr.splitlines()
-            line  = lines[2]
-            items = line.split()
-            assert items[0] == intf, '%s not in status' % intf
-            assert items[7] == 'up', '%s wrong oper  state %s' % (intf, items[7])
-            # wrong admin state would be a SONIC bug, not a txceiver issue
-            #assert items[8] == 'up', '%s wrong admin state %s' % (intf, items[8])
-
-            # (1b) lldp table
-            cmdstr  = cmd_lldp_table
-            clistr  = cli_wrap(cmdstr)                          # run CLI command
-            lines = clistr.splitlines()
-            found = False
-            for line in lines:
-                if intf in line:
-                    found = True
-                    break
-            assert found, '%s not in lldp table' % intf
-
-            # (1c) presence
-            cmdstr  = cmd_int_presence + ' ' + intf
-            clistr  = cli_wrap(cmdstr)                          # run CLI command
-            lines = clistr.splitlines()
-            line  = lines[2]
-            items = line.split()
-            assert items[0] == intf, '%s not in status' % intf
-            assert items[1] == 'Present', '%s not Present' % (intf)
-
-            # (2) port disabled
-
-            # disable port
-            cli_interface_shutdown(intf)
-
-            # wait for port to power down (and status to be updated)
-            time.sleep(_DELAY_AFTER_IF_SHUTDOWN_S)
-
-            # (2a) interface status
-            cmdstr  = cmd_int_status + ' ' + intf
-            clistr  = cli_wrap(cmdstr)                          # run CLI command
-            lines = clistr.splitlines()
-            line  = lines[2]
-            items = line.split()
-            assert items[0] == intf, '%s not in status' % intf
-            assert items[7] == 'down', '%s wrong oper  state %s' % (intf, items[7])
-            # wrong admin state would be a SONIC bug, not a txceiver issue
-            #assert items[8] == 'down', '%s wrong admin state %s' % (intf, items[8])
-
-            # (2b) lldp table
-            cmdstr  = cmd_lldp_table
-            clistr  = cli_wrap(cmdstr)                          # run CLI command
-            lines = clistr.splitlines()
-            found = False
-            for line in lines:
-                if intf in line:
-                    found = True
-                    break
-            assert not found, '%s in lldp table' % intf
-
-            # (2c) no point checking presence again; not affected by shutdown
-
-            # (3) re-enable port
-            cli_interface_startup(intf)
-
-            # wait for port to power up
-            # We COULD do this only once outside of this loop, but that wouldn't
-            # work for channelized ports. (E.g. if Ethernet0/Ethernet4 were part 
-            # of the same 2x100G physical port.)
-            #time.sleep(_DELAY_AFTER_IF_STARTUP_S)
-            timeout = _MAX_WAIT_FOR_LINK_UP_S
-            if is_coherent(intf):
-                timeout = _MAX_WAIT_FOR_LINK_UP_COHERENT_S
-            t_limit = time.time() + timeout
-            up = False
-            while time.time() < t_limit:
-                time.sleep(_POLL_PERIOD_S)
-                timeout -= _POLL_PERIOD_S
-                up = cli_interface_oper_status_up(intf)
-                if up:
-                    break
-            assert up, '%s not up after %fs' % (intf, timeout)
-
-            print('test_check_transceiver_status ', intf, ' done') # TEMPORARY DEBUG
+            with result_step('test_check_transceiver_status', intf, 'port'):
+                switchname  = duthost.hostname   # ???
+                port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
+                assert port_cfg
+
+                # (1) port enabled, assuming this is the default state
+
+                # (1a) interface status
+                cmdstr  = cmd_int_status + ' ' + intf
+                clistr  = cli_wrap(cmdstr)                          # run CLI command
+                lines = clistr.splitlines()
+                line  = lines[2]
+                items = line.split()
+                assert items[0] == intf, '%s not in status' % intf
+                assert items[7] == 'up', '%s wrong oper  state %s' % (intf, items[7])
+                # wrong admin state would be a SONIC bug, not a txceiver issue
+                #assert items[8] == 'up', '%s wrong admin state %s' % (intf, items[8])
+
+                # (1b) lldp table
+                cmdstr  = cmd_lldp_table
+                clistr  = cli_wrap(cmdstr)                          # run CLI command
+                lines = clistr.splitlines()
+                found = False
+                for line in lines:
+                    if intf in line:
+                        found = True
+                        break
+                assert found, '%s not in lldp table' % intf
+
+                # (1c) presence
+                cmdstr  = cmd_int_presence + ' ' + intf
+                clistr  = cli_wrap(cmdstr)                          # run CLI command
+                lines = clistr.splitlines()
+                line  = lines[2]
+                items = line.split()
+                assert items[0] == intf, '%s not in status' % intf
+                assert items[1] == 'Present', '%s not Present' % (intf)
+
+                # (2) port disabled
+
+                # disable port
+                cli_interface_shutdown(intf)
+
+                # wait for port to power down (and status to be updated)
+                trace_sleep(_DELAY_AFTER_IF_SHUTDOWN_S)
+
+                # (2a) interface status
+                cmdstr  = cmd_int_status + ' ' + intf
+                clistr  = cli_wrap(cmdstr)                          # run CLI command
+                lines = clistr.splitlines()
+                line  = lines[2]
+                items = line.split()
+                assert items[0] == intf, '%s not in status' % intf
+                assert items[7] == 'down', '%s wrong oper  state %s' % (intf, items[7])
+                # wrong admin state would be a SONIC bug, not a txceiver issue
+                #assert items[8] == 'down', '%s wrong admin state %s' % (intf, items[8])
+
+                # (2b) lldp table
+                cmdstr  = cmd_lldp_table
+                clistr  = cli_wrap(cmdstr)                          # run CLI command
+                lines = clistr.splitlines()
+                found = False
+                for line in lines:
+                    if intf in line:
+                        found = True
+                        break
+                assert not found, '%s in lldp table' % intf
+
+                # (2c) no point checking presence again; not affected by shutdown
+
+                # (3) re-enable port
+                cli_interface_startup(intf)
+
+                # wait for port to power up
+                # We COULD do this only once outside of this loop, but that wouldn't
+                # work for channelized ports. (E.g. if Ethernet0/Ethernet4 were part 
+                # of the same 2x100G physical port.)
+                #time.sleep(_DELAY_AFTER_IF_STARTUP_S)
+                timeout = _MAX_WAIT_FOR_LINK_UP_S
+                if is_coherent(intf):
+                    timeout = _MAX_WAIT_FOR_LINK_UP_COHERENT_S
+                t_limit = time.time() + timeout
+                up = False
+                while time.time() < t_limit:
+                    trace_sleep(_POLL_PERIOD_S)
+                    timeout -= _POLL_PERIOD_S
+                    up = cli_interface_oper_status_up(intf)
+                    if up:
+                        break
+                assert up, '%s not up after %fs' % (intf, timeout)
+
+                result_done('test_check_transceiver_status', intf)
 
 
 def test_check_transceiver_C_CMIS(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
@@ -469,93 +507,98 @@ def test_check_transceiver_C_CMIS(duthosts, enum_rand_one_per_hwsku_frontend_hos
     global ans_host
     ans_host = duthost
     portmap, dev_conn = get_dev_conn(duthost, conn_graph_facts, enum_frontend_asic_index)
+    sess = util_session(duthost)
 
     logging.info("Check output of '{}'".format(cmd_int_pm))
 
-    namespace = duthost.get_namespace_from_asic_id(enum_frontend_asic_index)
+    namespace = sess.namespace
 
     # flag to mkae sure we only do an initial wait once (not for each module)
     waited_for_update = False
     
     for intf in dev_conn:
         if intf not in xcvr_skip_list[duthost.hostname]:
-            #if not is_cmis(intf):
-            #    print('test_check_transceiver_C_CMIS ', intf, ' Skipped (not CMIS)') # (?)
-            #    continue
-            # is_coherent() also checks is_cmis()
-            if not is_coherent(intf):
-                print('test_check_transceiver_C_CMIS ', intf, ' Skipped (not CMIS/Coherent)')
-                continue
-
-            # Even if the previous test ensured links are up, we need to wait
-            # here to ensure PM stats are updated.
-            # But at least we don't need to wait for each txceiver, one wait should do it.
-            if not waited_for_update:
-                print('waiting %us for PM update' % (_DELAY_PM_UPDATE_S)) # TEMPORARY DEBUG(?)
-                time.sleep(_DELAY_PM_UPDATE_S)
-                waited_for_update = True
-
-            cmdstr = cmd_int_pm + ' ' + intf
-            clistr = cli_wrap(cmdstr)
-            lines = clistr.splitlines()
-            if 'not applicable' in lines[0]:
-                print('test_check_transceiver_C_CMIS ', intf, ' Skipped (N/A)')
-                continue
-
-            # Param name is 1-3 words, so offset of 'Min' etc. varies:
-            min_offs = [0,0,0,0,0, 3,4,4,3, 2,2,2,2,2,2, 3,3,3,2]  # (0=invalid)
-
-            for i in range(5, 18):
-                line  = lines[i]
-                items = line.split()
-                param_name = ''
-                #print('DBG:liine: ', line) # TEMPORARY DEBUG
-                try:
-                    for pn in range(0, min_offs[i] - 1):
-                        param_name += items[pn] + ' '
-                except:
-                    assert False, 'Failed to parse Parameter name'
-
-                try:
-                    #Min = float(items[min_offs[i] + 0])
-                    Avg = float(items[min_offs[i] + 1])
-                    #Max = float(items[min_offs[i] + 2])
-                except:
-                    assert False, 'Failed to parse float for %s' % (param_name)
-
-                # check if values seem (roughly) valid ("-" = no check)
-                # Parameter        Unit     >=  (min)   <=  (max)
-                # ---------------  ------   ---------   ---------
-                # Tx Power         dBm      -15         -
-                # Rx Total Power   dBm      -15         -      
-                # Rx Signal Power  dBm      -15         -      
-                # CD-short link    ps/nm    -32000      32000
-                # PDL              dB       0           100
-                # OSNR             dB       0           100
-                # eSNR             dB       0           100
-                # CFO              MHz      5000        -5000
-                # DGD              ps       0           1000
-                # SOPMD            ps^2     0           1000
-                # SOP ROC          krad/s   0           1000
-                # Pre-FEC BER      N/A      0.0         1.0
-                # Post-FEC BER     N/A      0.0         1.0
-                # EVM              %        0           -      
-                if i <= 7:      # Tx/Rx power
-                    assert Avg >= _DOM_MIN_TXPWR_ON, '%s %s invalid Avg %f' % (intf, param_name, Avg)
-                elif i == 8:    # CD
-                    assert Avg >= -32000 and Avg <= 32000, '%s %s invalid Avg %f' % (intf, param_name, Avg)
-                elif i <= 11:   # PDL,SNR
-                    assert Avg >= 0     and Avg <= 100, '%s %s invalid Avg %f' % (intf, param_name, Avg)
-                elif i == 12:   # CFO
-                    assert Avg >= -5000  and Avg <= 5000, '%s %s invalid Avg %f' % (intf, param_name, Avg)
-                elif i <= 15:   # DGD,SOP
-                    assert Avg >= 0     and Avg <= 1000, '%s %s invalid Avg %f' % (intf, param_name, Avg)
-                elif i <= 17:   # BER
-                    assert Avg >= 0.0   and Avg <= 1.0, '%s %s invalid Avg %f' % (intf, param_name, Avg)
-                elif i == 18:   # EVM [%]
-                    assert Avg >= 0, '%s %s invalid Avg %f' % (intf, param_name, Avg)
-
-            print('test_check_transceiver_C_CMIS ', intf, ' done') # TEMPORARY DEBUG
+            with result_step('test_check_transceiver_C_CMIS', intf, 'port'):
+                #if not is_cmis(intf):
+                #    print('test_check_transceiver_C_CMIS ', intf, ' Skipped (not CMIS)') # (?)
+                #    continue
+                # is_coherent() also checks is_cmis()
+                if not is_coherent(intf):
+                    result_skip('test_check_transceiver_C_CMIS', intf, 'not CMIS/Coherent')
+                    continue
+
+                # Even if the previous test ensured links are up, we need to wait
+                # here to ensure PM stats are updated.
+                # But at least we don't need to wait for each txceiver, one wait should do it.
+                if not waited_for_update:
+                    print('waiting %us for PM update' % (_DELAY_PM_UPDATE_S)) # TEMPORARY DEBUG(?)
+                    trace_sleep(_DELAY_PM_UPDATE_S)
+                    waited_for_update = True
+
+                cmdstr = cmd_int_pm + ' ' + intf
+                clistr = cli_wrap(cmdstr)
+                lines = clistr.splitlines()
+                if 'not applicable' in lines[0]:
+                    result_skip('test_check_transceiver_C_CMIS', intf, 'N/A')
+                    continue
+
+                # Param name is 1-3 words, so offset of 'Min' etc. varies:
+                min_offs = [0,0,0,0,0, 3,4,4,3, 2,2,2,2,2,2, 3,3,3,2]  # (0=invalid)
+                pm_avg = dict()     # {param name: Avg}, recorded with the results
+
+                for i in range(5, 18):
+                    line  = lines[i]
+                    items = line.split()
+                    param_name = ''
+                    #print('DBG:liine: ', line) # TEMPORARY DEBUG
+                    try:
+                        for pn in range(0, min_offs[i] - 1):
+                            param_name += items[pn] + ' '
+                    except:
+                        assert False, 'Failed to parse Parameter name'
+
+                    try:
+                        #Min = float(items[min_offs[i] + 0])
+                        Avg = float(items[min_offs[i] + 1])
+                        #Max = float(items[min_offs[i] + 2])
+                    except:
+                        assert False, 'Failed to parse float for %s' % (param_name)
+                    pm_avg[param_name.strip()] = Avg
+
+                    # check if values seem (roughly) valid ("-" = no check)
+                    # Parameter        Unit     >=  (min)   <=  (max)
+                    # ---------------  ------   ---------   ---------
+                    # Tx Power         dBm      -15         -
+                    # Rx Total Power   dBm      -15         -      
+                    # Rx Signal Power  dBm      -15         -      
+                    # CD-short link    ps/nm    -32000      32000
+                    # PDL              dB       0           100
+                    # OSNR             dB       0           100
+                    # eSNR             dB       0           100
+                    # CFO              MHz      5000        -5000
+                    # DGD              ps       0           1000
+                    # SOPMD            ps^2     0           1000
+                    # SOP ROC          krad/s   0           1000
+                    # Pre-FEC BER      N/A      0.0         1.0
+                    # Post-FEC BER     N/A      0.0         1.0
+                    # EVM              %        0           -      
+                    if i <= 7:      # Tx/Rx power
+                        assert Avg >= _DOM_MIN_TXPWR_ON, '%s %s invalid Avg %f' % (intf, param_name, Avg)
+                    elif i == 8:    # CD
+                        assert Avg >= -32000 and Avg <= 32000, '%s %s invalid Avg %f' % (intf, param_name, Avg)
+                    elif i <= 11:   # PDL,SNR
+                        assert Avg >= 0     and Avg <= 100, '%s %s invalid Avg %f' % (intf, param_name, Avg)
+                    elif i == 12:   # CFO
+                        assert Avg >= -5000  and Avg <= 5000, '%s %s invalid Avg %f' % (intf, param_name, Avg)
+                    elif i <= 15:   # DGD,SOP
+                        assert Avg >= 0     and Avg <= 1000, '%s %s invalid Avg %f' % (intf, param_name, Avg)
+                    elif i <= 17:   # BER
+                        assert Avg >= 0.0   and Avg <= 1.0, '%s %s invalid Avg %f' % (intf, param_name, Avg)
+                    elif i == 18:   # EVM [%]
+                        assert Avg >= 0, '%s %s invalid Avg %f' % (intf, param_name, Avg)
+
+                result_values('test_check_transceiver_C_CMIS', intf, 'pm', pm_avg)
+                result_done('test_check_transceiver_C_CMIS', intf)
 
 
 def test_check_transceiver_VDM(duthosts, enum_rand_one_per_hwsku_frontend_hostname,
@@ -579,21 +622,23 @@ def test_check_transceiver_VDM(duthosts, enum_rand_one_per_hwsku_frontend_hostna
     global ans_host
     ans_host = duthost
     portmap, dev_conn = get_dev_conn(duthost, conn_graph_facts, enum_frontend_asic_index)
+    sess = util_session(duthost)
 
     logging.info("Check output of '{}'".format(cmd_int_???))
 
-    namespace = duthost.get_namespace_from_asic_id(enum_frontend_asic_index)
+    namespace = sess.namespace
 
     for intf in dev_conn:
         if intf not in xcvr_skip_list[duthost.hostname]:
-            if not is_cmis(intf):
-                print('test_check_transceiver_VDM ', intf, ' Skipped (not CMIS)') # (?)
-                continue
+            with result_step('test_check_transceiver_VDM', intf, 'port'):
+                if not is_cmis(intf):
+                    result_skip('test_check_transceiver_VDM', intf, 'not CMIS') # (?)
+                    continue
 
 
 
 
-            print('test_check_transceiver_VDM ', intf, ' done') # TEMPORARY DEBUG
+                result_done('test_check_transceiver_VDM', intf)
     '''
 
 
@@ -610,6 +655,9 @@ def test_check_transceiver_error_status(duthosts, enum_rand_one_per_hwsku_fronte
     "show int transceiver error-status <port>"
     "show int transceiver error-status -hw <port>"
 
+    Both commands are run once without <port> (all ports in one table), see
+    cli_all_error_status().
+
     admin@sonic:~$ show int trans error-status Ethernet0
     Port       Error Status
     ---------  --------------
@@ -624,37 +672,33 @@ def test_check_transceiver_error_status(duthosts, enum_rand_one_per_hwsku_fronte
     global ans_host
     ans_host = duthost
     portmap, dev_conn = get_dev_conn(duthost, conn_graph_facts, enum_frontend_asic_index)
+    sess = util_session(duthost)
 
     logging.info("Check output of '{}'".format(cmd_int_trans_error))
     logging.info("        and, of '{}'".format(cmd_int_trans_error_hw))
 
-    namespace = duthost.get_namespace_from_asic_id(enum_frontend_asic_index)
-    test_cfg = test_cfg_read()
+    namespace = sess.namespace
+    test_cfg = sess.test_cfg
     assert test_cfg, 'Failed to read test config file'
 
     for intf in dev_conn:
         if intf not in xcvr_skip_list[duthost.hostname]:
-            switchname  = duthost.hostname
-            port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
-            assert port_cfg
-
-            # (1) error status relying on DB
-            cmdstr  = cmd_int_trans_error + ' ' + intf
-            clistr  = cli_wrap(cmdstr)                          # run CLI command
-            lines = clistr.splitlines()
-            items = lines[2].split()
-            assert items[0] == intf, '%s not in error-status' % intf
-            assert items[1] == 'OK', '%s error-status %s' % (intf, items[1])
-
-            # (2) error status relying on HW
-            cmdstr  = cmd_int_trans_error_hw + ' ' + intf
-            clistr  = cli_wrap(cmdstr)                          # run CLI command
-            lines = clistr.splitlines()
-            items = lines[2].split()
-            assert items[0] == intf, '%s not in error-status' % intf
-            assert items[1] == 'OK', '%s error-status %s' % (intf, items[1])
-
-            print('test_check_transceiver_error_status ', intf, ' done') # TEMPORARY DEBUG
+            with result_step('test_check_transceiver_error_status', intf, 'port'):
+                switchname  = duthost.hostname
+                port_cfg = test_cfg_portcfg(test_cfg, switchname, intf, namespace=namespace)
+                assert port_cfg
+
+                # (1) error status relying on DB
+                status = cli_all_error_status(hw=False).get(intf)
+                assert status, '%s not in error-status' % intf
+                assert status == 'OK', '%s error-status %s' % (intf, status)
+
+                # (2) error status relying on HW
+                status = cli_all_error_status(hw=True).get(intf)
+                assert status, '%s not in error-status' % intf
+                assert status == 'OK', '%s error-status %s' % (intf, status)
+
+                result_done('test_check_transceiver_error_status', intf)
 
 
 def test_the_tests():
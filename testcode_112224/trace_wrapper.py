@@ -0,0 +1,187 @@
+'''Timeline tracing: Chrome trace events of CLI calls, EEPROM reads, waits..
+
+With ports tested in parallel, the prints and result records don't show
+where the time goes: which port's download is on the critical path, which
+ports serialize the others, how long a link-up poll really sleeps. Between
+trace_start() and trace_stop() the wrappers record every CLI call, EEPROM
+read, sleep, wait and firmware process as a span, tagged with test, port and
+thread. trace_stop() writes them as a Chrome trace-event file (trace.json),
+to open in Perfetto (ui.perfetto.dev) or chrome://tracing: one row per
+thread, firmware processes as async tracks.
+
+Test and port are taken from the enclosing trace_span (result_step opens
+one per step), else from the call stack (innermost test_* function and its
+<intf>); an explicit port, or one in the command string, takes precedence.
+
+Disabled (the default), every hook is a flag check. Enabled, events are
+kept in memory; the stack walk makes it too slow for production runs, fine
+for finding out where the time goes.
+
+Only intended for local use (i.e., in the switch/router).
+'''
+import atexit
+import json
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+
+# Local Constants
+TRACE_DEFAULT_FILENAME  = 'trace.json'
+_TRACE_MAX_EVENTS       = 1000000   # more are dropped (~200MB)
+
+_RE_TRACE_PORT = re.compile(r'\b(Ethernet\d+(?:/\d+)?)\b')
+
+_trace          = {'on': False, 'fname': TRACE_DEFAULT_FILENAME, 'events': list(), 'dropped': 0,
+                   'threads': dict(), 'procs': 0}
+_trace_lock     = threading.Lock()
+_trace_local    = threading.local()     # .context: list of (test, port) of open trace_spans
+
+
+def trace_enabled():
+    return _trace['on']
+
+def trace_start(fname=TRACE_DEFAULT_FILENAME):
+    '''Start recording (again, from scratch); trace_stop() writes <fname>.'''
+    with _trace_lock:
+        _trace.update(on=True, fname=fname, events=list(), dropped=0, threads=dict())
+
+def trace_stop():
+    '''Stop recording and write the trace file. Return its name, None if not
+    recording.
+    '''
+    with _trace_lock:
+        if not _trace['on']:
+            return None
+        _trace['on'] = False
+        events = _trace['events']
+        meta = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': name}}
+                for tid, name in _trace['threads'].items()]
+        fname = _trace['fname']
+        dropped = _trace['dropped']
+    with open(fname, 'w') as f:
+        json.dump({'traceEvents': meta + events, 'displayTimeUnit': 'ms'}, f)
+    print('trace: %d events written to %s%s' % (len(events), fname,
+          ' (%d dropped)' % (dropped) if dropped else ''))
+    return fname
+
+atexit.register(trace_stop)
+
+
+def _trace_ts():
+    return time.monotonic() * 1e6   # [us]
+
+def _trace_context():
+    '''Return (test, port) of the caller: innermost open trace_span with a
+    test, else the innermost test_* function on the stack (and its intf).'''
+    for test, port in reversed(getattr(_trace_local, 'context', None) or []):
+        if test:
+            return test, port
+    f = sys._getframe(2)
+    while f is not None:
+        name = f.f_code.co_name
+        qualname = getattr(f.f_code, 'co_qualname', name).split('.')[0]
+        for n in (name, qualname):
+            if n.startswith('test_') and not n.startswith('test_cfg_'):
+                port = f.f_locals.get('intf')
+                return n, port if isinstance(port, str) else None
+        f = f.f_back
+    return None, None
+
+def _trace_add(event):
+    tid = threading.get_ident()
+    event['pid'] = os.getpid()
+    event['tid'] = tid
+    with _trace_lock:
+        if not _trace['on']:
+            return
+        if len(_trace['events']) >= _TRACE_MAX_EVENTS:
+            _trace['dropped'] += 1
+            return
+        _trace['events'].append(event)
+        if tid not in _trace['threads']:
+            _trace['threads'][tid] = threading.current_thread().name
+
+def _trace_args(name, port, args):
+    test, ctx_port = _trace_context()
+    if port is None:
+        m = _RE_TRACE_PORT.search(name)
+        port = m.group(1) if m else ctx_port
+    args = dict(args)
+    args.update(test=test, port=port)
+    return args
+
+
+@contextmanager
+def trace_span(name, cat, port=None, test=None, **args):
+    '''Record the enclosed block as a span <name> of category <cat> ('cli',
+    'eeprom', 'sleep', 'wait', 'fw', 'step', ..). <args> are shown with it.
+    A <test> given here is the context of the spans inside.
+    '''
+    if not _trace['on']:
+        yield
+        return
+    context = getattr(_trace_local, 'context', None)
+    if context is None:
+        context = _trace_local.context = list()
+    if test:
+        args['test'] = test
+    context.append((test, port))
+    args = _trace_args(name, port, args) if not test else dict(args, port=port)
+    ts = _trace_ts()
+    try:
+        yield
+    finally:
+        context.pop()
+        _trace_add({'name': name, 'cat': cat, 'ph': 'X', 'ts': ts, 'dur': _trace_ts() - ts, 'args': args})
+
+def trace_func(cat):
+    '''Decorator: record every call of the function as a span of category
+    <cat>, port from the first argument if it's a port name.'''
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*a, **kw):
+            if not _trace['on']:
+                return func(*a, **kw)
+            port = a[0] if a and isinstance(a[0], str) and _RE_TRACE_PORT.match(a[0]) else None
+            with trace_span(func.__name__, cat, port):
+                return func(*a, **kw)
+        return wrapper
+    return decorator
+
+def trace_sleep(seconds, name='sleep', port=None):
+    '''time.sleep(<seconds>), recorded as a span.'''
+    with trace_span(name, 'sleep', port, seconds=seconds):
+        time.sleep(seconds)
+
+
+#----------------------------------------------------------------------------
+# Processes
+# Firmware downloads etc. run as processes over several calls (spawn, poll,
+# kill), often overlapping on one thread: async begin/end events, one track
+# per process.
+#----------------------------------------------------------------------------
+
+def trace_proc_begin(p, cmdstr):
+    '''Record start of process <p> (Popen) running <cmdstr>.'''
+    if not _trace['on']:
+        return
+    with _trace_lock:
+        _trace['procs'] += 1
+        p.trace_id = _trace['procs']
+    p.trace_name = cmdstr.split()[1] if cmdstr.startswith('sudo ') and len(cmdstr.split()) > 1 \
+                   else cmdstr.split()[0]
+    _trace_add({'name': p.trace_name, 'cat': 'proc', 'ph': 'b', 'id': p.trace_id, 'ts': _trace_ts(),
+                'args': _trace_args(cmdstr, None, {'cmd': cmdstr, 'pid': p.pid})})
+
+def trace_proc_end(p):
+    '''Record end (kill) of process <p> (see trace_proc_begin).'''
+    if not _trace['on'] or getattr(p, 'trace_id', None) is None:
+        return
+    _trace_add({'name': p.trace_name, 'cat': 'proc', 'ph': 'e', 'id': p.trace_id, 'ts': _trace_ts(),
+                'args': {'returncode': p.poll()}})
+    p.trace_id = None
@@ -7,7 +7,16 @@ mostly dummy data.
 Only intended for local use (i.e., in the switch/router), NOT intended for
 normal, remote test setups.
 '''
+import glob
+import hashlib
+import json
+import os
+import threading
+
 from test_cfg   import *   # wrappers dealing with test config file etc.
+from caps_wrapper import *  # per-port capability matrix
+from store_wrapper import * # passes of earlier runs (incremental runs)
+from result_wrapper import * # result_skip
 
 
 #----------------------------------------------------------------------------
@@ -68,34 +77,188 @@ def util_wrapper_init():
     print('util_wrapper_init done')
 
 
+def util_run_test(test, ports, dev_conn):
+    '''Run test function <test> with the dummy data, on <ports> only: all
+    other ports of <dev_conn> are put on the skip list.
+    '''
+    duthost = my_duthosts[my_enum_rand_one_per_hwsku_frontend_hostname]
+    skip = my_xcvr_skip_list[duthost.hostname]
+    skip_list = dict(my_xcvr_skip_list)
+    skip_list[duthost.hostname] = list(skip) + [intf for intf in dev_conn if intf not in ports]
+    return test(my_duthosts, my_enum_rand_one_per_hwsku_frontend_hostname,
+                my_enum_frontend_asic_index, my_conn_graph_facts, skip_list)
+
+
 #----------------------------------------------------------------------------
-# Replacement functions
+# Session data
+# What every test sets up first (ports, namespace, test config, capability
+# matrix) is the same for all tests of a session. Computed once per DUT,
+# ASIC and test config file, again only if the file changes (one stat per
+# call). Tests take namespace, test config and caps from util_session()
+# instead of setting them up themselves; so do the test_the_* drivers and
+# the pytest fixtures in conftest.py.
 #----------------------------------------------------------------------------
 
-def get_dev_conn(duthost, conn_graph_facts, asic_index, cfg_fname=None):
-    ''' Wrapper replacement for tests/platform_tests/sfp/util.py
+class UtilSession(object):
+    '''Per-session test data of one DUT/ASIC.
 
-    Note: Added extra, optional cfg_fname parameter.
-    Using default filename if cfg_fname is not specified.
+    namespace   of the ASIC
+    test_cfg    TestCfg
+    portmap     as returned by get_dev_conn
+    dev_conn    sorted list of ports under test (don't modify)
     '''
-    ##portmap seems to be some sort of per-ASIC dict of lists?
-    #portmap = get_port_map(duthost, asic_index)
-    portmap = dict()
+    __slots__ = ('duthost', 'asic_index', 'namespace', 'test_cfg', 'portmap', 'dev_conn')
+
+    def __init__(self, duthost, asic_index, test_cfg):
+        self.duthost = duthost
+        self.asic_index = asic_index
+        self.test_cfg = test_cfg
+        self.namespace = duthost.get_namespace_from_asic_id(asic_index)
+        ##portmap seems to be some sort of per-ASIC dict of lists?
+        #portmap = get_port_map(duthost, asic_index)
+        self.portmap = dict()
+        ##dev_conn seems to be a list of interface names?
+        #dev_conn = ['Ethernet0', 'Ethernet4']
+        self.dev_conn = list()
+        if test_cfg and test_cfg_valid(test_cfg):
+            self.dev_conn = test_cfg_ports(test_cfg, switchname=None, namespace=self.namespace)
+            #portmap.append( ??? )   # ?
+
+    def caps(self):
+        '''Return capability matrix {port: PortCaps} of dev_conn (built on
+        first use; modules changed since re-read, see caps_invalidate).'''
+        return caps_matrix(self.dev_conn, self.duthost.hostname, self.namespace, self.test_cfg)
 
-    ##dev_conn seems to be a list of interface names?
-    #dev_conn = ['Ethernet0', 'Ethernet4']
-    dev_conn = list()
 
+_util_sessions  = dict()    # (hostname, asic index, cfg file) -> UtilSession
+_util_lock      = threading.Lock()
+
+def _util_cfg_changed(test_cfg):
+    # file config changed since read, or read error; an auto config (no
+    # file) is kept for the session (see test_cfg_auto_reset)
+    if test_cfg is None or test_cfg.mtime is None:
+        return test_cfg is None
+    try:
+        return os.stat(test_cfg.fname).st_mtime_ns != test_cfg.mtime
+    except OSError:
+        return True
+
+def util_session(duthost=None, asic_index=None, cfg_fname=None):
+    '''Return the UtilSession of <duthost>/<asic_index> (default: the dummy
+    data's) and test config <cfg_fname> (default file if not specified).
+    Created on first use; again only if the test config file changed.
+    '''
+    if duthost is None:
+        duthost = my_duthosts[my_enum_rand_one_per_hwsku_frontend_hostname]
+    if asic_index is None:
+        asic_index = my_enum_frontend_asic_index
     if not cfg_fname:
         cfg_fname = TEST_CFG_DEFAULT_FILENAME # test_cfg.py
-    
-    yyy = test_cfg_read(cfg_fname)
-    if yyy and test_cfg_valid(yyy):
-        enum_frontend_asic_index = 0 # HACK, specific for local use
-        namespace = duthost.get_namespace_from_asic_id(enum_frontend_asic_index)
 
-        dev_conn = test_cfg_ports(yyy, switchname=None, namespace=namespace)
-        #portmap.append( ??? )   # ?
+    key = (duthost.hostname, asic_index, cfg_fname)
+    with _util_lock:
+        sess = _util_sessions.get(key)
+        if sess is None or _util_cfg_changed(sess.test_cfg):
+            sess = _util_sessions[key] = UtilSession(duthost, asic_index, test_cfg_read(cfg_fname))
+    return sess
+
+
+#----------------------------------------------------------------------------
+# Incremental test selection
+# Re-qualifying a switch re-runs every test even if nothing changed. Tests
+# that only compare what a module IS (static info, EEPROM contents) against
+# the test config pass again as long as their inputs are the same: module SN,
+# active/inactive firmware, SONiC build, platform, test code and the port's
+# test config record. A pass is stored with a digest of those inputs; in
+# incremental mode such a test skips ports whose inputs digest matches.
+# All other (stateful) tests always run.
+#----------------------------------------------------------------------------
+
+UTIL_INCR_TESTS = [
+    'test_check_show_transceiver_info',
+    'test_check_sfputil_transceiver_eeprom',
+    'test_check_sfputil_transceiver_eeprom_hexdump',
+]
+
+_util_incremental   = [False]
+_util_code_digests  = dict()    # test module file -> digest
+
+def util_incremental(enable=None):
+    '''Return True if in incremental mode; <enable> True/False turns it on/off
+    first (pytest --incremental, see conftest.py).
+    '''
+    if enable is not None:
+        _util_incremental[0] = bool(enable)
+    return _util_incremental[0]
+
+def _util_code_digest(test_file):
+    # the test module plus everything it builds on (wrappers, test_cfg)
+    digest = _util_code_digests.get(test_file)
+    if digest is None:
+        here = os.path.dirname(os.path.abspath(__file__))
+        files = [os.path.abspath(test_file), os.path.join(here, 'test_cfg.py')] + \
+                sorted(glob.glob(os.path.join(here, '*_wrapper.py')))
+        h = hashlib.sha256()
+        for fname in files:
+            with open(fname, 'rb') as f:
+                h.update(f.read())
+        digest = _util_code_digests[test_file] = h.hexdigest()
+    return digest
+
+def util_incr_inputs(test_file, intf, port_cfg, namespace=''):
+    '''Return digest of the inputs of a test in <test_file> (pass __file__) on
+    <intf>, None if they can't all be read (no module SN, ..): then the test
+    always runs.
+    '''
+    view = db_transceiver_view(intf, namespace)
+    version = cli_show_version()
+    if not view or not view.get('Vendor SN') or not version.get('SONiC Software Version'):
+        return None
+    inputs = [view.get('Vendor SN'), view.get('Active Firmware'), view.get('Inactive Firmware'),
+              version.get('SONiC Software Version'), version.get('Platform'), version.get('HwSKU'),
+              _util_code_digest(test_file), port_cfg]
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+def util_incr_skip(testname, switchname, intf, inputs):
+    '''Return True if <testname> can skip <intf>: incremental mode, a static
+    test (UTIL_INCR_TESTS) and the last pass had the same <inputs>.
+
+    If not, the test runs, and its last pass is forgotten until it passes
+    again (util_incr_passed); a failure must not leave the old pass behind.
+    '''
+    if testname not in UTIL_INCR_TESTS:
+        return False
+    last = store_pass_inputs(switchname, intf, testname)
+    if util_incremental() and inputs is not None and last == inputs:
+        result_skip(testname, intf, 'unchanged since last pass')
+        return True
+    if last is not None:
+        store_pass_put(switchname, intf, testname, None)
+    return False
+
+def util_incr_passed(testname, switchname, intf, inputs):
+    '''Record a pass of <testname> on <intf> with <inputs> (any mode).'''
+    if inputs is not None and testname in UTIL_INCR_TESTS:
+        store_pass_put(switchname, intf, testname, inputs)
+
+
+#----------------------------------------------------------------------------
+# Replacement functions
+#----------------------------------------------------------------------------
+
+def get_dev_conn(duthost, conn_graph_facts, asic_index, cfg_fname=None):
+    ''' Wrapper replacement for tests/platform_tests/sfp/util.py
+
+    Note: Added extra, optional cfg_fname parameter.
+    Using default filename if cfg_fname is not specified.
+
+    The port list is computed once per session (util_session); this returns
+    copies.
+    '''
+    # Start of a new test; don't reuse bulk CLI output from a previous one.
+    cli_step_reset()
 
-    return portmap, dev_conn
+    enum_frontend_asic_index = 0 # HACK, specific for local use
+    sess = util_session(duthost, enum_frontend_asic_index, cfg_fname)
+    return dict(sess.portmap), list(sess.dev_conn)
 